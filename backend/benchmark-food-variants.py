@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Food Model Variant Benchmark
+Latency versus accuracy of the food classifier for every combination of
+input resolution and MobileNetV2 width multiplier (alpha), to pick an
+operating point per deployment
+
+Each variant gets a fresh frozen backbone; with --train-dir its head is
+fitted on cached backbone embeddings (cheap, the backbone never changes)
+before scoring the validation folder end to end. Variants can be saved with
+their metadata and loaded as the main model unchanged.
+
+Folders are laid out as <dir>/<food_class>/<image>
+
+Usage:
+  python benchmark-food-variants.py <val_dir> --train-dir <train_dir>
+  python benchmark-food-variants.py <val_dir> --train-dir <train_dir> --sizes 160 224 --alphas 0.5 1.0 --save-dir ml_models/variants
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir / 'services'))
+
+from foodEvaluation import iter_labelled_images
+from northIndianFoodDetector import NorthIndianFoodDetector
+
+
+class Colors:
+    RESET = '\033[0m'
+    GREEN = '\033[32m'
+    YELLOW = '\033[33m'
+    BLUE = '\033[36m'
+    RED = '\033[31m'
+
+
+def log(message, color='RESET'):
+    print(f"{getattr(Colors, color)}{message}{Colors.RESET}", file=sys.stderr)
+
+
+def preprocess_all(detector, items, batch_size):
+    """Yield (batch, labels) at the detector's input size"""
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        batch = np.concatenate([detector.preprocess_image(path) for path, _ in chunk])
+        yield batch, np.array([label for _, label in chunk])
+
+
+def train_head(detector, train_items, epochs, batch_size):
+    """Fit the dense head on backbone embeddings computed once"""
+    embeddings, labels = [], []
+    for batch, batch_labels in preprocess_all(detector, train_items, batch_size):
+        embeddings.append(detector.embedding_model.predict(batch, verbose=0))
+        labels.append(batch_labels)
+    x = np.concatenate(embeddings)
+    y = np.eye(detector.num_classes, dtype=np.float32)[np.concatenate(labels)]
+    detector._compile_classifier(detector.head_model)
+    history = detector.head_model.fit(x, y, epochs=epochs, batch_size=batch_size, shuffle=True, verbose=0)
+    return float(history.history['loss'][-1])
+
+
+def measure(detector, val_items, batch_size, runs):
+    """Accuracy plus single-image and batched latency"""
+    correct = 0
+    preprocess_s = 0.0
+    batches = []
+    for start in range(0, len(val_items), batch_size):
+        chunk = val_items[start:start + batch_size]
+        t0 = time.perf_counter()
+        batch = np.concatenate([detector.preprocess_image(path) for path, _ in chunk])
+        preprocess_s += time.perf_counter() - t0
+        labels = np.array([label for _, label in chunk])
+        correct += int(np.sum(detector.model.predict(batch, verbose=0).argmax(axis=1) == labels))
+        batches.append(batch)
+
+    single = batches[0][:1]
+    detector.model.predict(single, verbose=0)
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        detector.model.predict(single, verbose=0)
+        times.append(time.perf_counter() - t0)
+
+    full = batches[0]
+    t0 = time.perf_counter()
+    for _ in range(max(1, runs // 10)):
+        detector.model.predict(full, verbose=0)
+    batch_s = (time.perf_counter() - t0) / max(1, runs // 10)
+
+    return {
+        'accuracy': round(correct / len(val_items), 4),
+        'latency_ms_p50': round(float(np.percentile(times, 50)) * 1000, 2),
+        'latency_ms_p95': round(float(np.percentile(times, 95)) * 1000, 2),
+        'batch_images_per_second': round(len(full) / batch_s, 1),
+        'preprocess_ms_per_image': round(preprocess_s / len(val_items) * 1000, 2)
+    }
+
+
+def mark_pareto(rows):
+    """A variant is on the frontier when nothing is both faster and at least as accurate"""
+    for row in rows:
+        row['pareto'] = not any(
+            other is not row
+            and other['latency_ms_p50'] <= row['latency_ms_p50']
+            and other['accuracy'] >= row['accuracy']
+            and (other['latency_ms_p50'] < row['latency_ms_p50'] or other['accuracy'] > row['accuracy'])
+            for other in rows
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark food classifier resolution/width variants')
+    parser.add_argument('val_dir', help='Labelled validation folder (<dir>/<class>/<image>)')
+    parser.add_argument('--train-dir', help='Fit each variant head on this labelled folder first')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(NorthIndianFoodDetector.INPUT_SIZES))
+    parser.add_argument('--alphas', type=float, nargs='+', default=list(NorthIndianFoodDetector.ALPHAS))
+    parser.add_argument('--weights', default='imagenet', help="Backbone weights ('imagenet' or 'none')")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--runs', type=int, default=50, help='Single-image latency samples per variant')
+    parser.add_argument('--save-dir', help='Save every variant (model + metadata) here')
+    parser.add_argument('--report', help='Write the JSON report here (default: stdout)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    weights = None if args.weights.lower() == 'none' else args.weights
+    classes = list(NorthIndianFoodDetector.NORTH_INDIAN_FOODS.keys())
+    val_items = list(iter_labelled_images(args.val_dir, classes))
+    train_items = list(iter_labelled_images(args.train_dir, classes)) if args.train_dir else []
+    if not val_items:
+        log(f"✗ No labelled images found in {args.val_dir}", 'RED')
+        sys.exit(1)
+    if not train_items:
+        log("⚠️ No --train-dir: heads are untrained, accuracy is chance level", 'YELLOW')
+
+    rows = []
+    for size in args.sizes:
+        for alpha in args.alphas:
+            log(f"\n📊 {size}px, alpha={alpha}", 'BLUE')
+            detector = NorthIndianFoodDetector(input_size=size, alpha=alpha, weights=weights)
+            row = {'input_size': size, 'alpha': alpha, 'params': int(detector.model.count_params())}
+            if train_items:
+                row['train_loss'] = round(train_head(detector, train_items, args.epochs, args.batch_size), 4)
+            row.update(measure(detector, val_items, args.batch_size, args.runs))
+            if args.save_dir:
+                out = Path(args.save_dir)
+                out.mkdir(parents=True, exist_ok=True)
+                path = out / f'north_indian_food_{size}_{alpha}.h5'
+                detector.save_model(str(path), {'val_accuracy': row['accuracy'],
+                                                'latency_ms_p50': row['latency_ms_p50']})
+                row['model_path'] = str(path)
+            log(f"   accuracy {row['accuracy'] * 100:.1f}%, p50 {row['latency_ms_p50']}ms, "
+                f"{row['batch_images_per_second']} img/s batched", 'GREEN')
+            rows.append(row)
+
+    mark_pareto(rows)
+    log("\n  size  alpha   accuracy   p50 ms   img/s   pareto", 'BLUE')
+    for row in sorted(rows, key=lambda r: r['latency_ms_p50']):
+        log(f"  {row['input_size']:>4}  {row['alpha']:>5}   {row['accuracy'] * 100:>7.1f}%  "
+            f"{row['latency_ms_p50']:>7}  {row['batch_images_per_second']:>6}   {'*' if row['pareto'] else ''}")
+
+    report = {
+        'val_images': len(val_items),
+        'train_images': len(train_items),
+        'weights': args.weights,
+        'variants': rows
+    }
+    output = json.dumps(report, indent=2)
+    if args.report:
+        Path(args.report).write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Cascade Calibration Tool
+Trains (optionally) and calibrates the low-resolution first-stage food
+classifier used by NorthIndianFoodDetector's cascade mode, and reports the
+early-exit rate versus accuracy for every confidence threshold
+
+Validation/training folders are laid out as <dir>/<food_class>/<image>
+
+Usage:
+  python calibrate-cascade.py <val_dir> [--max-accuracy-drop 0.01]
+  python calibrate-cascade.py <val_dir> --train-dir <train_dir> --epochs 5
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir / 'services'))
+
+from foodEvaluation import iter_labelled_images
+from imageLoader import load_image
+from northIndianFoodDetector import NorthIndianFoodDetector
+
+
+def load_batches(detector, items, batch_size):
+    """Yield (small_batch, full_batch, labels) from one decode per image"""
+    size = detector.stage1_input_size
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        small, full = [], []
+        for path, _ in chunk:
+            img = load_image(path, (detector.input_size, detector.input_size))
+            small.append(detector._image_to_batch(img.resize((size, size))))
+            full.append(detector._image_to_batch(img))
+        yield np.concatenate(small), np.concatenate(full), np.array([label for _, label in chunk])
+
+
+def train_stage1(detector, train_items, epochs, batch_size):
+    """Fit the first-stage head on a labelled folder"""
+    print(f"🏋️ Training stage 1 on {len(train_items)} images for {epochs} epochs", file=sys.stderr)
+    # Fresh optimizer: a reloaded model's optimizer state does not cover the head
+    detector._compile_classifier(detector.stage1_model)
+    for epoch in range(epochs):
+        order = np.random.permutation(len(train_items))
+        shuffled = [train_items[i] for i in order]
+        losses = []
+        for small, _, labels in load_batches(detector, shuffled, batch_size):
+            targets = np.eye(detector.num_classes, dtype=np.float32)[labels]
+            loss = detector.stage1_model.train_on_batch(small, targets)
+            losses.append(float(np.atleast_1d(loss)[0]))
+        print(f"   Epoch {epoch + 1}/{epochs}: loss={np.mean(losses):.4f}", file=sys.stderr)
+
+
+def score_validation(detector, items, batch_size):
+    """Stage 1 and stage 2 probabilities plus per-image timings"""
+    p1, p2, labels = [], [], []
+    t1 = t2 = 0.0
+    for small, full, batch_labels in load_batches(detector, items, batch_size):
+        start = time.perf_counter()
+        p1.append(detector.stage1_model.predict(small, verbose=0))
+        t1 += time.perf_counter() - start
+
+        start = time.perf_counter()
+        p2.append(detector.model.predict(full, verbose=0))
+        t2 += time.perf_counter() - start
+        labels.append(batch_labels)
+
+    n = max(1, len(items))
+    return np.concatenate(p1), np.concatenate(p2), np.concatenate(labels), t1 / n * 1000, t2 / n * 1000
+
+
+def sweep_thresholds(p1, p2, labels, stage1_ms, stage2_ms, thresholds):
+    """Exit rate, accuracy and expected cost of the cascade at each threshold"""
+    conf1 = p1.max(axis=1)
+    pred1 = p1.argmax(axis=1)
+    pred2 = p2.argmax(axis=1)
+    full_accuracy = float(np.mean(pred2 == labels))
+
+    rows = []
+    for t in thresholds:
+        exits = conf1 >= t
+        cascade_pred = np.where(exits, pred1, pred2)
+        exit_rate = float(exits.mean())
+        rows.append({
+            'threshold': round(float(t), 4),
+            'exit_rate': round(exit_rate, 4),
+            'accuracy': round(float(np.mean(cascade_pred == labels)), 4),
+            'exit_accuracy': round(float(np.mean(pred1[exits] == labels[exits])), 4) if exits.any() else None,
+            'accuracy_drop': round(full_accuracy - float(np.mean(cascade_pred == labels)), 4),
+            'expected_ms': round(stage1_ms + (1 - exit_rate) * stage2_ms, 3),
+            'speedup': round(stage2_ms / (stage1_ms + (1 - exit_rate) * stage2_ms), 3) if stage2_ms else None
+        })
+    return full_accuracy, rows
+
+
+def pays_off(row, min_exit_rate, min_speedup):
+    """Whether a threshold exits often enough to beat the full model alone"""
+    return row['exit_rate'] > min_exit_rate and (row['speedup'] or 0) > min_speedup
+
+
+def choose_threshold(rows, full_accuracy, max_drop, min_exit_rate=0.0, min_speedup=1.0):
+    """
+    Highest exit rate among thresholds whose accuracy stays within max_drop
+    of the full model and that pay off (exit rate above min_exit_rate,
+    speedup above min_speedup); ties go to the higher accuracy, then the
+    higher threshold
+    """
+    acceptable = [r for r in rows
+                  if r['accuracy'] >= full_accuracy - max_drop and pays_off(r, min_exit_rate, min_speedup)]
+    if not acceptable:
+        return None
+    return max(acceptable, key=lambda r: (r['exit_rate'], r['accuracy'], r['threshold']))
+
+
+def print_curve(rows, chosen, full_accuracy, max_drop, min_exit_rate=0.0, min_speedup=1.0):
+    """Exit rate versus accuracy at every threshold, marking the bounds and the pick"""
+    print(f"   {'threshold':>9}  {'exit':>6}  {'accuracy':>8}  {'speedup':>7}", file=sys.stderr)
+    for r in rows:
+        if r is chosen:
+            mark = '*'
+        elif r['accuracy'] < full_accuracy - max_drop:
+            mark = 'x'
+        elif not pays_off(r, min_exit_rate, min_speedup):
+            mark = '-'
+        else:
+            mark = ' '
+        speedup = f"{r['speedup']:.2f}x" if r['speedup'] else '-'
+        print(f" {mark} {r['threshold']:>9.2f}  {r['exit_rate'] * 100:>5.1f}%  "
+              f"{r['accuracy'] * 100:>7.2f}%  {speedup:>7}", file=sys.stderr)
+    print("   (* chosen, x outside the accuracy bound, - no speedup)", file=sys.stderr)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Calibrate the food detector cascade')
+    parser.add_argument('val_dir', help='Labelled validation folder (<dir>/<class>/<image>)')
+    parser.add_argument('--model', default=str(backend_dir / 'ml_models' / 'north_indian_food_model.h5'))
+    parser.add_argument('--stage1', default=str(backend_dir / 'ml_models' / 'north_indian_food_stage1.h5'))
+    parser.add_argument('--train-dir', help='Train the first stage on this labelled folder first')
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--input-size', type=int, default=NorthIndianFoodDetector.STAGE1_INPUT_SIZE)
+    parser.add_argument('--alpha', type=float, default=NorthIndianFoodDetector.STAGE1_ALPHA)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01,
+                        help='Allowed accuracy loss versus the full model')
+    parser.add_argument('--min-exit-rate', type=float, default=0.0,
+                        help='Only pick thresholds whose stage 1 exit rate is above this')
+    parser.add_argument('--min-speedup', type=float, default=1.0,
+                        help='Only pick thresholds whose expected speedup is above this')
+    parser.add_argument('--report', help='Write the JSON report here (default: stdout)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not Path(args.model).exists():
+        # Calibrating against an untrained full model would pick a meaningless threshold
+        print(f"✗ Full model not found: {args.model}", file=sys.stderr)
+        sys.exit(1)
+    detector = NorthIndianFoodDetector(args.model, cascade_model_path=args.stage1)
+
+    # A freshly built stage 1 is only fit to install once --train-dir trained it;
+    # the detector loads north_indian_food_stage1.h5 on its own
+    trained = detector.stage1_model is not None or bool(args.train_dir)
+    if args.train_dir or detector.stage1_model is None:
+        if detector.stage1_model is None:
+            detector.create_cascade_model(args.input_size, args.alpha)
+        if args.train_dir:
+            train_items = list(iter_labelled_images(args.train_dir, detector.food_classes))
+            train_stage1(detector, train_items, args.epochs, args.batch_size)
+        else:
+            print("⚠️ Stage 1 is untrained; pass --train-dir to fit it (it will not be saved)",
+                  file=sys.stderr)
+
+    items = list(iter_labelled_images(args.val_dir, detector.food_classes))
+    if not items:
+        print(f"✗ No labelled images found in {args.val_dir}", file=sys.stderr)
+        sys.exit(1)
+    print(f"📊 Scoring {len(items)} validation images...", file=sys.stderr)
+    detector.warm_up()
+
+    p1, p2, labels, stage1_ms, stage2_ms = score_validation(detector, items, args.batch_size)
+    thresholds = np.round(np.arange(0.30, 1.0, 0.01), 2)
+    full_accuracy, rows = sweep_thresholds(p1, p2, labels, stage1_ms, stage2_ms, thresholds)
+    chosen = choose_threshold(rows, full_accuracy, args.max_accuracy_drop,
+                              args.min_exit_rate, args.min_speedup)
+    print_curve(rows, chosen, full_accuracy, args.max_accuracy_drop,
+                args.min_exit_rate, args.min_speedup)
+
+    report = {
+        'images': len(items),
+        'full_model_accuracy': round(full_accuracy, 4),
+        'stage1_accuracy': round(float(np.mean(p1.argmax(axis=1) == labels)), 4),
+        'stage1_ms_per_image': round(stage1_ms, 3),
+        'stage2_ms_per_image': round(stage2_ms, 3),
+        'max_accuracy_drop': args.max_accuracy_drop,
+        'min_exit_rate': args.min_exit_rate,
+        'min_speedup': args.min_speedup,
+        'stage1_trained': trained,
+        'chosen': chosen,
+        'saved': bool(chosen and trained),
+        'curve': rows
+    }
+
+    if not trained:
+        print("✗ Stage 1 was not trained (--train-dir); cascade not saved", file=sys.stderr)
+    elif chosen:
+        detector.save_cascade(args.stage1, chosen['threshold'])
+        print(f"✓ Threshold {chosen['threshold']}: exit rate {chosen['exit_rate'] * 100:.1f}%, "
+              f"accuracy {chosen['accuracy'] * 100:.2f}% (full model {full_accuracy * 100:.2f}%)",
+              file=sys.stderr)
+    else:
+        print("✗ No threshold keeps accuracy within the allowed drop and pays off; cascade not saved",
+              file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.report:
+        Path(args.report).write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+-- Migration: Add rank_changes table
+-- Purpose: Log of rank changes written by the daily XP rollover (bulk-progression.py rollover)
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS rank_changes (
+  id BIGSERIAL PRIMARY KEY,
+  user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  old_rank TEXT NOT NULL,
+  new_rank TEXT NOT NULL,
+  old_level INTEGER NOT NULL,
+  new_level INTEGER NOT NULL,
+  xp_gain BIGINT NOT NULL,
+  changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Per-user history lookups, newest first
+CREATE INDEX IF NOT EXISTS idx_rank_changes_user ON rank_changes(user_id, changed_at);
+
+COMMENT ON TABLE rank_changes IS 'One row per rank change found by the daily XP rollover';
+COMMENT ON COLUMN rank_changes.xp_gain IS 'XP moved from xp_today into total_xp by that rollover';
+
+COMMIT;
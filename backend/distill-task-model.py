@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Task Model Distillation
+Trains a small student network to reproduce the task generation network's
+five heads, for latency-critical paths (MLTaskGenerator(model_variant='student'))
+
+The teacher labels points sampled from feature space: synthetic user profiles,
+the same profiles with every column shuffled independently (off-manifold
+combinations within realistic marginals) and Gaussian jitter on the continuous
+columns. The student learns the teacher's soft outputs, is exported as plain
+NumPy weights (fitness_model_student.npz) next to the teacher, and shares the
+teacher's feature preprocessor.
+
+Usage:
+  python distill-task-model.py
+  python distill-task-model.py --teacher-dir ml_models/candidate --samples 400000 --hidden 64 32
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir / 'services'))
+
+from taskModel import (
+    CATEGORY_CLASSES, DIFFICULTY_CLASSES, DURATION_RANGE, FEATURE_NAMES, OUTPUT_NAMES,
+    STAT_NAMES, STAT_SCALE, XP_RANGE, StudentTaskModel, build_student_model
+)
+
+# Encoded categorical columns (gender .. primary_goal) keep their integer codes
+CATEGORICAL_COLUMNS = FEATURE_NAMES.index('gender')
+JITTER = 0.1
+
+
+def sample_feature_space(count, seed):
+    """Raw 19-feature rows: one third each profiles, column-shuffled profiles, jittered profiles"""
+    from mlTaskGenerator import MLTaskGenerator
+    from syntheticData import synthetic_users
+
+    rng = np.random.default_rng(seed)
+    base = np.stack([MLTaskGenerator._build_features(u) for u in synthetic_users(count, seed)])
+    third = count // 3
+
+    shuffled = base[third:2 * third].copy()
+    for col in range(shuffled.shape[1]):
+        shuffled[:, col] = rng.permutation(shuffled[:, col])
+
+    jittered = base[2 * third:].copy()
+    continuous = jittered[:, :CATEGORICAL_COLUMNS]
+    scale = base[:, :CATEGORICAL_COLUMNS].std(axis=0) * JITTER
+    jittered[:, :CATEGORICAL_COLUMNS] = np.maximum(continuous + rng.normal(0, 1, continuous.shape) * scale, 0)
+
+    return np.concatenate([base[:third], shuffled, jittered]).astype(np.float32)
+
+
+def teacher_outputs(model, x, batch_size=4096):
+    """Teacher head outputs for scaled rows, in OUTPUT_NAMES order"""
+    outputs = model.predict(x, batch_size=batch_size, verbose=0)
+    return [np.asarray(o, dtype=np.float32) for o in outputs]
+
+
+def fidelity(teacher, student):
+    """How closely student outputs reproduce the teacher's decoded tasks"""
+    t_cat, t_diff, t_xp, t_dur, t_stats = teacher
+    s_cat, s_diff, s_xp, s_dur, s_stats = student
+    xp_span = XP_RANGE[1] - XP_RANGE[0]
+    dur_span = DURATION_RANGE[1] - DURATION_RANGE[0]
+
+    def stat_points(y):
+        return np.clip(np.round(y * STAT_SCALE), 1, 3)
+
+    category_match = t_cat.argmax(1) == s_cat.argmax(1)
+    difficulty_match = t_diff.argmax(1) == s_diff.argmax(1)
+    xp_error = np.abs(t_xp - s_xp)[:, 0] * xp_span
+    duration_error = np.abs(t_dur - s_dur)[:, 0] * dur_span
+    return {
+        'samples': int(len(t_cat)),
+        'category_agreement': round(float(category_match.mean()), 4),
+        'difficulty_agreement': round(float(difficulty_match.mean()), 4),
+        'category_and_difficulty_agreement': round(float((category_match & difficulty_match).mean()), 4),
+        'category_max_prob_error': round(float(np.abs(t_cat - s_cat).max(1).mean()), 4),
+        'xp_mae': round(float(xp_error.mean()), 2),
+        'xp_p95_error': round(float(np.percentile(xp_error, 95)), 2),
+        'duration_mae_minutes': round(float(duration_error.mean()), 2),
+        'duration_p95_error_minutes': round(float(np.percentile(duration_error, 95)), 2),
+        'stat_reward_agreement': round(float((stat_points(t_stats) == stat_points(s_stats)).mean()), 4),
+        'stat_rewards_all_match': round(float((stat_points(t_stats) == stat_points(s_stats)).all(1).mean()), 4)
+    }
+
+
+def single_row_latency(model, x, runs=200):
+    """Median single-row predict() latency in milliseconds (model or serving predictor)"""
+    model.predict(x[:1], verbose=0)
+    times = []
+    for i in range(runs):
+        row = x[i % len(x)].reshape(1, -1)
+        started = time.perf_counter()
+        model.predict(row, verbose=0)
+        times.append(time.perf_counter() - started)
+    return round(float(np.median(times)) * 1000, 3)
+
+
+def distill(args):
+    import tensorflow as tf
+    from mlTaskGenerator import MLTaskGenerator
+
+    tf.keras.utils.set_random_seed(args.seed)
+    teacher_dir = Path(args.teacher_dir)
+    generator = MLTaskGenerator(model_dir=str(teacher_dir))
+    teacher = generator.model
+    # Latency is compared against what serves the teacher (BucketedPredictor)
+    generator.warm_up()
+
+    started = time.perf_counter()
+    raw = sample_feature_space(args.samples, args.seed)
+    x = generator.preprocessor.transform(raw)
+    targets = teacher_outputs(teacher, x)
+    print(f"✓ Teacher labelled {len(x)} samples in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    # Validation samples pick the early-stopping weights; the fidelity report
+    # and the --min-agreement gate use a separate held-out test split
+    order = np.random.default_rng(args.seed).permutation(len(x))
+    num_val = int(len(x) * args.val_fraction)
+    num_test = int(len(x) * args.test_fraction)
+    test_idx = order[:num_test]
+    val_idx = order[num_test:num_test + num_val]
+    train_idx = order[num_test + num_val:]
+
+    model = build_student_model(hidden=tuple(args.hidden), learning_rate=args.learning_rate)
+    history = model.fit(
+        x[train_idx], {name: t[train_idx] for name, t in zip(OUTPUT_NAMES, targets)},
+        validation_data=(x[val_idx], {name: t[val_idx] for name, t in zip(OUTPUT_NAMES, targets)}),
+        epochs=args.epochs, batch_size=args.batch_size, verbose=2,
+        callbacks=[tf.keras.callbacks.EarlyStopping(patience=3, restore_best_weights=True)]
+    )
+
+    student = StudentTaskModel.from_keras(model)
+    report = {
+        'teacher_dir': str(teacher_dir),
+        'samples': len(x),
+        'test_samples': len(test_idx),
+        'hidden': list(args.hidden),
+        'epochs_run': len(history.history['loss']),
+        'seed': args.seed,
+        'teacher_params': int(teacher.count_params()),
+        'student_params': student.count_params(),
+        'fidelity': fidelity([t[test_idx] for t in targets], student.predict(x[test_idx])),
+        'latency_ms': {
+            'teacher': single_row_latency(generator.predictor, x[test_idx]),
+            'student': single_row_latency(student, x[test_idx])
+        },
+        'distill_seconds': round(time.perf_counter() - started, 1)
+    }
+
+    f = report['fidelity']
+    print(f"✓ Student {report['student_params']} params (teacher {report['teacher_params']}): "
+          f"category {f['category_agreement']:.1%}, difficulty {f['difficulty_agreement']:.1%}, "
+          f"xp MAE {f['xp_mae']}, duration MAE {f['duration_mae_minutes']} min", file=sys.stderr)
+    print(f"   single-row latency {report['latency_ms']['teacher']}ms -> "
+          f"{report['latency_ms']['student']}ms", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+    if f['category_agreement'] < args.min_agreement:
+        print(f"⚠️ Category agreement below {args.min_agreement:.0%}; student not saved. "
+              f"Try a wider --hidden or more --samples", file=sys.stderr)
+        return 1
+
+    # Write beside the live student, then swap it in, so a serving process
+    # never loads a partly written file
+    out = Path(args.output_dir or teacher_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    staged = out / 'fitness_model_student.tmp.npz'
+    student.save(staged)
+    os.replace(staged, out / 'fitness_model_student.npz')
+    (out / 'student_metadata.json').write_text(json.dumps(report, indent=2))
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Distill the task generation network into a small student')
+    parser.add_argument('--teacher-dir', default=str(backend_dir / 'ml_models'),
+                        help='Directory with fitness_model.pkl and feature_preprocessor.pkl')
+    parser.add_argument('--output-dir', help='Where to write the student (default: the teacher directory)')
+    parser.add_argument('--samples', type=int, default=200000)
+    parser.add_argument('--hidden', type=int, nargs='+', default=[32, 16], help='Student hidden layer sizes')
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=512)
+    parser.add_argument('--learning-rate', type=float, default=2e-3)
+    parser.add_argument('--val-fraction', type=float, default=0.1, help='Early-stopping validation share')
+    parser.add_argument('--test-fraction', type=float, default=0.1,
+                        help='Held-out share for the fidelity report and --min-agreement')
+    parser.add_argument('--min-agreement', type=float, default=0.95,
+                        help='Exit non-zero when category agreement falls below this')
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    sys.exit(distill(parse_args()))
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+ML Load Generator
+Replays synthetic traffic against the task generator and the food detector
+at a target request rate (open loop: arrivals never wait for completions)
+and reports latency percentiles, error rates and saturation throughput
+for a given worker configuration
+
+Usage:
+  python load-test-ml.py --target tasks --rps 20 --duration 30 --workers 4
+  python load-test-ml.py --target food --rps 5 --image-dir ./photos
+  python load-test-ml.py --target mixed --sweep --workers 2 --slo-ms 1000
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir / 'services'))
+
+from syntheticData import synthetic_users, synthetic_image_corpus
+
+
+class Colors:
+    RESET = '\033[0m'
+    GREEN = '\033[32m'
+    YELLOW = '\033[33m'
+    BLUE = '\033[36m'
+    RED = '\033[31m'
+    MAGENTA = '\033[35m'
+
+
+def log(message, color='RESET'):
+    print(f"{getattr(Colors, color)}{message}{Colors.RESET}", file=sys.stderr)
+
+
+def build_targets(args):
+    """Name -> (callable, payload list) for the requested target(s)"""
+    targets = {}
+
+    if args.target in ('tasks', 'mixed'):
+        from mlTaskGenerator import MLTaskGenerator
+        generator = MLTaskGenerator()
+        users = synthetic_users(args.users, seed=args.seed)
+        log(f"👥 {len(users)} synthetic users", 'YELLOW')
+        targets['tasks'] = (generator.generate_task, users)
+
+    if args.target in ('food', 'mixed'):
+        from northIndianFoodDetector import NorthIndianFoodDetector
+        model_path = Path(args.model_path) if args.model_path else backend_dir / 'ml_models' / 'north_indian_food_model.h5'
+        detector = NorthIndianFoodDetector(str(model_path) if model_path.exists() else None)
+
+        if args.image_dir:
+            images = sorted(str(p) for p in Path(args.image_dir).iterdir()
+                            if p.suffix.lower() in ('.jpg', '.jpeg', '.png', '.webp'))
+        else:
+            corpus_dir = Path(tempfile.gettempdir()) / 'forge-load-test-images'
+            images = synthetic_image_corpus(str(corpus_dir), args.images, seed=args.seed)
+        log(f"🖼️  {len(images)} images in corpus", 'YELLOW')
+
+        def detect(path):
+            result = detector.detect_food(path)
+            if result.get('status') in ('error', 'failed'):
+                raise RuntimeError(result.get('error', 'detection failed'))
+            return result
+
+        targets['food'] = (detect, images)
+
+    return targets
+
+
+def warm_up(targets):
+    """One call per target so model tracing is not counted as load"""
+    for name, (fn, payloads) in targets.items():
+        start = time.perf_counter()
+        fn(payloads[0])
+        log(f"🔥 Warmed up {name} in {(time.perf_counter() - start) * 1000:.0f}ms", 'YELLOW')
+
+
+def run_open_loop(targets, rps, duration, workers, food_share=0.5, max_outstanding=None,
+                  arrival='poisson', seed=0):
+    """Fire requests on a fixed arrival schedule regardless of completions"""
+    rng = np.random.default_rng(seed)
+    names = list(targets)
+    weights = None
+    if len(names) == 2:
+        weights = [1 - food_share, food_share] if names[0] == 'tasks' else [food_share, 1 - food_share]
+    max_outstanding = max_outstanding or workers * 50
+
+    results = []
+    results_lock = threading.Lock()
+    outstanding = [0]
+    dropped = [0]
+
+    def timed_call(name, fn, payload, scheduled):
+        started = time.perf_counter()
+        error = None
+        try:
+            fn(payload)
+        except Exception as e:
+            error = str(e)
+        finished = time.perf_counter()
+        with results_lock:
+            outstanding[0] -= 1
+            # Latency from the scheduled arrival includes queueing delay
+            results.append((name, finished - scheduled, finished - started, error, finished))
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    start = time.perf_counter()
+    next_arrival = start
+    sent = 0
+    counters = {name: 0 for name in names}
+
+    while True:
+        gap = rng.exponential(1 / rps) if arrival == 'poisson' else 1 / rps
+        next_arrival += gap
+        if next_arrival - start >= duration:
+            break
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        name = names[0] if len(names) == 1 else str(rng.choice(names, p=weights))
+        fn, payloads = targets[name]
+        payload = payloads[counters[name] % len(payloads)]
+        counters[name] += 1
+        sent += 1
+
+        with results_lock:
+            if outstanding[0] >= max_outstanding:
+                dropped[0] += 1
+                continue
+            outstanding[0] += 1
+        executor.submit(timed_call, name, fn, payload, next_arrival)
+
+    executor.shutdown(wait=True)
+    return summarize(results, sent, dropped[0], rps, duration, start)
+
+
+def _percentiles(values_ms):
+    if not values_ms:
+        return {}
+    arr = np.asarray(values_ms)
+    return {
+        'p50_ms': round(float(np.percentile(arr, 50)), 2),
+        'p90_ms': round(float(np.percentile(arr, 90)), 2),
+        'p95_ms': round(float(np.percentile(arr, 95)), 2),
+        'p99_ms': round(float(np.percentile(arr, 99)), 2),
+        'max_ms': round(float(arr.max()), 2),
+        'mean_ms': round(float(arr.mean()), 2)
+    }
+
+
+def summarize(results, sent, dropped, rps, duration, start):
+    completed = [r for r in results if r[3] is None]
+    errors = [r for r in results if r[3] is not None]
+    last_finish = max((r[4] for r in results), default=start + duration)
+    wall = max(duration, last_finish - start)
+
+    summary = {
+        'offered_rps': rps,
+        'arrival_rps': round(sent / duration, 2),
+        'sent': sent,
+        'completed': len(completed),
+        'errors': len(errors),
+        'dropped': dropped,
+        'error_rate': round((len(errors) + dropped) / sent, 4) if sent else 0.0,
+        'throughput_rps': round(len(completed) / wall, 2),
+        'latency': _percentiles([r[1] * 1000 for r in completed]),
+        'service_time': _percentiles([r[2] * 1000 for r in completed]),
+        'per_target': {}
+    }
+    for name in sorted({r[0] for r in results}):
+        mine = [r for r in results if r[0] == name]
+        ok = [r for r in mine if r[3] is None]
+        summary['per_target'][name] = {
+            'completed': len(ok),
+            'errors': len(mine) - len(ok),
+            'latency': _percentiles([r[1] * 1000 for r in ok])
+        }
+    if errors:
+        summary['sample_errors'] = sorted({r[3] for r in errors})[:5]
+    return summary
+
+
+def saturation_sweep(targets, args):
+    """Raise the offered rate until throughput, errors or p99 give out"""
+    rps = args.rps
+    steps = []
+    while rps <= args.max_rps:
+        log(f"\n📈 Offered load: {rps:.1f} rps", 'BLUE')
+        result = run_open_loop(targets, rps, args.duration, args.workers, args.food_share,
+                               args.max_outstanding, args.arrival, args.seed)
+        print_summary(result)
+        steps.append(result)
+
+        p99 = result['latency'].get('p99_ms', float('inf'))
+        saturated = (
+            result['throughput_rps'] < 0.9 * result['arrival_rps'] or
+            result['error_rate'] > args.max_error_rate or
+            (args.slo_ms and p99 > args.slo_ms)
+        )
+        if saturated:
+            break
+        rps *= args.step
+
+    healthy = [s for s in steps if s['error_rate'] <= args.max_error_rate and
+               (not args.slo_ms or s['latency'].get('p99_ms', float('inf')) <= args.slo_ms)]
+    return {
+        'workers': args.workers,
+        'saturation_throughput_rps': max((s['throughput_rps'] for s in healthy), default=0.0),
+        'steps': steps
+    }
+
+
+def print_summary(result):
+    lat = result['latency']
+    color = 'GREEN' if result['error_rate'] == 0 else 'RED'
+    log(f"   Sent: {result['sent']}  Completed: {result['completed']}  "
+        f"Errors: {result['errors']}  Dropped: {result['dropped']}", color)
+    log(f"   Throughput: {result['throughput_rps']:.2f} rps (offered {result['offered_rps']:.2f})", 'YELLOW')
+    if lat:
+        log(f"   Latency p50={lat['p50_ms']}ms p95={lat['p95_ms']}ms p99={lat['p99_ms']}ms max={lat['max_ms']}ms", 'YELLOW')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Open-loop load generator for the ML services')
+    parser.add_argument('--target', choices=['tasks', 'food', 'mixed'], default='tasks')
+    parser.add_argument('--rps', type=float, default=10.0, help='Offered request rate (start rate when sweeping)')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds per run')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent inference workers (threads)')
+    parser.add_argument('--users', type=int, default=1000, help='Synthetic user population size')
+    parser.add_argument('--images', type=int, default=50, help='Synthetic image corpus size')
+    parser.add_argument('--image-dir', help='Use real images from this directory instead')
+    parser.add_argument('--model-path', help='Food model (.h5) to load')
+    parser.add_argument('--food-share', type=float, default=0.3, help='Fraction of food requests in mixed mode')
+    parser.add_argument('--arrival', choices=['poisson', 'uniform'], default='poisson')
+    parser.add_argument('--max-outstanding', type=int, help='Drop arrivals beyond this many in flight')
+    parser.add_argument('--sweep', action='store_true', help='Find saturation throughput')
+    parser.add_argument('--step', type=float, default=1.5, help='Rate multiplier between sweep steps')
+    parser.add_argument('--max-rps', type=float, default=1000.0)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--slo-ms', type=float, help='p99 latency objective for the sweep')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Write the report to this file')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    log('\n' + '═' * 80, 'BLUE')
+    log('🚦 ML LOAD GENERATOR', 'MAGENTA')
+    log(f"Target: {args.target}  Workers: {args.workers}  Arrivals: {args.arrival}", 'BLUE')
+    log('═' * 80 + '\n', 'BLUE')
+
+    targets = build_targets(args)
+    warm_up(targets)
+
+    if args.sweep:
+        report = saturation_sweep(targets, args)
+        log(f"\n🏁 Saturation throughput: {report['saturation_throughput_rps']:.2f} rps "
+            f"with {args.workers} workers", 'GREEN')
+    else:
+        report = run_open_loop(targets, args.rps, args.duration, args.workers, args.food_share,
+                               args.max_outstanding, args.arrival, args.seed)
+        report['workers'] = args.workers
+        print_summary(report)
+
+    report['target'] = args.target
+    output = json.dumps(report, indent=2)
+    if args.json:
+        Path(args.json).write_text(output)
+        log(f"\n✓ Report written to {args.json}", 'GREEN')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(130)
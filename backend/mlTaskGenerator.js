@@ -1,12 +1,12 @@
 /**
  * ML Task Generator - JavaScript Implementation
- * Loads pickle models, processes user data, generates tasks, and stores in database
+ * Loads user data, generates tasks with the persistent model worker, and stores in database
  */
 
-import { spawn } from 'child_process';
 import path from 'path';
 import { Pool } from 'pg';
 import { fileURLToPath } from 'url';
+import { BinaryWorker, taskWorkerScript } from './services/binaryIpcClient.js';
 
 // Initialize database connection pool
 const pool = new Pool({
@@ -49,237 +49,94 @@ async function loadUserProfile(userId) {
 }
 
 /**
- * STEP 2: Load ML models from pickle files
- * @returns {Promise<Object>} Loaded model and preprocessor
+ * STEP 2: Normalize user columns to the task model's input format
+ * The users table stores levels in lower case ('beginner', 'very_active');
+ * the model encodes the labels used by mlTaskGenerator.py.
+ * @param {Object} userProfile - User profile data
+ * @returns {Object} Profile accepted by taskFeatureRow
  */
-async function loadMLModels() {
-  return new Promise((resolve, reject) => {
-    const pythonScript = `
-import pickle
-import json
-from pathlib import Path
+function prepareModelProfile(userProfile) {
+  const fitnessLevelMap = {
+    'beginner': 'Beginner',
+    'intermediate': 'Intermediate',
+    'advanced': 'Advanced',
+    'expert': 'Expert'
+  };
 
-try:
-    model_path = Path(r'backend/ml_models/fitness_model.pkl')
-    preprocessor_path = Path(r'backend/ml_models/feature_preprocessor.pkl')
-    
-    # Load model
-    with open(model_path, 'rb') as f:
-        model = pickle.load(f)
-    
-    # Load preprocessor
-    with open(preprocessor_path, 'rb') as f:
-        preprocessor = pickle.load(f)
-    
-    result = {
-        'status': 'success',
-        'model_type': str(type(model).__name__),
-        'model_loaded': True,
-        'preprocessor_loaded': True
-    }
-    
-    print(json.dumps(result))
-except Exception as e:
-    print(json.dumps({'status': 'error', 'message': str(e)}))
-`;
-    
-    const python = spawn('python', ['-c', pythonScript]);
-    let output = '';
-    
-    python.stdout.on('data', (data) => {
-      output += data.toString();
-    });
-    
-    python.on('close', (code) => {
-      if (code === 0) {
-        try {
-          const result = JSON.parse(output);
-          if (result.status === 'success') {
-            console.log('✅ ML models loaded successfully');
-            resolve(result);
-          } else {
-            reject(new Error(result.message));
-          }
-        } catch (e) {
-          reject(new Error(`Failed to parse model load response: ${output}`));
-        }
-      } else {
-        reject(new Error(`Python process failed with code ${code}`));
-      }
-    });
-  });
+  const activityLevelMap = {
+    'sedentary': 'Sedentary',
+    'low': 'Light',
+    'light': 'Light',
+    'moderate': 'Moderate',
+    'high': 'Very Active',
+    'very_active': 'Very Active',
+    'very active': 'Very Active'
+  };
+
+  const level = (mapping, value) => (value ? mapping[String(value).toLowerCase()] : undefined);
+
+  return {
+    ...userProfile,
+    fitness_level: level(fitnessLevelMap, userProfile.fitness_level),
+    activity_level: level(activityLevelMap, userProfile.activity_level)
+  };
 }
 
+// Persistent task model worker (binary IPC), started on first use
+let taskWorker = null;
+
+// In-flight generate-and-store runs keyed by user|day|slot
+const inflightTasks = new Map();
+
 /**
- * STEP 3: Prepare feature vector from user data
- * @param {Object} userProfile - User profile data
- * @returns {Array} Feature vector (15 dimensions)
+ * STEP 3: Generate one task per profile with the persistent neural network worker
+ * Features cross as a float32 matrix and tasks return as packed records,
+ * so the model loads once per process instead of once per request.
+ * @param {Array<Object>} userProfiles - Profiles in mlTaskGenerator.py input format
+ * @param {Object} options - { deterministic, day, slots } (see BinaryWorker.generateTasks)
+ * @returns {Promise<Array<Object>>} Tasks (exercise_name, category, difficulty, xp, ...)
  */
-function prepareFeatureVector(userProfile) {
-  try {
-    // Map fitness level and activity level to numeric values
-    const fitnessLevelMap = {
-      'beginner': 0,
-      'intermediate': 1,
-      'advanced': 2
-    };
-    
-    const activityLevelMap = {
-      'sedentary': 0,
-      'low': 1,
-      'moderate': 2,
-      'high': 3,
-      'very_active': 4
-    };
-    
-    const features = [
-      userProfile.age || 30,
-      userProfile.height || 175,
-      userProfile.weight || 75,
-      userProfile.fitness_level ? fitnessLevelMap[userProfile.fitness_level.toLowerCase()] || 1 : 1,
-      userProfile.activity_level ? activityLevelMap[userProfile.activity_level.toLowerCase()] || 1 : 1,
-      userProfile.strength || 50,
-      userProfile.constitution || 55,
-      userProfile.dexterity || 45,
-      userProfile.wisdom || 60,
-      userProfile.charisma || 48,
-      userProfile.total_xp || 0,
-      userProfile.level || 1,
-      userProfile.bmi || 24.5,
-      userProfile.sleep_quality || 7,
-      userProfile.stress_level || 5
-    ];
-    
-    console.log('✅ Feature vector prepared:', features);
-    return features;
-  } catch (error) {
-    console.error('❌ Error preparing feature vector:', error.message);
-    throw error;
+async function generateTasksForProfiles(userProfiles, options = {}) {
+  if (!taskWorker) {
+    taskWorker = new BinaryWorker(taskWorkerScript);
   }
+  return taskWorker.generateTasks(userProfiles, options);
 }
 
 /**
- * STEP 4: Run ML inference using Python subprocess
- * @param {Array} features - Feature vector
- * @returns {Promise<Object>} ML model prediction
+ * Next task slot for a user today: the number of tasks already scheduled
+ * @param {string} userId - User ID
+ * @returns {Promise<{day: string, slot: number}>} Day (YYYY-MM-DD) and slot
  */
-async function runMLInference(features) {
-  return new Promise((resolve, reject) => {
-    const pythonScript = `
-import pickle
-import numpy as np
-import json
-from pathlib import Path
-
-try:
-    # Load models
-    model_path = Path(r'backend/ml_models/fitness_model.pkl')
-    preprocessor_path = Path(r'backend/ml_models/feature_preprocessor.pkl')
-    
-    with open(model_path, 'rb') as f:
-        model = pickle.load(f)
-    
-    with open(preprocessor_path, 'rb') as f:
-        preprocessor = pickle.load(f)
-    
-    # Prepare features
-    features = np.array(${JSON.stringify(features)}, dtype=np.float32).reshape(1, -1)
-    
-    # Scale features
-    features_scaled = preprocessor.transform(features)
-    
-    # Run inference
-    prediction = model.predict(features_scaled, verbose=0)
-    
-    # Extract outputs
-    difficulty = int(np.argmax(prediction[0, :3])) + 1
-    xp_reward = int(abs(prediction[0, 3]) * 10) if len(prediction[0]) > 3 else 100
-    category_idx = int(np.argmax(prediction[0, 4:]) if len(prediction[0]) > 4 else 0)
-    
-    result = {
-        'status': 'success',
-        'difficulty': difficulty,
-        'xp_reward': xp_reward,
-        'category_idx': category_idx,
-        'raw_output': prediction[0].tolist()
-    }
-    
-    print(json.dumps(result))
-except Exception as e:
-    print(json.dumps({'status': 'error', 'message': str(e)}))
-`;
-    
-    const python = spawn('python', ['-c', pythonScript]);
-    let output = '';
-    let errorOutput = '';
-    
-    python.stdout.on('data', (data) => {
-      output += data.toString();
-    });
-    
-    python.stderr.on('data', (data) => {
-      errorOutput += data.toString();
-    });
-    
-    python.on('close', (code) => {
-      if (code === 0) {
-        try {
-          const result = JSON.parse(output);
-          if (result.status === 'success') {
-            console.log('✅ ML inference completed');
-            resolve(result);
-          } else {
-            reject(new Error(result.message));
-          }
-        } catch (e) {
-          reject(new Error(`Failed to parse inference output: ${output}`));
-        }
-      } else {
-        reject(new Error(`ML inference failed: ${errorOutput}`));
-      }
-    });
-  });
+async function nextTaskSlot(userId) {
+  const result = await pool.query(
+    `SELECT CURRENT_DATE::text AS day, COUNT(*)::int AS slot
+     FROM tasks
+     WHERE user_id = $1 AND scheduled_date = CURRENT_DATE`,
+    [userId]
+  );
+  return result.rows[0];
 }
 
 /**
- * STEP 5: Map inference output to task parameters
- * @param {Object} inference - ML model output
+ * STEP 4: Map a worker task to the tasks table columns
+ * @param {Object} generated - Task returned by generateTasksForProfiles
  * @returns {Object} Task parameters
  */
-function mapInferenceToTask(inference) {
+function mapGeneratedTask(generated) {
   try {
-    const categories = ['strength', 'cardio', 'flexibility', 'health', 'hiit'];
-    const exercises = {
-      strength: ['Push-ups', 'Deadlifts', 'Squats', 'Bench Press', 'Pull-ups'],
-      cardio: ['Running', 'Cycling', 'Jump Rope', 'Rowing', 'Swimming'],
-      flexibility: ['Yoga', 'Stretching', 'Pilates', 'Tai Chi', 'Foam Rolling'],
-      health: ['Meditation', 'Nutrition Planning', 'Sleep Tracking', 'Hydration', 'Breathing'],
-      hiit: ['Burpees', 'Mountain Climbers', 'Sprints', 'Box Jumps', 'Kettlebell Swings']
-    };
-    
-    const category = categories[inference.category_idx % categories.length];
-    const categoryExercises = exercises[category];
-    const title = categoryExercises[Math.floor(Math.random() * categoryExercises.length)];
-    
-    // Calculate stat rewards based on category and difficulty
-    const statRewards = {
-      strength: category === 'strength' || category === 'hiit' ? Math.floor(inference.xp_reward * 0.3) : 0,
-      constitution: category === 'cardio' || category === 'hiit' ? Math.floor(inference.xp_reward * 0.3) : 0,
-      dexterity: (category === 'hiit' || category === 'flexibility') ? Math.floor(inference.xp_reward * 0.2) : 0,
-      wisdom: category === 'health' ? Math.floor(inference.xp_reward * 0.3) : 0,
-      charisma: 0
-    };
-    
+    const difficulties = ['easy', 'medium', 'hard'];
+
     const task = {
-      title,
-      category,
-      difficulty: inference.difficulty,
-      xp_reward: inference.xp_reward,
-      duration: (inference.difficulty * 10) + Math.floor(Math.random() * 10),
-      stat_rewards: statRewards
+      title: generated.exercise_name,
+      category: generated.category,
+      difficulty: difficulties.indexOf(generated.difficulty) + 1,
+      xp_reward: generated.xp,
+      duration: generated.duration,
+      stat_rewards: generated.stat_rewards
     };
-    
-    console.log('✅ Task mapped from inference:', task);
+
+    console.log('✅ Task mapped from model output:', task);
     return task;
   } catch (error) {
     console.error('❌ Error mapping task:', error.message);
@@ -288,7 +145,7 @@ function mapInferenceToTask(inference) {
 }
 
 /**
- * STEP 6: Store task in database
+ * STEP 5: Store task in database
  * @param {string} userId - User ID
  * @param {Object} task - Task data
  * @returns {Promise<Object>} Stored task with ID and timestamp
@@ -337,11 +194,23 @@ async function storeTaskInDatabase(userId, task) {
 }
 
 /**
- * MAIN FUNCTION: Load user data → Run ML model → Generate task → Store in DB
+ * MAIN FUNCTION: Load user data → Run ML worker → Generate task → Store in DB
+ * The task is keyed by (user, day, slot): a retry after a failed store gets
+ * the same task, and concurrent requests for the same slot share one run.
  * @param {string} userId - User ID
  * @returns {Promise<Object>} Generated and stored task
  */
 async function generateAndStoreTask(userId) {
+  const { day, slot } = await nextTaskSlot(userId);
+  const key = `${userId}|${day}|${slot}`;
+  if (!inflightTasks.has(key)) {
+    const run = runTaskPipeline(userId, day, slot).finally(() => inflightTasks.delete(key));
+    inflightTasks.set(key, run);
+  }
+  return inflightTasks.get(key);
+}
+
+async function runTaskPipeline(userId, day, slot) {
   try {
     console.log('\n' + '='.repeat(80));
     console.log('🎯 STARTING ML TASK GENERATION PIPELINE');
@@ -352,28 +221,23 @@ async function generateAndStoreTask(userId) {
     const userProfile = await loadUserProfile(userId);
     console.log(`   User: ${userProfile.email}, Level: ${userProfile.level}`);
     
-    // STEP 2: Load ML models
-    console.log('\n🤖 STEP 2: Loading ML models...');
-    const models = await loadMLModels();
-    console.log(`   Model type: ${models.model_type}`);
-    
-    // STEP 3: Prepare features
-    console.log('\n📝 STEP 3: Preparing feature vector...');
-    const features = prepareFeatureVector(userProfile);
-    console.log(`   Features: ${features.length} dimensions`);
+    // STEP 2: Prepare model input
+    const modelProfile = prepareModelProfile(userProfile);
     
-    // STEP 4: Run inference
-    console.log('\n⚙️  STEP 4: Running ML inference...');
-    const inference = await runMLInference(features);
-    console.log(`   Difficulty: ${inference.difficulty}, XP: ${inference.xp_reward}`);
+    // STEP 3: Run inference
+    console.log('\n⚙️  STEP 3: Running ML inference...');
+    const [generated] = await generateTasksForProfiles([modelProfile], {
+      deterministic: true, day, slots: [slot]
+    });
+    console.log(`   Difficulty: ${generated.difficulty}, XP: ${generated.xp}`);
     
-    // STEP 5: Map to task
-    console.log('\n📋 STEP 5: Mapping to task parameters...');
-    const task = mapInferenceToTask(inference);
+    // STEP 4: Map to task
+    console.log('\n📋 STEP 4: Mapping to task parameters...');
+    const task = mapGeneratedTask(generated);
     console.log(`   Task: ${task.title} (${task.category}) - ${task.difficulty}⭐`);
     
-    // STEP 6: Store in database
-    console.log('\n💾 STEP 6: Storing task in database...');
+    // STEP 5: Store in database
+    console.log('\n💾 STEP 5: Storing task in database...');
     const storedTask = await storeTaskInDatabase(userId, task);
     console.log(`   Stored with ID: ${storedTask.id}`);
     
@@ -483,10 +347,9 @@ export {
   getRecentTasks,
   deleteRecentTask,
   loadUserProfile,
-  loadMLModels,
-  prepareFeatureVector,
-  runMLInference,
-  mapInferenceToTask,
+  prepareModelProfile,
+  generateTasksForProfiles,
+  mapGeneratedTask,
   storeTaskInDatabase
 };
 
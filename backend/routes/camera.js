@@ -7,6 +7,8 @@
  *  POST   /api/camera/process        - Process base64 image data
  *  GET    /api/camera/settings       - Get camera settings
  *  GET    /api/camera/health-check   - Camera service status
+ *  POST   /api/camera/detect-and-log - Detect, log and summarize (async: queue a job)
+ *  GET    /api/camera/detect-and-log/jobs/:jobId - Poll a queued detect-and-log job
  */
 
 import express from 'express';
@@ -116,6 +118,8 @@ function base64ToBuffer(base64String) {
 
 /**
  * Save captured image to disk
+ * The write runs in the background; `written` resolves once it is on disk and
+ * rejects if the write fails (callers must await it before responding)
  */
 function saveCapturedImage(buffer, filename = null) {
     const timestamp = Date.now();
@@ -123,8 +127,11 @@ function saveCapturedImage(buffer, filename = null) {
     const filename_ = filename || `capture-${timestamp}-${random}.jpg`;
     const filepath = path.join(captureDir, filename_);
 
-    fs.writeFileSync(filepath, buffer);
-    return { filepath, filename: filename_ };
+    const written = fs.promises.writeFile(filepath, buffer);
+    // Handled now so a failure (ENOSPC, EACCES) while detection is still running
+    // is not an unhandled rejection; awaiting `written` still throws the error
+    written.catch(() => {});
+    return { filepath, filename: filename_, written };
 }
 
 /**
@@ -355,18 +362,11 @@ router.post('/process', express.json({ limit: '20mb' }), async (req, res) => {
         }
 
         // ────────────────────────────────────────────────────────────
-        // 3. SAVE IMAGE
-        // ────────────────────────────────────────────────────────────
-
-        const { filepath, filename } = saveCapturedImage(imageBuffer);
-
-        // ────────────────────────────────────────────────────────────
-        // 4. VALIDATE CONFIDENCE THRESHOLD
+        // 3. VALIDATE CONFIDENCE THRESHOLD
         // ────────────────────────────────────────────────────────────
 
         const threshold = parseFloat(confidenceThreshold);
         if (isNaN(threshold) || threshold < 0 || threshold > 1) {
-            cleanupImageFile(filepath);
             return res.status(400).json(
                 errorResponse('Invalid confidence threshold', {
                     provided: confidenceThreshold,
@@ -375,6 +375,12 @@ router.post('/process', express.json({ limit: '20mb' }), async (req, res) => {
             );
         }
 
+        // ────────────────────────────────────────────────────────────
+        // 4. SAVE IMAGE (kept for the captures list, off the detection path)
+        // ────────────────────────────────────────────────────────────
+
+        const { filepath, filename, written } = saveCapturedImage(imageBuffer);
+
         // ────────────────────────────────────────────────────────────
         // 5. PREPARE METADATA
         // ────────────────────────────────────────────────────────────
@@ -398,7 +404,16 @@ router.post('/process', express.json({ limit: '20mb' }), async (req, res) => {
 
         if (autoDetect) {
             try {
-                detectionResult = await foodDetectionService.detectFood(filepath, threshold);
+                // Bytes go to the detector through shared memory; the saved
+                // file is only read when the ring has no room
+                detectionResult = await foodDetectionService.detectImageBuffer(
+                    imageBuffer,
+                    threshold,
+                    async () => {
+                        await written;
+                        return filepath;
+                    }
+                );
             } catch (detectionError) {
                 console.error('Food detection error:', detectionError);
                 detectionResult = {
@@ -412,6 +427,8 @@ router.post('/process', express.json({ limit: '20mb' }), async (req, res) => {
         // 7. RETURN RESPONSE
         // ────────────────────────────────────────────────────────────
 
+        await written;
+
         const response = successResponse({
             capture: captureMetadata,
             ...(autoDetect && { detection: detectionResult })
@@ -748,6 +765,103 @@ function formatBytes(bytes) {
 // HYBRID DETECTION & FOOD LOGGING ROUTES
 // ════════════════════════════════════════════════════════════════════
 
+// Detections added to the user's meal index after logging
+const MEAL_INDEX_SOURCES = ['csv_exact', 'csv_fuzzy'];
+const MEAL_INDEX_MIN_CONFIDENCE = parseFloat(process.env.MEAL_INDEX_MIN_CONFIDENCE || '0.8');
+
+function shouldRememberMeal(detectionResult) {
+    return MEAL_INDEX_SOURCES.includes(detectionResult.source) &&
+        detectionResult.confidence >= MEAL_INDEX_MIN_CONFIDENCE;
+}
+
+/**
+ * Log a resolved detection, refresh the daily summary and remember the meal
+ * Shared by the synchronous and queued detect-and-log paths; takes ownership
+ * of the image file (removed once the meal index no longer needs it)
+ * @returns {Object} { httpStatus, body }
+ */
+async function logDetection(userId, filepath, detectionResult) {
+    // Step 2: Log to database
+    console.log(`[DETECT-AND-LOG] Logging ${detectionResult.detected_food} (${detectionResult.nutrition.calories} cal)`);
+
+    const logResult = await FoodLoggingService.logFood(userId, {
+        food_name: detectionResult.detected_food,
+        calories: detectionResult.nutrition.calories,
+        protein: detectionResult.nutrition.protein,
+        carbs: detectionResult.nutrition.carbs,
+        fats: detectionResult.nutrition.fats,
+        fiber: detectionResult.nutrition.fiber,
+        sodium: detectionResult.nutrition.sodium,
+        calcium: detectionResult.nutrition.calcium,
+        iron: detectionResult.nutrition.iron,
+        vitaminC: detectionResult.nutrition.vitaminC,
+        folate: detectionResult.nutrition.folate,
+        source: detectionResult.source,
+        imageUrl: filepath,
+        confidence: detectionResult.confidence
+    });
+
+    if (logResult.status === 'error') {
+        cleanupImageFile(filepath);
+        return {
+            httpStatus: 500,
+            body: errorResponse('Failed to log food', { details: logResult.message })
+        };
+    }
+
+    // Step 3: Get updated daily summary
+    const todayResult = await FoodLoggingService.getTodayLogs(userId);
+
+    // Remember the logged meal for instant repeat recognition, then cleanup.
+    // Only confident detections with a CSV match are remembered: an index entry
+    // is returned for every later similar photo, so a wrong label would stick
+    if (!shouldRememberMeal(detectionResult)) {
+        cleanupImageFile(filepath);
+    } else {
+        foodDetectionService.confirmMeal(
+            userId,
+            filepath,
+            detectionResult.detected_food,
+            detectionResult.nutrition
+        ).finally(() => cleanupImageFile(filepath));
+    }
+
+    return {
+        httpStatus: 200,
+        body: successResponse({
+            detection: {
+                detected_food: detectionResult.detected_food,
+                confidence: detectionResult.confidence,
+                nutrition: detectionResult.nutrition,
+                source: detectionResult.source,
+                nutritionSource: detectionResult.nutritionSource,
+                alternativeMatches: detectionResult.alternativeMatches || []
+            },
+            log: {
+                id: logResult.data.id,
+                logged_at: logResult.data.logged_at,
+                calories: logResult.data.calories,
+                foodSource: logResult.data.food_source
+            },
+            dailySummary: {
+                date: todayResult.date,
+                totalCalories: todayResult.summary.total_calories,
+                totalProtein: todayResult.summary.total_protein,
+                totalCarbs: todayResult.summary.total_carbs,
+                totalFats: todayResult.summary.total_fats,
+                mealCount: todayResult.summary.meal_count,
+                meals: todayResult.logs.map(log => ({
+                    id: log.id,
+                    name: log.food_name,
+                    calories: log.calories,
+                    loggedAt: log.logged_at,
+                    source: log.food_source
+                }))
+            }
+        })
+    };
+}
+
 /**
  * POST /api/camera/detect-and-log
  * 
@@ -757,6 +871,8 @@ function formatBytes(bytes) {
  *   - image: File (JPEG, PNG, WebP)
  *   - confidenceThreshold: number (default: 0.3)
  *   - userId: string (Firebase/Auth user ID)
+ *   - async: "true" to queue the detection and return a job id at once
+ *            (HTTP 202; poll GET /api/camera/detect-and-log/jobs/:jobId)
  * 
  * Response:
  *   {
@@ -798,12 +914,41 @@ router.post('/detect-and-log', upload.single('image'), async (req, res) => {
 
         const filepath = req.file.path;
 
+        if (req.body.async === 'true' || req.body.async === true) {
+            const job = await foodDetectionService.enqueueDetection(
+                filepath,
+                parseFloat(confidenceThreshold),
+                userId
+            );
+            if (job.status === 'error') {
+                cleanupImageFile(filepath);
+                return res.status(503).json(
+                    errorResponse(job.error || 'Failed to queue detection')
+                );
+            }
+            // A duplicate upload reuses the original job (and its image)
+            if (job.deduplicated) {
+                cleanupImageFile(filepath);
+            }
+            console.log(`[DETECT-AND-LOG] Queued job ${job.job_id} for user ${userId}`);
+            deliveryInterval = DELIVERY_MIN_INTERVAL_MS;
+            pendingDeliveries = true;
+            if (!delivering) scheduleDelivery(DELIVERY_MIN_INTERVAL_MS);
+            return res.status(202).json(successResponse({
+                jobId: job.job_id,
+                jobStatus: job.status,
+                deduplicated: job.deduplicated,
+                pollUrl: `/api/camera/detect-and-log/jobs/${job.job_id}?userId=${encodeURIComponent(userId)}`
+            }));
+        }
+
         // Step 1: Hybrid food detection
         console.log(`[DETECT-AND-LOG] Starting detection for user ${userId}`);
 
         const detectionResult = await hybridFoodDetection.detectFood(
             filepath,
-            parseFloat(confidenceThreshold)
+            parseFloat(confidenceThreshold),
+            userId
         );
 
         if (detectionResult.status === 'error' || detectionResult.status === 'detection_failed') {
@@ -813,79 +958,161 @@ router.post('/detect-and-log', upload.single('image'), async (req, res) => {
             );
         }
 
-        // Step 2: Log to database
-        console.log(`[DETECT-AND-LOG] Logging ${detectionResult.detected_food} (${detectionResult.nutrition.calories} cal)`);
-
-        const logResult = await FoodLoggingService.logFood(userId, {
-            food_name: detectionResult.detected_food,
-            calories: detectionResult.nutrition.calories,
-            protein: detectionResult.nutrition.protein,
-            carbs: detectionResult.nutrition.carbs,
-            fats: detectionResult.nutrition.fats,
-            fiber: detectionResult.nutrition.fiber,
-            sodium: detectionResult.nutrition.sodium,
-            calcium: detectionResult.nutrition.calcium,
-            iron: detectionResult.nutrition.iron,
-            vitaminC: detectionResult.nutrition.vitaminC,
-            folate: detectionResult.nutrition.folate,
-            source: detectionResult.source,
-            imageUrl: req.file.path,
-            confidence: detectionResult.confidence
-        });
+        // Steps 2-3: Log to database, daily summary
+        const { httpStatus, body } = await logDetection(userId, filepath, detectionResult);
+        res.status(httpStatus).json(body);
 
-        if (logResult.status === 'error') {
-            cleanupImageFile(filepath);
-            return res.status(500).json(
-                errorResponse('Failed to log food', { details: logResult.message })
-            );
+    } catch (error) {
+        console.error('[DETECT-AND-LOG] Error:', error);
+        if (req.file) {
+            cleanupImageFile(req.file.path);
         }
+        res.status(500).json(
+            errorResponse(error.message || 'Failed to process request', {
+                type: error.constructor.name
+            })
+        );
+    }
+});
 
-        // Step 3: Get updated daily summary
-        const todayResult = await FoodLoggingService.getTodayLogs(userId);
+// ════════════════════════════════════════════════════════════════════
+// QUEUED JOB DELIVERY
+// ════════════════════════════════════════════════════════════════════
 
-        // Cleanup
-        cleanupImageFile(filepath);
+// Finished detect-and-log jobs are logged here, not on poll, so a client that
+// never polls still gets its meal logged. Each job is claimed in its queue row
+// (one API process logs it) and the response is stored with it for polls.
+// The loop only runs while user jobs are waiting: an enqueue starts it, and
+// it stops once the queue reports nothing undelivered.
+const DELIVERY_ID = `api-${process.pid}-${Date.now()}`;
+const DELIVERY_MIN_INTERVAL_MS = 500;
+const DELIVERY_MAX_INTERVAL_MS = 10000;
+let deliveryTimer = null;
+let deliveryInterval = DELIVERY_MIN_INTERVAL_MS;
+let delivering = false;
+let pendingDeliveries = false;
+
+async function deliverDetectionJob(job) {
+    let response;
+    if (job.status === 'failed') {
+        response = {
+            httpStatus: 500,
+            body: errorResponse(job.error || 'Food detection failed', { jobId: job.job_id, attempts: job.attempts })
+        };
+        cleanupImageFile(job.image_path);
+    } else {
+        const detectionResult = await hybridFoodDetection.resolveDetection(job.result);
+        if (detectionResult.status === 'error' || detectionResult.status === 'detection_failed') {
+            cleanupImageFile(job.image_path);
+            response = {
+                httpStatus: 400,
+                body: errorResponse(detectionResult.error || 'Food detection failed')
+            };
+        } else {
+            response = await logDetection(job.user_id, job.image_path, detectionResult);
+        }
+    }
+    await foodDetectionService.deliverDetectionJob(job.job_id, response);
+    console.log(`[DETECT-AND-LOG] Delivered job ${job.job_id} (${response.httpStatus})`);
+}
 
-        // Response
-        res.json(successResponse({
-            detection: {
-                detected_food: detectionResult.detected_food,
-                confidence: detectionResult.confidence,
-                nutrition: detectionResult.nutrition,
-                source: detectionResult.source,
-                nutritionSource: detectionResult.nutritionSource,
-                alternativeMatches: detectionResult.alternativeMatches || []
-            },
-            log: {
-                id: logResult.data.id,
-                logged_at: logResult.data.logged_at,
-                calories: logResult.data.calories,
-                foodSource: logResult.data.food_source
-            },
-            dailySummary: {
-                date: todayResult.date,
-                totalCalories: todayResult.summary.total_calories,
-                totalProtein: todayResult.summary.total_protein,
-                totalCarbs: todayResult.summary.total_carbs,
-                totalFats: todayResult.summary.total_fats,
-                mealCount: todayResult.summary.meal_count,
-                meals: todayResult.logs.map(log => ({
-                    id: log.id,
-                    name: log.food_name,
-                    calories: log.calories,
-                    loggedAt: log.logged_at,
-                    source: log.food_source
-                }))
+async function deliverFinishedJobs() {
+    if (delivering) return;
+    delivering = true;
+    // An enqueue during this pass sets it again, so the loop does not stop under it
+    pendingDeliveries = false;
+    try {
+        const claimed = await foodDetectionService.claimDetectionDeliveries(DELIVERY_ID);
+        const jobs = claimed.jobs || [];
+        for (const job of jobs) {
+            try {
+                await deliverDetectionJob(job);
+            } catch (error) {
+                // The claim expires and the job is retried by the next pass
+                console.error(`[DETECT-AND-LOG] Delivery of job ${job.job_id} failed:`, error);
             }
+        }
+        // Poll quickly while jobs are finishing, back off while they are still running
+        deliveryInterval = jobs.length
+            ? DELIVERY_MIN_INTERVAL_MS
+            : Math.min(DELIVERY_MAX_INTERVAL_MS, deliveryInterval * 2);
+        // A failed claim (status error) keeps the loop alive so the jobs are retried
+        if (claimed.status === 'error' || jobs.length > 0 || claimed.undelivered > 0) {
+            pendingDeliveries = true;
+        }
+    } finally {
+        delivering = false;
+        if (pendingDeliveries) {
+            scheduleDelivery(deliveryInterval);
+        } else {
+            deliveryTimer = null;
+        }
+    }
+}
+
+function scheduleDelivery(delayMs) {
+    clearTimeout(deliveryTimer);
+    deliveryTimer = setTimeout(deliverFinishedJobs, delayMs);
+    deliveryTimer.unref();
+}
+
+// Jobs left by a previous process are picked up at startup (one pass, only if a queue exists)
+if (foodDetectionService.hasDetectionQueue()) {
+    scheduleDelivery(DELIVERY_MIN_INTERVAL_MS);
+}
+
+/**
+ * GET /api/camera/detect-and-log/jobs/:jobId
+ * 
+ * Poll a job queued by POST /detect-and-log with async=true
+ * 
+ * Query:
+ *   - userId: string (required, must match the job)
+ * 
+ * Response:
+ *   202 { "status": "success", "jobId", "jobStatus": "queued" | "running" | "logging", "attempts" }
+ *   200 same body as the synchronous detect-and-log, once the job is done
+ *       (the meal is logged by the delivery loop whether or not anyone polls)
+ *   500 the job failed after its retries
+ */
+router.get('/detect-and-log/jobs/:jobId', async (req, res) => {
+    try {
+        const { jobId } = req.params;
+        const { userId } = req.query;
+        if (!userId) {
+            return res.status(400).json(
+                errorResponse('User ID is required', { field: 'userId' })
+            );
+        }
+
+        const job = await foodDetectionService.getDetectionJob(jobId);
+        if (job.status === 'error' || job.user_id !== String(userId)) {
+            return res.status(404).json(errorResponse('Job not found', { jobId }));
+        }
+
+        if (job.status === 'queued' || job.status === 'running') {
+            return res.status(202).json(successResponse({
+                jobId,
+                jobStatus: job.status,
+                attempts: job.attempts,
+                retryAt: job.retry_at
+            }));
+        }
+
+        // Done or failed: the delivery loop logs the meal and stores the response
+        if (job.delivery) {
+            return res.status(job.delivery.httpStatus).json(job.delivery.body);
+        }
+        return res.status(202).json(successResponse({
+            jobId,
+            jobStatus: 'logging',
+            attempts: job.attempts
         }));
 
     } catch (error) {
-        console.error('[DETECT-AND-LOG] Error:', error);
-        if (req.file) {
-            cleanupImageFile(req.file.path);
-        }
+        console.error('[DETECT-AND-LOG] Job poll error:', error);
         res.status(500).json(
-            errorResponse(error.message || 'Failed to process request', {
+            errorResponse(error.message || 'Failed to read job', {
                 type: error.constructor.name
             })
         );
@@ -93,6 +93,83 @@ router.post('/detect', upload.single('image'), async (req, res) => {
     }
 });
 
+/**
+ * POST /api/food/detect-plate
+ * Detect every dish on a plate (thali) with per-item nutrition and meal totals
+ */
+router.post('/detect-plate', upload.single('image'), async (req, res) => {
+    try {
+        if (!req.file) {
+            return res.status(400).json({
+                status: 'error',
+                error: 'No image file provided'
+            });
+        }
+
+        const imagePath = req.file.path;
+        const confidenceThreshold = parseFloat(req.body.confidenceThreshold) || 0.5;
+
+        if (isNaN(confidenceThreshold) || confidenceThreshold < 0 || confidenceThreshold > 1) {
+            return res.status(400).json({
+                status: 'error',
+                error: 'Invalid confidence threshold. Must be between 0 and 1'
+            });
+        }
+
+        const result = await foodDetectionService.detectPlate(imagePath, confidenceThreshold);
+
+        if (result.status === 'error') {
+            try {
+                fs.unlinkSync(imagePath);
+            } catch (e) {
+                // Ignore cleanup errors
+            }
+        }
+
+        res.json(result);
+    } catch (error) {
+        console.error('Error in plate detection:', error);
+        res.status(500).json({
+            status: 'error',
+            error: error.message || 'Internal server error'
+        });
+    }
+});
+
+/**
+ * POST /api/food/detect-stream
+ * Detect food over a burst of camera frames (multipart field "frames", in capture order)
+ * Body: fps (default 10), budget (max inferences per second, default 6)
+ */
+router.post('/detect-stream', upload.array('frames', 120), async (req, res) => {
+    const framePaths = (req.files || []).map((file) => file.path);
+    try {
+        if (framePaths.length === 0) {
+            return res.status(400).json({
+                status: 'error',
+                error: 'No frames provided'
+            });
+        }
+
+        const fps = parseFloat(req.body.fps) || 10;
+        const budget = parseFloat(req.body.budget) || 6;
+
+        const result = await foodDetectionService.detectStream(framePaths, { fps, budget });
+        res.json(result);
+    } catch (error) {
+        console.error('Error in stream detection:', error);
+        res.status(500).json({
+            status: 'error',
+            error: error.message || 'Internal server error'
+        });
+    } finally {
+        // Frames are transient; only the smoothed result is kept
+        for (const framePath of framePaths) {
+            fs.unlink(framePath, () => {});
+        }
+    }
+});
+
 /**
  * GET /api/food/foods
  * Get all supported foods and their nutrition info
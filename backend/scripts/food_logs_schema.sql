@@ -0,0 +1,35 @@
+-- Food logs written by /api/camera/detect-and-log (FoodLoggingService)
+-- Portable subset: runs unchanged on PostgreSQL and SQLite
+CREATE TABLE IF NOT EXISTS food_logs (
+  id TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL,
+  food_name TEXT NOT NULL,
+  calories INTEGER NOT NULL,
+  protein REAL DEFAULT 0,
+  carbs REAL DEFAULT 0,
+  fats REAL DEFAULT 0,
+  fiber REAL DEFAULT 0,
+  sodium REAL DEFAULT 0,
+  calcium REAL DEFAULT 0,
+  iron REAL DEFAULT 0,
+  vitamin_c REAL DEFAULT 0,
+  folate REAL DEFAULT 0,
+  serving_size TEXT DEFAULT '1 serving',
+  food_source TEXT DEFAULT 'csv',
+  image_url TEXT,
+  confidence REAL,
+  model_version TEXT,
+  rescored_at TEXT,
+  logged_at TEXT NOT NULL,
+  created_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_food_logs_user_logged ON food_logs(user_id, logged_at);
+
+-- Progress of backfill / re-scoring runs (one row per run)
+CREATE TABLE IF NOT EXISTS backfill_runs (
+  run_id TEXT PRIMARY KEY,
+  last_id TEXT NOT NULL DEFAULT '',
+  counts TEXT NOT NULL DEFAULT '{}',
+  updated_at TEXT NOT NULL
+);
@@ -0,0 +1,27 @@
+-- user_progression columns used by bulk-progression.py, plus its rank change log
+-- Portable subset: runs unchanged on PostgreSQL and SQLite (a local stand-in)
+CREATE TABLE IF NOT EXISTS user_progression (
+  user_id TEXT PRIMARY KEY,
+  level INTEGER NOT NULL DEFAULT 1,
+  xp_today INTEGER NOT NULL DEFAULT 0,
+  rank TEXT DEFAULT 'F',
+  total_xp BIGINT NOT NULL DEFAULT 0,
+  weekly_xp INTEGER NOT NULL DEFAULT 0,
+  monthly_xp INTEGER NOT NULL DEFAULT 0,
+  next_level_percent NUMERIC(5,2) NOT NULL DEFAULT 0,
+  prestige INTEGER NOT NULL DEFAULT 0,
+  updated_at TEXT
+);
+
+-- One row per rank change found by the daily rollover
+CREATE TABLE IF NOT EXISTS rank_changes (
+  user_id TEXT NOT NULL,
+  old_rank TEXT NOT NULL,
+  new_rank TEXT NOT NULL,
+  old_level INTEGER NOT NULL,
+  new_level INTEGER NOT NULL,
+  xp_gain BIGINT NOT NULL,
+  changed_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_rank_changes_user ON rank_changes(user_id, changed_at);
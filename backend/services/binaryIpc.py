@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Binary IPC - Length-prefixed framing between Node and persistent model workers
+A worker started with --serve-binary reads request frames on stdin and writes
+response frames on stdout. Feature matrices travel as raw little-endian
+float32 blocks, images as their encoded bytes (or a uint8 tensor) and results
+come back as fixed-size packed records, so nothing on the hot path is JSON or
+base64. Names (classes, exercises, nutrition) are sent once, in the SCHEMA
+reply to HELLO. The Node side is binaryIpcClient.js.
+
+Frame: 12-byte header '<2sBBII' (magic b'FB', version, type, request id,
+payload length) followed by the payload.
+"""
+
+import io
+import json
+import os
+import struct
+import sys
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from mlMetrics import REGISTRY
+
+MAGIC = b'FB'
+VERSION = 1
+HEADER = struct.Struct('<2sBBII')
+
+# Request types; a response type is the request type | 0x80
+HELLO = 0x01
+TASKS = 0x02            # '<II' rows, cols + rows*cols float32 raw features
+                        # [+ '<I' JSON length + JSON {user_ids, slots, day}: keyed, deterministic picks]
+DETECT_IMAGES = 0x03    # '<fI' threshold, count + count * ('<I' length + encoded image)
+DETECT_TENSOR = 0x04    # '<fIII' threshold, n, height, width + n*h*w*3 uint8 RGB
+ATTACH_RING = 0x05      # utf-8 path of a sharedImageRing file
+DETECT_SLOTS = 0x06     # '<fI' threshold, count + count * '<III' (slot, generation, length)
+MEMORY_STATS = 0x07     # -> JSON memory report with the growth curve
+CONFIRM_MEAL = 0x08     # '<I' JSON length + JSON {user_id, label, nutrition} + encoded image -> JSON
+RECYCLE = 0x7E          # unsolicited (request id 0): JSON report; send no more requests
+RESPONSE = 0x80
+ERROR = 0xFF            # utf-8 message
+
+# '<I' count + per task: category, difficulty, exercise index, xp, duration, 5 stat rewards
+TASK_RECORD = np.dtype([
+    ('category', 'u1'), ('difficulty', 'u1'), ('exercise', 'u1'),
+    ('xp', '<u2'), ('duration', '<u2'), ('stats', 'u1', (5,))
+])
+# '<I' count + per image: status (1 success, 0 below threshold, -1 error),
+# top-3 class indices (0xFFFF = none) and their confidences
+TOP_K = 3
+DETECTION_RECORD = struct.Struct(f'<b{TOP_K}H{TOP_K}f')
+NO_CLASS = 0xFFFF
+
+MAX_PAYLOAD = 512 * 1024 * 1024
+
+IPC_BYTES = REGISTRY.counter(
+    'ml_ipc_bytes_total',
+    'Binary IPC bytes by direction (in, out)',
+    ('direction',)
+)
+
+
+class ProtocolError(Exception):
+    """Malformed frame; the stream cannot be resynchronised"""
+
+
+def read_exact(stream: BinaryIO, size: int) -> Optional[bytes]:
+    """size bytes, or None on a clean EOF before the first byte"""
+    chunks, remaining = [], size
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            if remaining == size:
+                return None
+            raise ProtocolError(f'Stream closed mid-frame ({size - remaining}/{size} bytes)')
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+
+def read_frame(stream: BinaryIO) -> Optional[Tuple[int, int, bytes]]:
+    """(type, request id, payload), or None at EOF"""
+    header = read_exact(stream, HEADER.size)
+    if header is None:
+        return None
+    magic, version, msg_type, request_id, length = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ProtocolError(f'Bad frame header {header!r}')
+    if length > MAX_PAYLOAD:
+        raise ProtocolError(f'Frame of {length} bytes exceeds {MAX_PAYLOAD}')
+    payload = read_exact(stream, length) if length else b''
+    if payload is None:
+        raise ProtocolError('Stream closed before payload')
+    IPC_BYTES.inc('in', amount=HEADER.size + length)
+    return msg_type, request_id, payload
+
+
+def write_frame(stream: BinaryIO, msg_type: int, request_id: int, payload) -> None:
+    """One frame; payload is any bytes-like object (numpy buffers are not copied)"""
+    length = memoryview(payload).nbytes
+    stream.write(HEADER.pack(MAGIC, VERSION, msg_type, request_id, length))
+    stream.write(payload)
+    stream.flush()
+    IPC_BYTES.inc('out', amount=HEADER.size + length)
+
+
+def decode_matrix(payload: bytes) -> np.ndarray:
+    """TASKS payload -> (rows, cols) float32 view of the payload"""
+    return decode_tasks(payload)[0]
+
+
+def decode_tasks(payload: bytes) -> Tuple[np.ndarray, Optional[Dict]]:
+    """TASKS payload -> (rows x cols float32 view, task keys or None)"""
+    rows, cols = struct.unpack_from('<II', payload)
+    end = 8 + rows * cols * 4
+    if len(payload) < end:
+        raise ValueError(f'Matrix {rows}x{cols} needs {end} bytes, got {len(payload)}')
+    matrix = np.frombuffer(payload, dtype='<f4', count=rows * cols, offset=8).reshape(rows, cols)
+    if len(payload) == end:
+        return matrix, None
+    (length,) = struct.unpack_from('<I', payload, end)
+    if len(payload) != end + 4 + length:
+        raise ValueError(f'Task keys need {end + 4 + length} bytes, got {len(payload)}')
+    keys = json.loads(bytes(payload[end + 4:]).decode('utf-8'))
+    if len(keys['user_ids']) != rows or len(keys['slots']) != rows:
+        raise ValueError(f'Task keys must cover all {rows} rows')
+    return matrix, keys
+
+
+def decode_images(payload: bytes) -> Tuple[float, list]:
+    """DETECT_IMAGES payload -> (threshold, [memoryview of each encoded image])"""
+    threshold, count = struct.unpack_from('<fI', payload)
+    view, offset, images = memoryview(payload), 8, []
+    for _ in range(count):
+        (length,) = struct.unpack_from('<I', payload, offset)
+        offset += 4
+        if offset + length > len(payload):
+            raise ValueError('Image length runs past the payload')
+        images.append(view[offset:offset + length])
+        offset += length
+    return threshold, images
+
+
+def decode_tensor(payload: bytes) -> Tuple[float, np.ndarray]:
+    """DETECT_TENSOR payload -> (threshold, (n, h, w, 3) uint8 view)"""
+    threshold, n, height, width = struct.unpack_from('<fIII', payload)
+    expected = 16 + n * height * width * 3
+    if len(payload) != expected:
+        raise ValueError(f'Tensor {n}x{height}x{width}x3 needs {expected} bytes, got {len(payload)}')
+    return threshold, np.frombuffer(payload, dtype=np.uint8, offset=16).reshape(n, height, width, 3)
+
+
+def decode_slots(payload: bytes) -> Tuple[float, list]:
+    """DETECT_SLOTS payload -> (threshold, [(slot, generation, length), ...])"""
+    threshold, count = struct.unpack_from('<fI', payload)
+    if len(payload) != 8 + count * 12:
+        raise ValueError(f'{count} slot references need {8 + count * 12} bytes, got {len(payload)}')
+    return threshold, list(struct.iter_unpack('<III', payload[8:]))
+
+
+def decode_confirm_meal(payload: bytes) -> Tuple[Dict, memoryview]:
+    """CONFIRM_MEAL payload -> (request fields, encoded image)"""
+    (length,) = struct.unpack_from('<I', payload)
+    if 4 + length > len(payload):
+        raise ValueError('Confirm-meal header runs past the payload')
+    fields = json.loads(bytes(payload[4:4 + length]).decode('utf-8'))
+    return fields, memoryview(payload)[4 + length:]
+
+
+def pack_detections(scores: Optional[np.ndarray], threshold: float, errors=()) -> bytearray:
+    """Top-k records for a (n, classes) score matrix; rows listed in errors get status -1"""
+    count = len(scores) + len(errors) if scores is not None else len(errors)
+    out = bytearray(4 + count * DETECTION_RECORD.size)
+    struct.pack_into('<I', out, 0, count)
+    rows = iter(scores if scores is not None else ())
+    for i in range(count):
+        offset = 4 + i * DETECTION_RECORD.size
+        if i in errors:
+            DETECTION_RECORD.pack_into(out, offset, -1, *([NO_CLASS] * TOP_K), *([0.0] * TOP_K))
+            continue
+        row = next(rows)
+        top = np.argsort(row)[::-1][:TOP_K]
+        indices = [int(t) for t in top] + [NO_CLASS] * (TOP_K - len(top))
+        confidences = [float(row[t]) for t in top] + [0.0] * (TOP_K - len(top))
+        status = 1 if confidences[0] >= threshold else 0
+        DETECTION_RECORD.pack_into(out, offset, status, *indices, *confidences)
+    return out
+
+
+def task_handlers(generator, deterministic: bool = False, day: Optional[str] = None,
+                  slot: int = 0) -> Dict[int, Callable[[bytes], Tuple[int, bytes]]]:
+    """
+    Request handlers for an MLTaskGenerator worker
+
+    Keyed TASKS frames (and every frame of a --deterministic worker) go
+    through generate_tasks, so picks come from each (user, day, slot) key's
+    Philox stream and repeats are served from the task cache. day and slot
+    are the worker defaults when a frame leaves them out.
+    """
+    def hello(payload):
+        schema = {
+            'model': 'task_generator',
+            'feature_count': 19,
+            'categories': generator.CATEGORY_CLASSES,
+            'difficulties': generator.DIFFICULTY_CLASSES,
+            'stat_names': generator.STAT_NAMES,
+            'exercises': generator.EXERCISES
+        }
+        return HELLO | RESPONSE, json.dumps(schema).encode('utf-8')
+
+    def tasks(payload):
+        raw_features, keys = decode_tasks(payload)
+        if keys is None:
+            if deterministic:
+                raise ValueError('Deterministic worker needs user ids in TASKS frames')
+            fields = generator.task_fields(raw_features)
+        else:
+            users = [{'user_id': user_id} for user_id in keys['user_ids']]
+            slots = [slot if row_slot is None else row_slot for row_slot in keys['slots']]
+            fields = generator.task_fields_from_tasks(generator.generate_tasks(
+                users, deterministic=True, day=keys.get('day') or day, slot=slots,
+                raw_features=raw_features))
+        rows = len(fields['category'])
+        records = np.empty(rows, dtype=TASK_RECORD)
+        for name in TASK_RECORD.names:
+            records[name] = fields[name]
+        return TASKS | RESPONSE, struct.pack('<I', rows) + records.tobytes()
+
+    return {HELLO: hello, TASKS: tasks}
+
+
+def detector_handlers(detector) -> Dict[int, Callable[[bytes], Tuple[int, bytes]]]:
+    """Request handlers for a NorthIndianFoodDetector worker"""
+    def hello(payload):
+        schema = {
+            'model': 'food_detector',
+            'input_size': detector.input_size,
+            'food_classes': detector.food_classes,
+            'nutrition': {food: detector._nutrition(food) for food in detector.food_classes},
+            'top_k': TOP_K
+        }
+        return HELLO | RESPONSE, json.dumps(schema).encode('utf-8')
+
+    # Image batches go through the cascade when one is loaded; the meal index
+    # is per user and these frames carry no user, so it is not consulted
+    def images(payload):
+        threshold, encoded = decode_images(payload)
+        decoded, errors = [], set()
+        for i, data in enumerate(encoded):
+            try:
+                decoded.append(detector.decode_image(io.BytesIO(data)))
+            except Exception:
+                errors.add(i)
+        scores = detector.predict_images(decoded) if decoded else None
+        return DETECT_IMAGES | RESPONSE, pack_detections(scores, threshold, errors)
+
+    ring = {}
+
+    def attach_ring(payload):
+        from sharedImageRing import ImageRing
+        path = payload.decode('utf-8')
+        if ring.get('path') != path:
+            if ring:
+                ring['reader'].close()
+            ring.update(path=path, reader=ImageRing(path))
+        return ATTACH_RING | RESPONSE, b''
+
+    def slots(payload):
+        if not ring:
+            raise ValueError('No image ring attached')
+        reader = ring['reader']
+        threshold, refs = decode_slots(payload)
+        decoded, errors = [], set()
+        for i, (slot, generation, length) in enumerate(refs):
+            try:
+                with reader.open(slot, generation, length) as slot_file:
+                    img = detector.decode_image(slot_file)
+                if not reader.still_valid(slot, generation):
+                    raise ValueError(f'Slot {slot} was reused while decoding')
+                decoded.append(img)
+            except Exception:
+                errors.add(i)
+        scores = detector.predict_images(decoded) if decoded else None
+        return DETECT_SLOTS | RESPONSE, pack_detections(scores, threshold, errors)
+
+    def tensor(payload):
+        threshold, pixels = decode_tensor(payload)
+        if pixels.shape[1:3] != (detector.input_size, detector.input_size):
+            raise ValueError(f'Tensor must be {detector.input_size}x{detector.input_size}, '
+                             f'got {pixels.shape[1]}x{pixels.shape[2]}')
+        # MobileNetV2 preprocessing: [0, 255] -> [-1, 1]
+        batch = pixels.astype(np.float32) / 127.5 - 1.0
+        scores = detector.predictor.predict(batch) if len(batch) else None
+        return DETECT_TENSOR | RESPONSE, pack_detections(scores, threshold)
+
+    def confirm_meal(payload):
+        # Confirmations share the loaded backbone; frames are answered one at a
+        # time, and the meal index locks each user's file across processes
+        fields, image = decode_confirm_meal(payload)
+        result = detector.confirm_meal(fields['user_id'], io.BytesIO(image), fields['label'],
+                                       fields.get('nutrition'))
+        return CONFIRM_MEAL | RESPONSE, json.dumps(result).encode('utf-8')
+
+    return {HELLO: hello, DETECT_IMAGES: images, DETECT_TENSOR: tensor,
+            ATTACH_RING: attach_ring, DETECT_SLOTS: slots, CONFIRM_MEAL: confirm_meal}
+
+
+def protocol_streams() -> Tuple[BinaryIO, BinaryIO]:
+    """
+    (input, output) binary streams for serving
+
+    The protocol gets a private duplicate of fd 1 and fd 1 itself is pointed
+    at stderr, so a stray print or library progress bar cannot corrupt frames.
+    """
+    sys.stdout.flush()
+    output = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+    return sys.stdin.buffer, output
+
+
+def serve(handlers: Dict[int, Callable], instream: BinaryIO = None, outstream: BinaryIO = None,
+          watchdog=None) -> int:
+    """
+    Answer frames until EOF; a failed request gets an ERROR frame, not a dead worker
+
+    With a workerMemory.MemoryWatchdog, the worker sends one RECYCLE frame
+    once it crosses its limits and keeps answering whatever the client had
+    already sent; the client starts a replacement and closes this one's stdin.
+    """
+    if instream is None or outstream is None:
+        instream, outstream = protocol_streams()
+    if watchdog is not None:
+        handlers = {**handlers, MEMORY_STATS: lambda payload: (
+            MEMORY_STATS | RESPONSE, json.dumps(watchdog.report()).encode('utf-8'))}
+    print(f"✓ Binary IPC worker ready ({len(handlers)} message types)", file=sys.stderr)
+    announced = False
+    while True:
+        try:
+            frame = read_frame(instream)
+        except ProtocolError as e:
+            print(f"✗ {e}", file=sys.stderr)
+            return 1
+        if frame is None:
+            if watchdog is not None:
+                watchdog.write(final=True)
+            return 0
+        msg_type, request_id, payload = frame
+        handler = handlers.get(msg_type)
+        try:
+            if handler is None:
+                raise ValueError(f'Unsupported message type 0x{msg_type:02x}')
+            response_type, body = handler(payload)
+        except Exception as e:
+            response_type, body = ERROR, str(e).encode('utf-8')
+        write_frame(outstream, response_type, request_id, body)
+        if watchdog is not None and msg_type != MEMORY_STATS and watchdog.record() and not announced:
+            announced = True
+            report = watchdog.report(allocations=False)
+            print(f"♻️ Worker {watchdog.worker_id} asking to be recycled ({watchdog.recycle_reason}, "
+                  f"{report['rss_mb']}MB after {report['requests']} requests)", file=sys.stderr)
+            write_frame(outstream, RECYCLE, 0, json.dumps(report).encode('utf-8'))
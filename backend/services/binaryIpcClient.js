@@ -0,0 +1,490 @@
+/**
+ * Binary IPC Client
+ * Node side of services/binaryIpc.py: keeps one Python model worker
+ * (--serve-binary) alive and exchanges length-prefixed binary frames with it.
+ * Feature matrices go out as little-endian float32, images as their raw
+ * bytes, and results come back as packed records decoded with the schema
+ * the worker sends once at startup.
+ */
+
+import { spawn } from 'child_process';
+import path from 'path';
+import { fileURLToPath } from 'url';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = path.dirname(__filename);
+
+const MAGIC = Buffer.from('FB');
+const VERSION = 1;
+const HEADER_SIZE = 12;
+
+export const MessageType = {
+    HELLO: 0x01,
+    TASKS: 0x02,
+    DETECT_IMAGES: 0x03,
+    DETECT_TENSOR: 0x04,
+    ATTACH_RING: 0x05,
+    DETECT_SLOTS: 0x06,
+    MEMORY_STATS: 0x07,
+    CONFIRM_MEAL: 0x08,
+    RECYCLE: 0x7e,
+    RESPONSE: 0x80,
+    ERROR: 0xff
+};
+
+const TASK_RECORD_SIZE = 12;
+const TOP_K = 3;
+const DETECTION_RECORD_SIZE = 1 + TOP_K * 2 + TOP_K * 4;
+const NO_CLASS = 0xffff;
+
+function frameHeader(type, requestId, length) {
+    const header = Buffer.alloc(HEADER_SIZE);
+    MAGIC.copy(header, 0);
+    header.writeUInt8(VERSION, 2);
+    header.writeUInt8(type, 3);
+    header.writeUInt32LE(requestId, 4);
+    header.writeUInt32LE(length, 8);
+    return header;
+}
+
+/**
+ * Raw 19-feature row in model order (mirrors MLTaskGenerator._build_features)
+ */
+export function taskFeatureRow(user) {
+    const pick = (key, fallback) => (user[key] === undefined || user[key] === null ? fallback : Number(user[key]));
+    const encode = (mapping, value, fallback) => (value in mapping ? mapping[value] : fallback);
+    return [
+        pick('age', 30),
+        pick('height', 175),
+        pick('weight', 75),
+        pick('strength', 100),
+        pick('constitution', 100),
+        pick('dexterity', 100),
+        pick('wisdom', 100),
+        pick('charisma', 100),
+        pick('total_xp', 0),
+        pick('level', 1),
+        pick('weekly_xp', 0),
+        pick('bmi', 24),
+        pick('sleep_quality', 70),
+        pick('stress_level', 50),
+        encode({ M: 0, F: 1, Other: 2 }, user.gender ?? 'M', 0),
+        encode({ Beginner: 0, Intermediate: 1, Advanced: 2, Expert: 3 }, user.fitness_level ?? 'Intermediate', 1),
+        encode({ Sedentary: 0, Light: 1, Moderate: 2, 'Very Active': 3 }, user.activity_level ?? 'Moderate', 1),
+        encode({ E: 0, D: 1, C: 2, B: 3, A: 4, S: 5 }, user.rank ?? 'C', 2),
+        encode({ strength: 0, cardio: 1, flexibility: 2, health: 3, balanced: 4 }, user.primary_goal ?? 'balanced', 4)
+    ];
+}
+
+/**
+ * One worker process and the frames in flight on its pipes
+ */
+class WorkerConnection {
+    constructor(owner) {
+        this.owner = owner;
+        this.pending = new Map();
+        this.chunks = [];
+        this.buffered = 0;
+        this.ringAttach = null;
+        this.retired = false;
+        this.closed = false;
+        this.stderrTail = '';
+
+        const proc = spawn(owner.pythonPath, [owner.scriptPath, '--serve-binary', ...owner.args], {
+            cwd: path.dirname(__dirname),
+            env: { ...process.env, PYTHONUNBUFFERED: '1', ...owner.env },
+            stdio: ['pipe', 'pipe', 'pipe']
+        });
+        this.process = proc;
+
+        proc.stdout.on('data', (chunk) => this.onData(chunk));
+        // A dead worker surfaces through 'close'; ignore the broken pipe itself
+        proc.stdin.on('error', () => {});
+        proc.stderr.on('data', (data) => {
+            this.stderrTail = (this.stderrTail + data.toString()).slice(-4000);
+        });
+        proc.on('error', (err) => this.onExit(`Failed to start worker: ${err.message}`));
+        proc.on('close', (code) => this.onExit(`Worker exited with code ${code}: ${this.stderrTail.trim()}`));
+    }
+
+    send(type, requestId, parts, timeoutMs) {
+        if (this.retired || this.closed) {
+            return Promise.reject(new Error('Worker connection retired'));
+        }
+        const length = parts.reduce((sum, part) => sum + part.length, 0);
+        return new Promise((resolve, reject) => {
+            const timer = setTimeout(() => {
+                this.pending.delete(requestId);
+                reject(new Error(`Worker request timeout (>${timeoutMs / 1000}s)`));
+            }, timeoutMs);
+            this.pending.set(requestId, { resolve, reject, timer });
+
+            this.process.stdin.write(frameHeader(type, requestId, length));
+            for (const part of parts) {
+                this.process.stdin.write(part);
+            }
+        });
+    }
+
+    /** Stop taking requests; the worker answers what it has, then exits at EOF */
+    retire() {
+        if (!this.retired) {
+            this.retired = true;
+            this.process.stdin.end();
+        }
+    }
+
+    onExit(message) {
+        if (this.closed) {
+            return;
+        }
+        this.closed = true;
+        this.chunks = [];
+        this.buffered = 0;
+        for (const { reject, timer } of this.pending.values()) {
+            clearTimeout(timer);
+            reject(new Error(message));
+        }
+        this.pending.clear();
+        this.owner.onConnectionClosed(this);
+    }
+
+    onData(chunk) {
+        this.chunks.push(chunk);
+        this.buffered += chunk.length;
+        while (this.buffered >= HEADER_SIZE) {
+            if (this.chunks[0].length < HEADER_SIZE) {
+                this.chunks = [Buffer.concat(this.chunks, this.buffered)];
+            }
+            const header = this.chunks[0];
+            if (header[0] !== MAGIC[0] || header[1] !== MAGIC[1] || header[2] !== VERSION) {
+                this.onExit('Bad frame from worker');
+                this.process.kill();
+                return;
+            }
+            const length = header.readUInt32LE(8);
+            if (this.buffered < HEADER_SIZE + length) {
+                // Wait for the rest of the payload; chunks are joined once
+                return;
+            }
+            const head = this.chunks.length === 1 ? header : Buffer.concat(this.chunks, this.buffered);
+            const type = head.readUInt8(3);
+            const requestId = head.readUInt32LE(4);
+            const payload = head.subarray(HEADER_SIZE, HEADER_SIZE + length);
+            const rest = head.subarray(HEADER_SIZE + length);
+            this.chunks = rest.length ? [rest] : [];
+            this.buffered = rest.length;
+            this.dispatch(type, requestId, payload);
+        }
+    }
+
+    dispatch(type, requestId, payload) {
+        if (type === MessageType.RECYCLE) {
+            this.owner.onRecycle(this, JSON.parse(payload.toString('utf8')));
+            return;
+        }
+        const entry = this.pending.get(requestId);
+        if (!entry) {
+            return;
+        }
+        this.pending.delete(requestId);
+        clearTimeout(entry.timer);
+        if (type === MessageType.ERROR) {
+            entry.reject(new Error(payload.toString('utf8')));
+        } else {
+            entry.resolve(payload);
+        }
+    }
+}
+
+export class BinaryWorker {
+    /**
+     * A worker that crosses its memory or request limit (ML_WORKER_MAX_RSS_MB,
+     * ML_WORKER_MAX_REQUESTS, see services/workerMemory.py) sends RECYCLE:
+     * new requests go to a freshly spawned process while the old one
+     * answers what it already received and exits.
+     * @param {string} scriptPath - Python service started with --serve-binary
+     * @param {Array} args - Extra command line arguments
+     */
+    constructor(scriptPath, args = [], { pythonPath = 'python3', timeoutMs = 30000, env = {} } = {}) {
+        this.scriptPath = scriptPath;
+        this.args = args;
+        this.pythonPath = pythonPath;
+        this.timeoutMs = timeoutMs;
+        this.env = env;
+        this.conn = null;
+        this.nextId = 1;
+        this.schema = null;
+        this.schemaPromise = null;
+        // Most recent recycle reports (reason, rss, requests, growth curve)
+        this.recycles = [];
+    }
+
+    connection() {
+        if (!this.conn) {
+            this.conn = new WorkerConnection(this);
+        }
+        return this.conn;
+    }
+
+    onRecycle(conn, report) {
+        if (this.conn === conn) {
+            this.conn = null;
+        }
+        this.recycles = [...this.recycles.slice(-19), { ...report, recycledAt: new Date().toISOString() }];
+        console.log(`[BINARY-IPC] Recycling ${path.basename(this.scriptPath)} worker ${report.pid} ` +
+            `(${report.recycle_reason}, ${report.rss_mb}MB after ${report.requests} requests)`);
+        conn.retire();
+    }
+
+    onConnectionClosed(conn) {
+        if (this.conn === conn) {
+            this.conn = null;
+            this.schemaPromise = this.schema ? this.schemaPromise : null;
+        }
+    }
+
+    /**
+     * Send one request frame; resolves with the response payload
+     * @param {number} type - MessageType request
+     * @param {Array<Buffer>} parts - Payload pieces (written without concatenation)
+     * @param {WorkerConnection} conn - Specific process (default: the active one)
+     */
+    request(type, parts = [], conn = this.connection()) {
+        const requestId = this.nextId;
+        this.nextId = (this.nextId % 0xffffffff) + 1;
+        return conn.send(type, requestId, parts, this.timeoutMs);
+    }
+
+    /** Names and tables the packed records refer to (fetched once per worker) */
+    async getSchema() {
+        if (this.schema) {
+            return this.schema;
+        }
+        if (!this.schemaPromise) {
+            this.schemaPromise = this.request(MessageType.HELLO).then((payload) => {
+                this.schema = JSON.parse(payload.toString('utf8'));
+                return this.schema;
+            });
+        }
+        return this.schemaPromise;
+    }
+
+    /**
+     * One task per user from a single batched predict
+     * Deterministic requests carry each user's id, slot and the day, so the
+     * worker picks exercises from that key's RNG and reuses cached tasks.
+     * @param {Array<Object>} users - User profiles (same fields as mlTaskGenerator.py input)
+     * @param {Object} options - { deterministic, day: 'YYYY-MM-DD', slots: per-user slot numbers }
+     * @returns {Promise<Array<Object>>} - Tasks shaped like MLTaskGenerator.generate_task
+     */
+    async generateTasks(users, { deterministic = false, day = null, slots = [] } = {}) {
+        const schema = await this.getSchema();
+        const cols = schema.feature_count;
+        const matrix = new Float32Array(users.length * cols);
+        users.forEach((user, i) => matrix.set(taskFeatureRow(user), i * cols));
+
+        const shape = Buffer.alloc(8);
+        shape.writeUInt32LE(users.length, 0);
+        shape.writeUInt32LE(cols, 4);
+        const parts = [shape, littleEndianBytes(matrix)];
+        if (deterministic) {
+            const keys = Buffer.from(JSON.stringify({
+                user_ids: users.map(user => String(user.user_id ?? user.id)),
+                slots: users.map((user, i) => slots[i] ?? null),
+                day
+            }), 'utf8');
+            const length = Buffer.alloc(4);
+            length.writeUInt32LE(keys.length, 0);
+            parts.push(length, keys);
+        }
+        const payload = await this.request(MessageType.TASKS, parts);
+
+        const count = payload.readUInt32LE(0);
+        const tasks = [];
+        for (let i = 0; i < count; i++) {
+            const offset = 4 + i * TASK_RECORD_SIZE;
+            const category = schema.categories[payload.readUInt8(offset)];
+            const difficulty = schema.difficulties[payload.readUInt8(offset + 1)];
+            const exercise = schema.exercises[category][difficulty][payload.readUInt8(offset + 2)];
+            const statRewards = {};
+            schema.stat_names.forEach((name, s) => {
+                statRewards[name] = payload.readUInt8(offset + 7 + s);
+            });
+            tasks.push({
+                exercise_name: exercise.name,
+                exercise_description: exercise.description,
+                exercise_target: exercise.reps ?? exercise.duration ?? 'N/A',
+                category,
+                difficulty,
+                xp: payload.readUInt16LE(offset + 3),
+                duration: payload.readUInt16LE(offset + 5),
+                stat_rewards: statRewards
+            });
+        }
+        return tasks;
+    }
+
+    /**
+     * Classify encoded images (JPEG/PNG/WebP bytes) in one batched call
+     * Runs the cascade when the worker has one; the meal index is not consulted.
+     * @param {Array<Buffer>} images - Encoded image files
+     * @param {number} confidenceThreshold - Minimum confidence (0-1)
+     */
+    async detectImages(images, confidenceThreshold = 0.3) {
+        const head = Buffer.alloc(8);
+        head.writeFloatLE(confidenceThreshold, 0);
+        head.writeUInt32LE(images.length, 4);
+        const parts = [head];
+        for (const image of images) {
+            const length = Buffer.alloc(4);
+            length.writeUInt32LE(image.length, 0);
+            parts.push(length, image);
+        }
+        const payload = await this.request(MessageType.DETECT_IMAGES, parts);
+        return this.decodeDetections(payload, confidenceThreshold);
+    }
+
+    /**
+     * Classify already-resized RGB pixels
+     * @param {Uint8Array} pixels - n * size * size * 3 bytes (size = schema.input_size)
+     * @param {number} count - Number of images
+     */
+    async detectTensor(pixels, count, confidenceThreshold = 0.3) {
+        const schema = await this.getSchema();
+        const head = Buffer.alloc(16);
+        head.writeFloatLE(confidenceThreshold, 0);
+        head.writeUInt32LE(count, 4);
+        head.writeUInt32LE(schema.input_size, 8);
+        head.writeUInt32LE(schema.input_size, 12);
+        const body = Buffer.from(pixels.buffer, pixels.byteOffset, pixels.byteLength);
+        const payload = await this.request(MessageType.DETECT_TENSOR, [head, body]);
+        return this.decodeDetections(payload, confidenceThreshold);
+    }
+
+    /**
+     * Classify images already written to a SharedImageRing (no file, no copy over the pipe)
+     * Same model path as detectImages (cascade, no meal index).
+     * @param {SharedImageRing} ring - Ring the handles belong to
+     * @param {Array<Object>} handles - { slot, generation, length } from ring.write
+     */
+    async detectSlots(ring, handles, confidenceThreshold = 0.3) {
+        const payload = Buffer.alloc(8 + handles.length * 12);
+        payload.writeFloatLE(confidenceThreshold, 0);
+        payload.writeUInt32LE(handles.length, 4);
+        handles.forEach(({ slot, generation, length }, i) => {
+            payload.writeUInt32LE(slot, 8 + i * 12);
+            payload.writeUInt32LE(generation, 12 + i * 12);
+            payload.writeUInt32LE(length, 16 + i * 12);
+        });
+
+        // The ring is attached per process, so attach and detect on the same one;
+        // retry once if that process was retired in between
+        for (let attempt = 0; ; attempt++) {
+            const conn = this.connection();
+            try {
+                if (!conn.ringAttach || conn.ringAttach.path !== ring.path) {
+                    conn.ringAttach = {
+                        path: ring.path,
+                        attached: this.request(MessageType.ATTACH_RING, [Buffer.from(ring.path, 'utf8')], conn)
+                    };
+                }
+                await conn.ringAttach.attached;
+                const response = await this.request(MessageType.DETECT_SLOTS, [payload], conn);
+                return this.decodeDetections(response, confidenceThreshold);
+            } catch (error) {
+                if (!conn.retired || attempt > 0) {
+                    throw error;
+                }
+            }
+        }
+    }
+
+    /**
+     * Add a confirmed meal to the user's embedding index with the worker's
+     * already-loaded backbone (no extra process or model load per meal)
+     * @param {string} userId - User who confirmed the meal
+     * @param {Buffer} image - Encoded image bytes
+     * @param {string} label - Confirmed food name
+     * @param {Object} nutrition - Nutrition to return on future matches
+     */
+    async confirmMeal(userId, image, label, nutrition = {}) {
+        const fields = Buffer.from(JSON.stringify({ user_id: String(userId), label, nutrition }), 'utf8');
+        const length = Buffer.alloc(4);
+        length.writeUInt32LE(fields.length, 0);
+        const payload = await this.request(MessageType.CONFIRM_MEAL, [length, fields, image]);
+        return JSON.parse(payload.toString('utf8'));
+    }
+
+    /** Memory report of the active worker process (RSS growth curve, limits) */
+    async memoryStats() {
+        const payload = await this.request(MessageType.MEMORY_STATS);
+        return JSON.parse(payload.toString('utf8'));
+    }
+
+    async decodeDetections(payload, confidenceThreshold) {
+        const schema = await this.getSchema();
+        const count = payload.readUInt32LE(0);
+        const results = [];
+        for (let i = 0; i < count; i++) {
+            const offset = 4 + i * DETECTION_RECORD_SIZE;
+            const status = payload.readInt8(offset);
+            if (status < 0) {
+                results.push({ status: 'error', error: 'Could not read image' });
+                continue;
+            }
+            const predictions = [];
+            for (let k = 0; k < TOP_K; k++) {
+                const index = payload.readUInt16LE(offset + 1 + k * 2);
+                if (index === NO_CLASS) {
+                    break;
+                }
+                const confidence = payload.readFloatLE(offset + 1 + TOP_K * 2 + k * 4);
+                predictions.push({
+                    food: schema.food_classes[index],
+                    confidence,
+                    probability: `${(confidence * 100).toFixed(2)}%`
+                });
+            }
+            const top = predictions[0];
+            if (status === 0) {
+                results.push({
+                    status: 'no_food_detected',
+                    message: 'No food detected with sufficient confidence',
+                    top_prediction: top
+                });
+                continue;
+            }
+            results.push({
+                status: 'success',
+                detected_food: top.food,
+                confidence: top.confidence,
+                probability: top.probability,
+                nutrition: schema.nutrition[top.food],
+                all_predictions: predictions.filter(p => p.confidence >= confidenceThreshold)
+            });
+        }
+        return results;
+    }
+
+    /** Close stdin so the worker exits after answering what it has */
+    stop() {
+        if (this.conn) {
+            this.conn.retire();
+            this.conn = null;
+        }
+    }
+}
+
+function littleEndianBytes(floats) {
+    const bytes = Buffer.from(floats.buffer, floats.byteOffset, floats.byteLength);
+    if (new Uint8Array(new Uint16Array([1]).buffer)[0] === 1) {
+        return bytes;
+    }
+    const copy = Buffer.from(bytes);
+    copy.swap32();
+    return copy;
+}
+
+export const taskWorkerScript = path.join(__dirname, 'mlTaskGenerator.py');
+export const foodWorkerScript = path.join(__dirname, 'northIndianFoodDetector.py');
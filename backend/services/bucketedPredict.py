@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Bucketed Predict - Fixed-shape compiled inference for the Keras models
+Batches are padded up to the next size in a small set of buckets, so every
+call hits one of a few pre-traced graphs instead of retracing (or paying
+Model.predict's per-call setup) for each new batch size
+"""
+
+import os
+import threading
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from mlMetrics import REGISTRY
+
+DEFAULT_BUCKETS = (1, 8, 32, 128)
+
+PREDICT_BATCHES = REGISTRY.counter(
+    'ml_predict_batches_total',
+    'Compiled predict calls by model and padded batch size',
+    ('model', 'bucket')
+)
+
+PREDICT_PADDING = REGISTRY.counter(
+    'ml_predict_padding_rows_total',
+    'Zero rows added to fill predict buckets',
+    ('model',)
+)
+
+
+def buckets_from_env(default: Tuple[int, ...] = DEFAULT_BUCKETS) -> Tuple[int, ...]:
+    """ML_PREDICT_BUCKETS="1,8,32" overrides the bucket sizes"""
+    value = os.environ.get('ML_PREDICT_BUCKETS')
+    if not value:
+        return tuple(default)
+    return tuple(sorted({int(b) for b in value.split(',') if b.strip()}))
+
+
+class BucketedPredictor:
+    """
+    Model.predict replacement with one concrete function per bucket
+
+    Batches larger than the biggest bucket run in chunks of that size.
+    Returns numpy arrays with the same structure as Model.predict.
+    """
+
+    def __init__(self, model, name: str, buckets: Iterable[int] = DEFAULT_BUCKETS):
+        import tensorflow as tf
+
+        self.model = model
+        self.name = name
+        self.buckets = tuple(sorted(set(buckets)))
+        self.input_shape = tuple(model.input_shape[1:])
+        self._function = tf.function(lambda x: model(x, training=False))
+        self._compiled: Dict[int, object] = {}
+        self._lock = threading.Lock()
+
+    def _compiled_for(self, bucket: int):
+        fn = self._compiled.get(bucket)
+        if fn is None:
+            import tensorflow as tf
+            with self._lock:
+                fn = self._compiled.get(bucket)
+                if fn is None:
+                    spec = tf.TensorSpec((bucket, *self.input_shape), tf.float32)
+                    fn = self._function.get_concrete_function(spec)
+                    self._compiled[bucket] = fn
+        return fn
+
+    def bucket_for(self, rows: int) -> int:
+        for bucket in self.buckets:
+            if bucket >= rows:
+                return bucket
+        return self.buckets[-1]
+
+    def warm_up(self):
+        """Trace and run every bucket once"""
+        for bucket in self.buckets:
+            self._run(np.zeros((bucket, *self.input_shape), dtype=np.float32), bucket)
+
+    def _run(self, batch: np.ndarray, bucket: int):
+        rows = len(batch)
+        if rows < bucket:
+            padding = np.zeros((bucket - rows, *self.input_shape), dtype=np.float32)
+            batch = np.concatenate([batch, padding])
+            PREDICT_PADDING.inc(self.name, amount=bucket - rows)
+        PREDICT_BATCHES.inc(self.name, str(bucket))
+        outputs = self._compiled_for(bucket)(batch)
+        if isinstance(outputs, (list, tuple)):
+            return [o.numpy()[:rows] for o in outputs]
+        return outputs.numpy()[:rows]
+
+    def predict(self, x, verbose: int = 0):
+        x = np.asarray(x, dtype=np.float32)
+        largest = self.buckets[-1]
+        if len(x) <= largest:
+            return self._run(x, self.bucket_for(len(x)))
+
+        parts = [self._run(x[start:start + largest], self.bucket_for(len(x[start:start + largest])))
+                 for start in range(0, len(x), largest)]
+        if isinstance(parts[0], list):
+            return [np.concatenate(heads) for heads in zip(*parts)]
+        return np.concatenate(parts)
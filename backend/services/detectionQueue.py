@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""
+Detection Queue - Durable SQLite job queue for food detection
+HTTP handlers enqueue an uploaded image and return a job id at once; a pool
+of worker processes, each holding one loaded NorthIndianFoodDetector, pulls
+jobs in batches (one forward pass per batch), retries failures with
+exponential backoff and stores results. The API's delivery loop claims
+finished user jobs (claim-deliveries), logs the meal and records the
+response in the job row (deliver), whether or not the client ever polls.
+Jobs for the same image bytes, user and threshold are deduplicated.
+
+Usage:
+  python detectionQueue.py enqueue <image_path> [--threshold 0.3] [--user <id>]
+  python detectionQueue.py status <job_id> [--wait <seconds>]
+  python detectionQueue.py claim-deliveries [--deliverer <id>] [--limit 16]
+  python detectionQueue.py deliver <job_id> <payload_json>
+  python detectionQueue.py workers [--workers 2] [--batch-size 8] [--max-rss-mb 1500] [--max-jobs 5000]
+  python detectionQueue.py stats
+  python detectionQueue.py purge [--older-than-days 7]
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import sqlite3
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from singleFlight import file_hash
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DB_PATH = os.environ.get('ML_JOB_QUEUE_DB', str(BACKEND_DIR / 'ml_models' / 'detection_jobs.sqlite3'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detection_jobs (
+  id TEXT PRIMARY KEY,
+  dedup_key TEXT NOT NULL,
+  image_path TEXT NOT NULL,
+  user_id TEXT,
+  threshold REAL NOT NULL,
+  status TEXT NOT NULL DEFAULT 'queued',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 3,
+  available_at REAL NOT NULL,
+  locked_by TEXT,
+  locked_at REAL,
+  result TEXT,
+  error TEXT,
+  delivery TEXT,
+  delivering_by TEXT,
+  delivering_at REAL,
+  created_at REAL NOT NULL,
+  updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_detection_jobs_ready ON detection_jobs(status, available_at);
+CREATE INDEX IF NOT EXISTS idx_detection_jobs_dedup ON detection_jobs(dedup_key, created_at);
+"""
+# Columns added after the first release: (name, type), added to older databases on open
+ADDED_COLUMNS = (('delivering_by', 'TEXT'), ('delivering_at', 'REAL'))
+
+# Job states: queued -> running -> done | (queued again after a retryable failure) | failed
+# A finished user job is then delivered once (logged by the API) and the
+# response stored in `delivery`
+ACTIVE_STATES = ('queued', 'running', 'done')
+
+
+class JobQueue:
+    """SQLite-backed detection jobs; safe across processes (WAL, immediate transactions)"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, lease_seconds: float = 120.0,
+                 backoff_base: float = 2.0, backoff_max: float = 60.0, dedup_window: float = 3600.0):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.dedup_window = dedup_window
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        existing = {row['name'] for row in self.conn.execute('PRAGMA table_info(detection_jobs)')}
+        for name, column_type in ADDED_COLUMNS:
+            if name not in existing:
+                self.conn.execute(f'ALTER TABLE detection_jobs ADD COLUMN {name} {column_type}')
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that takes the lock up front (no upgrade deadlocks)"""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.conn
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def dedup_key(image_path: str, user_id: Optional[str], threshold: float) -> str:
+        return f"{file_hash(image_path)}:{user_id or ''}:{threshold:.4f}"
+
+    def enqueue(self, image_path: str, threshold: float = 0.3, user_id: str = None,
+                max_attempts: int = 3) -> Tuple[str, bool]:
+        """(job id, deduplicated); an identical recent job is returned instead of a new one"""
+        key = self.dedup_key(image_path, user_id, threshold)
+        now = time.time()
+        with self._transaction() as conn:
+            existing = conn.execute(
+                f"SELECT id FROM detection_jobs WHERE dedup_key = ? AND created_at >= ? "
+                f"AND status IN ({','.join('?' * len(ACTIVE_STATES))}) ORDER BY created_at DESC LIMIT 1",
+                (key, now - self.dedup_window, *ACTIVE_STATES)
+            ).fetchone()
+            if existing:
+                return existing['id'], True
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO detection_jobs (id, dedup_key, image_path, user_id, threshold, max_attempts, "
+                "available_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, key, str(image_path), None if user_id is None else str(user_id),
+                 float(threshold), max_attempts, now, now, now)
+            )
+        return job_id, False
+
+    def dequeue_batch(self, worker_id: str, limit: int = 8) -> List[Dict]:
+        """Claim up to `limit` ready jobs; expired leases of crashed workers are reclaimed"""
+        now = time.time()
+        with self._transaction() as conn:
+            self._reclaim_expired(conn, now)
+            rows = conn.execute(
+                "SELECT * FROM detection_jobs WHERE status = 'queued' AND available_at <= ? "
+                "ORDER BY available_at, created_at LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE detection_jobs SET status = 'running', locked_by = ?, locked_at = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    [(worker_id, now, now, row['id']) for row in rows]
+                )
+        return [dict(row, attempts=row['attempts'] + 1) for row in rows]
+
+    def _retry_at(self, attempts: int, now: float) -> float:
+        """Exponential backoff with jitter before attempt attempts + 1"""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return now + delay * (1 + random.random() * 0.25)
+
+    def _reclaim_expired(self, conn, now: float):
+        """
+        Expired leases count as failed attempts: a job whose worker died (OOM,
+        a crash inside TF) is retried with backoff, and marked failed once it
+        has used its attempts, so a poison job cannot take down workers forever
+        """
+        expired = conn.execute(
+            "SELECT id, attempts, max_attempts FROM detection_jobs WHERE status = 'running' AND locked_at < ?",
+            (now - self.lease_seconds,)
+        ).fetchall()
+        if not expired:
+            return
+        error = f'Worker lease expired after {self.lease_seconds:.0f}s (worker crashed or hung)'
+        conn.executemany(
+            "UPDATE detection_jobs SET status = ?, error = ?, available_at = ?, locked_by = NULL, "
+            "updated_at = ? WHERE id = ?",
+            [('failed', error, now, now, row['id']) if row['attempts'] >= row['max_attempts']
+             else ('queued', error, self._retry_at(row['attempts'], now), now, row['id'])
+             for row in expired]
+        )
+        failed = sum(row['attempts'] >= row['max_attempts'] for row in expired)
+        print(f"⚠️ Reclaimed {len(expired)} expired job(s), {failed} failed after max attempts",
+              file=sys.stderr)
+
+    def complete(self, job_id: str, result: Dict):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE detection_jobs SET status = 'done', result = ?, error = NULL, locked_by = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (json.dumps(result), now, job_id)
+            )
+
+    def fail(self, job_id: str, error: str) -> str:
+        """Requeue with exponential backoff, or mark failed after max_attempts; returns the new status"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM detection_jobs WHERE id = ?",
+                               (job_id,)).fetchone()
+            if row is None:
+                return 'missing'
+            if row['attempts'] >= row['max_attempts']:
+                status, available_at = 'failed', now
+            else:
+                status, available_at = 'queued', self._retry_at(row['attempts'], now)
+            conn.execute(
+                "UPDATE detection_jobs SET status = ?, error = ?, available_at = ?, locked_by = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (status, error, available_at, now, job_id)
+            )
+        return status
+
+    def claim_deliveries(self, deliverer_id: str, limit: int = 16, lease_seconds: float = 60.0) -> List[Dict]:
+        """
+        Claim finished user jobs that have not been delivered yet; a claim whose
+        deliverer died is taken over after lease_seconds
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id FROM detection_jobs WHERE status IN ('done', 'failed') AND delivery IS NULL "
+                "AND user_id IS NOT NULL AND (delivering_at IS NULL OR delivering_at < ?) "
+                "ORDER BY updated_at LIMIT ?",
+                (now - lease_seconds, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE detection_jobs SET delivering_by = ?, delivering_at = ? WHERE id = ?",
+                [(deliverer_id, now, row['id']) for row in rows]
+            )
+        return [self.get(row['id']) for row in rows]
+
+    def undelivered(self) -> int:
+        """User jobs whose meal is not logged yet (queued, running or finished)"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM detection_jobs WHERE user_id IS NOT NULL AND delivery IS NULL"
+        ).fetchone()[0]
+
+    def deliver(self, job_id: str, payload: Dict) -> bool:
+        """
+        Store what the API returned for a finished job, so polls return it;
+        only the first delivery is kept (False if the job was already delivered)
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE detection_jobs SET delivery = ?, delivering_by = NULL, delivering_at = NULL, "
+                "updated_at = ? WHERE id = ? AND delivery IS NULL",
+                (json.dumps(payload), time.time(), job_id)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM detection_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {
+            'job_id': row['id'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'max_attempts': row['max_attempts'],
+            'user_id': row['user_id'],
+            'image_path': row['image_path'],
+            'threshold': row['threshold'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at']
+        }
+        if row['status'] == 'queued' and row['attempts']:
+            job['retry_at'] = row['available_at']
+        for field in ('result', 'delivery'):
+            if row[field]:
+                job[field] = json.loads(row[field])
+        if row['error']:
+            job['error'] = row['error']
+        return job
+
+    def wait(self, job_id: str, timeout: float, interval: float = 0.1) -> Optional[Dict]:
+        """Poll until the job is done or failed, or the timeout passes"""
+        deadline = time.time() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job['status'] in ('done', 'failed') or time.time() >= deadline:
+                return job
+            time.sleep(interval)
+
+    def stats(self) -> Dict:
+        counts = {row['status']: row['count'] for row in self.conn.execute(
+            "SELECT status, COUNT(*) AS count FROM detection_jobs GROUP BY status")}
+        oldest = self.conn.execute(
+            "SELECT MIN(created_at) FROM detection_jobs WHERE status = 'queued'").fetchone()[0]
+        return {
+            'counts': counts,
+            'oldest_queued_seconds': round(time.time() - oldest, 1) if oldest else None
+        }
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Delete finished jobs older than the given age"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM detection_jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - older_than_seconds,)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        self.conn.close()
+
+
+def process_batch(detector, queue: JobQueue, jobs: List[Dict]):
+    """
+    Run claimed jobs batched per threshold: one backbone pass for the jobs
+    with a user (meal index lookups, one head pass over the misses) and one
+    cascade pass for the rest
+    """
+    groups: Dict[float, List[Dict]] = {}
+    for job in jobs:
+        groups.setdefault(job['threshold'], []).append(job)
+    for threshold, group in groups.items():
+        results = detector.detect_foods([job['image_path'] for job in group], threshold,
+                                        [job['user_id'] for job in group])
+        _record(queue, list(zip(group, results)))
+
+
+def _record(queue: JobQueue, results):
+    for job, result in results:
+        if result.get('status') in ('error', 'failed'):
+            status = queue.fail(job['id'], result.get('error', 'Detection failed'))
+            print(f"⚠️ Job {job['id']} attempt {job['attempts']} failed ({status}): {result.get('error')}",
+                  file=sys.stderr)
+        else:
+            queue.complete(job['id'], result)
+
+
+def run_worker(db_path: str, worker_id: str, batch_size: int, model_path: Optional[str],
+               idle_sleep: float = 0.05, max_idle_sleep: float = 1.0, memory_limits: Dict = None):
+    """
+    Worker process: load the detector once, then drain the queue until SIGTERM
+
+    Exits with RECYCLE_EXIT_CODE after the batch in which it crossed its
+    memory or job limit, so the pool replaces it with a fresh process.
+    """
+    from northIndianFoodDetector import NorthIndianFoodDetector
+    from workerMemory import RECYCLE_EXIT_CODE, MemoryWatchdog
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+    ml_models_dir = BACKEND_DIR / 'ml_models'
+    detector = NorthIndianFoodDetector(
+        model_path if model_path and Path(model_path).exists() else None,
+        cascade_model_path=str(ml_models_dir / 'north_indian_food_stage1.h5'),
+        meal_index_dir=str(ml_models_dir / 'meal_index')
+    )
+    detector.warm_up()
+    queue = JobQueue(db_path)
+    watchdog = MemoryWatchdog.from_env('food_detector', worker_id, **(memory_limits or {}))
+    print(f"✓ Worker {worker_id} ready ({watchdog.baseline_rss_mb:.0f}MB)", file=sys.stderr)
+
+    sleep = idle_sleep
+    while not stopping:
+        jobs = queue.dequeue_batch(worker_id, batch_size)
+        if not jobs:
+            time.sleep(sleep)
+            sleep = min(max_idle_sleep, sleep * 2)
+            continue
+        sleep = idle_sleep
+        try:
+            process_batch(detector, queue, jobs)
+        except Exception as e:
+            for job in jobs:
+                queue.fail(job['id'], str(e))
+            print(f"✗ Worker {worker_id} batch failed: {e}", file=sys.stderr)
+        if watchdog.record(len(jobs)):
+            break
+    queue.close()
+    watchdog.write(final=True)
+    if watchdog.recycle_reason and not stopping:
+        print(f"♻️ Worker {worker_id} recycling ({watchdog.recycle_reason}, "
+              f"{watchdog.report(allocations=False)['rss_mb']}MB after {watchdog.requests} jobs)", file=sys.stderr)
+        sys.exit(RECYCLE_EXIT_CODE)
+    print(f"✓ Worker {worker_id} stopped", file=sys.stderr)
+
+
+class DetectionWorkerPool:
+    """
+    N worker processes consuming one queue database
+
+    wait() supervises them: a worker that exits to be recycled (memory or
+    job limit) or crashes is replaced in the same slot. Crash restarts back
+    off exponentially; recycles restart at once.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, workers: int = 2, batch_size: int = 8,
+                 model_path: str = None, memory_limits: Dict = None):
+        import multiprocessing
+        self.context = multiprocessing.get_context('spawn')
+        self.db_path = db_path
+        self.workers = workers
+        self.batch_size = batch_size
+        self.model_path = model_path or str(BACKEND_DIR / 'ml_models' / 'north_indian_food_model.h5')
+        self.memory_limits = memory_limits or {}
+        self.processes = []
+        self.generations = [0] * workers
+        self.restarts = {'recycled': 0, 'crashed': 0}
+        self._crash_backoff = [0.0] * workers
+        self._restart_at = [None] * workers
+        self._stopping = False
+
+    def _spawn(self, slot: int):
+        worker_id = f'{os.getpid()}-{slot}.{self.generations[slot]}'
+        self.generations[slot] += 1
+        process = self.context.Process(
+            target=run_worker,
+            args=(self.db_path, worker_id, self.batch_size, self.model_path),
+            kwargs={'memory_limits': self.memory_limits},
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def start(self):
+        # Create the schema before workers race to do it
+        JobQueue(self.db_path).close()
+        self.processes = [self._spawn(i) for i in range(self.workers)]
+        return self
+
+    def stop(self, timeout: float = 30.0):
+        """Let every worker finish its current batch, then exit"""
+        self._stopping = True
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join(timeout)
+        self.processes = []
+
+    def supervise_once(self):
+        """Replace workers that have exited since the last check"""
+        from workerMemory import RECYCLE_EXIT_CODE
+
+        for slot, process in enumerate(self.processes):
+            if self._stopping or process.is_alive():
+                continue
+            if self._restart_at[slot] is None:
+                if process.exitcode == RECYCLE_EXIT_CODE:
+                    self.restarts['recycled'] += 1
+                    self._crash_backoff[slot] = 0.0
+                else:
+                    self.restarts['crashed'] += 1
+                    self._crash_backoff[slot] = min(60.0, max(1.0, self._crash_backoff[slot] * 2))
+                    print(f"✗ Worker slot {slot} exited with code {process.exitcode}, "
+                          f"restarting in {self._crash_backoff[slot]:.0f}s", file=sys.stderr)
+                self._restart_at[slot] = time.monotonic() + self._crash_backoff[slot]
+            if time.monotonic() >= self._restart_at[slot]:
+                self._restart_at[slot] = None
+                self.processes[slot] = self._spawn(slot)
+
+    def wait(self, interval: float = 1.0):
+        while self.processes and not self._stopping:
+            self.supervise_once()
+            time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Durable food detection job queue')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = sub.add_parser('enqueue')
+    enqueue.add_argument('image_path')
+    enqueue.add_argument('--threshold', type=float, default=0.3)
+    enqueue.add_argument('--user')
+    enqueue.add_argument('--max-attempts', type=int, default=3)
+
+    status = sub.add_parser('status')
+    status.add_argument('job_id')
+    status.add_argument('--wait', type=float, default=0, help='Block up to this many seconds for a result')
+
+    claim = sub.add_parser('claim-deliveries')
+    claim.add_argument('--deliverer', default=f'{os.getpid()}')
+    claim.add_argument('--limit', type=int, default=16)
+    claim.add_argument('--lease', type=float, default=60.0, help='Seconds before a stale claim is retaken')
+
+    deliver = sub.add_parser('deliver')
+    deliver.add_argument('job_id')
+    deliver.add_argument('payload')
+
+    workers = sub.add_parser('workers')
+    workers.add_argument('--workers', type=int, help='Default: tuned profile, else 2')
+    workers.add_argument('--batch-size', type=int, help='Default: tuned profile, else 8')
+    workers.add_argument('--model')
+    workers.add_argument('--max-rss-mb', type=float, help='Recycle a worker above this RSS')
+    workers.add_argument('--max-jobs', type=int, help='Recycle a worker after this many jobs')
+
+    sub.add_parser('stats')
+
+    purge = sub.add_parser('purge')
+    purge.add_argument('--older-than-days', type=float, default=7)
+
+    args = parser.parse_args()
+
+    if args.command == 'workers':
+        from inferenceTuning import load_profile
+        tuned = load_profile('food_detector')
+        limits = {'max_rss_mb': args.max_rss_mb, 'max_requests': args.max_jobs}
+        pool = DetectionWorkerPool(args.db, args.workers or tuned.get('workers', 2),
+                                   args.batch_size or tuned.get('batch_size', 8), args.model, limits).start()
+        signal.signal(signal.SIGTERM, lambda *_: pool.stop())
+        try:
+            pool.wait()
+        except KeyboardInterrupt:
+            pool.stop()
+        return
+
+    queue = JobQueue(args.db)
+    try:
+        if args.command == 'enqueue':
+            if not Path(args.image_path).exists():
+                print(json.dumps({'status': 'error', 'error': f'Image not found: {args.image_path}'}))
+                sys.exit(1)
+            job_id, deduplicated = queue.enqueue(args.image_path, args.threshold, args.user, args.max_attempts)
+            output = {'status': 'queued', 'job_id': job_id, 'deduplicated': deduplicated}
+            if deduplicated:
+                output['status'] = queue.get(job_id)['status']
+        elif args.command == 'status':
+            job = queue.wait(args.job_id, args.wait) if args.wait else queue.get(args.job_id)
+            output = job or {'status': 'error', 'error': f'Unknown job: {args.job_id}'}
+        elif args.command == 'claim-deliveries':
+            jobs = queue.claim_deliveries(args.deliverer, args.limit, args.lease)
+            output = {'status': 'success', 'jobs': jobs, 'undelivered': queue.undelivered()}
+        elif args.command == 'deliver':
+            recorded = queue.deliver(args.job_id, json.loads(args.payload))
+            output = {'status': 'success', 'job_id': args.job_id, 'recorded': recorded}
+        elif args.command == 'stats':
+            output = queue.stats()
+        else:
+            output = {'status': 'success', 'purged': queue.purge(args.older_than_days * 86400)}
+    finally:
+        queue.close()
+    print(json.dumps(output))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,8 @@ import { spawn } from 'child_process';
 import path from 'path';
 import fs from 'fs';
 import { fileURLToPath } from 'url';
+import { BinaryWorker } from './binaryIpcClient.js';
+import SharedImageRing from './sharedImageRing.js';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
@@ -14,9 +16,16 @@ const __dirname = path.dirname(__filename);
 class FoodDetectionService {
     constructor() {
         this.pythonScriptPath = path.join(__dirname, 'northIndianFoodDetector.py');
+        this.queueScriptPath = path.join(__dirname, 'detectionQueue.py');
         this.backendDir = path.dirname(__dirname);
         this.mlModelsDir = path.join(this.backendDir, 'ml_models');
+        // Same default as detectionQueue.py
+        this.queueDbPath = process.env.ML_JOB_QUEUE_DB || path.join(this.mlModelsDir, 'detection_jobs.sqlite3');
         this.uploadDir = path.join(this.backendDir, 'uploads', 'food-images');
+        // Persistent detector for batch calls (started on first use)
+        this.worker = null;
+        // Upload bytes handed to that worker through shared memory
+        this.imageRing = null;
 
         // Create directories if they don't exist
         this.ensureDirectories();
@@ -35,16 +44,17 @@ class FoodDetectionService {
      * Run Python food detection script
      * @param {string} pythonPath - Path to Python executable
          * @param {Array} args - Command line arguments
+         * @param {string} scriptPath - Script to run (default: the detector)
          * @returns {Promise<Object>} - Detection result or error
          */
-    runPythonScript(pythonPath = 'python3', args = []) {
+    runPythonScript(pythonPath = 'python3', args = [], scriptPath = this.pythonScriptPath) {
         return new Promise((resolve, reject) => {
             const timeout = setTimeout(() => {
                 process.kill(pythonProcess.pid);
                 reject(new Error('Food detection timeout (>30s)'));
             }, 30000);
 
-            const pythonProcess = spawn(pythonPath, [this.pythonScriptPath, ...args], {
+            const pythonProcess = spawn(pythonPath, [scriptPath, ...args], {
                 cwd: this.backendDir,
                 env: { ...process.env, PYTHONUNBUFFERED: '1' }
             });
@@ -103,9 +113,10 @@ class FoodDetectionService {
      * Detect food in an image
      * @param {string} imagePath - Path to the food image
      * @param {number} confidenceThreshold - Minimum confidence (0-1)
+     * @param {string} userId - Check this user's confirmed meals first (optional)
      * @returns {Promise<Object>} - Detection result with food details
      */
-    async detectFood(imagePath, confidenceThreshold = 0.3) {
+    async detectFood(imagePath, confidenceThreshold = 0.3, userId = null) {
         try {
             // Validate image exists
             if (!fs.existsSync(imagePath)) {
@@ -126,7 +137,43 @@ class FoodDetectionService {
                 pythonPath = 'python';
             }
 
-            const result = await this.runPythonScript(pythonPath, [
+            const args = [imagePath, confidenceThreshold.toString()];
+            if (userId) {
+                args.push('--user', String(userId));
+            }
+
+            const result = await this.runPythonScript(pythonPath, args);
+
+            return {
+                ...result,
+                imageFile: path.basename(imagePath)
+            };
+        } catch (error) {
+            return {
+                status: 'error',
+                error: error.error || error.message || String(error),
+                details: error.details || error.hint
+            };
+        }
+    }
+
+    /**
+     * Detect every dish on a plate (e.g. a thali) in one batched pass
+     * @param {string} imagePath - Path to the plate image
+     * @param {number} confidenceThreshold - Minimum confidence per item (0-1)
+     * @returns {Promise<Object>} - Items with nutrition and meal totals
+     */
+    async detectPlate(imagePath, confidenceThreshold = 0.5) {
+        try {
+            if (!fs.existsSync(imagePath)) {
+                return {
+                    status: 'error',
+                    error: `Image not found: ${imagePath}`
+                };
+            }
+
+            const result = await this.runPythonScript('python3', [
+                '--plate',
                 imagePath,
                 confidenceThreshold.toString()
             ]);
@@ -144,6 +191,213 @@ class FoodDetectionService {
         }
     }
 
+    /**
+     * Persistent binary IPC detector worker, started on first use
+     */
+    getWorker() {
+        if (!this.worker) {
+            this.worker = new BinaryWorker(this.pythonScriptPath, [], { timeoutMs: 60000 });
+        }
+        return this.worker;
+    }
+
+    /**
+     * Detect food in several images through the persistent binary IPC worker
+     * (model loaded once; image bytes sent as-is, one forward pass per call)
+     * @param {Array<string>} imagePaths - Paths to food images
+     * @param {number} confidenceThreshold - Minimum confidence (0-1)
+     * @returns {Promise<Array<Object>>} - One detection result per image
+     */
+    async detectFoods(imagePaths, confidenceThreshold = 0.3) {
+        try {
+            const images = await Promise.all(imagePaths.map(p => fs.promises.readFile(p)));
+            const results = await this.getWorker().detectImages(images, confidenceThreshold);
+            return results.map((result, i) => ({
+                ...result,
+                imageFile: path.basename(imagePaths[i])
+            }));
+        } catch (error) {
+            return imagePaths.map(p => ({
+                status: 'error',
+                error: error.message || String(error),
+                imageFile: path.basename(p)
+            }));
+        }
+    }
+
+    /**
+     * Detect food in an in-memory upload without writing it to disk first
+     * The bytes go into a shared-memory ring slot read in place by the
+     * persistent detector; when the ring has no room (image larger than a
+     * slot, or every slot busy) it falls back to detectFood on a file.
+     * @param {Buffer} imageBuffer - Encoded image bytes
+     * @param {number} confidenceThreshold - Minimum confidence (0-1)
+     * @param {Function} fallbackPath - Async () => path of the image on disk
+     * @returns {Promise<Object>} - Detection result ({ transport: 'shm' | 'file' })
+     */
+    async detectImageBuffer(imageBuffer, confidenceThreshold = 0.3, fallbackPath) {
+        if (!this.imageRing) {
+            this.imageRing = new SharedImageRing({
+                slots: parseInt(process.env.IMAGE_RING_SLOTS || '16', 10),
+                slotSize: parseInt(process.env.IMAGE_RING_SLOT_MB || '4', 10) * 1024 * 1024
+            });
+        }
+        const handle = this.imageRing.write(imageBuffer);
+        if (!handle) {
+            const result = await this.detectFood(await fallbackPath(), confidenceThreshold);
+            return { ...result, transport: 'file' };
+        }
+        try {
+            const [result] = await this.getWorker().detectSlots(this.imageRing, [handle], confidenceThreshold);
+            return { ...result, transport: 'shm' };
+        } catch (error) {
+            return {
+                status: 'error',
+                error: error.message || String(error),
+                transport: 'shm'
+            };
+        } finally {
+            this.imageRing.release(handle);
+        }
+    }
+
+    /**
+     * Queue a detection job and return its id without waiting for the model
+     * (consumed by `python3 services/detectionQueue.py workers`)
+     * @param {string} imagePath - Path to the food image (kept until the job finishes)
+     * @param {number} confidenceThreshold - Minimum confidence (0-1)
+     * @param {string} userId - Check this user's confirmed meals first (optional)
+     * @returns {Promise<Object>} - { status, job_id, deduplicated }
+     */
+    async enqueueDetection(imagePath, confidenceThreshold = 0.3, userId = null) {
+        try {
+            const args = ['enqueue', imagePath, '--threshold', confidenceThreshold.toString()];
+            if (userId) {
+                args.push('--user', String(userId));
+            }
+            return await this.runPythonScript('python3', args, this.queueScriptPath);
+        } catch (error) {
+            return {
+                status: 'error',
+                error: error.error || error.message || String(error)
+            };
+        }
+    }
+
+    /**
+     * Current state of a detection job (queued, running, done, failed)
+     * @param {string} jobId - Id returned by enqueueDetection
+     * @returns {Promise<Object>} - Job with `result` once done and `delivery` once delivered
+     */
+    async getDetectionJob(jobId) {
+        try {
+            return await this.runPythonScript('python3', ['status', String(jobId)], this.queueScriptPath);
+        } catch (error) {
+            return {
+                status: 'error',
+                error: error.error || error.message || String(error)
+            };
+        }
+    }
+
+    /**
+     * Whether a detection queue database exists (jobs may be waiting from a previous process)
+     */
+    hasDetectionQueue() {
+        return fs.existsSync(this.queueDbPath);
+    }
+
+    /**
+     * Claim finished user jobs that still need their meal logged
+     * (a claim expires after 60s, so jobs of a crashed API process are retaken)
+     * @param {string} delivererId - Id of the claiming process
+     * @param {number} limit - Max jobs to claim
+     * @returns {Promise<Object>} - { status, jobs, undelivered } (undelivered counts unfinished jobs too)
+     */
+    async claimDetectionDeliveries(delivererId, limit = 16) {
+        try {
+            return await this.runPythonScript(
+                'python3',
+                ['claim-deliveries', '--deliverer', String(delivererId), '--limit', String(limit)],
+                this.queueScriptPath
+            );
+        } catch (error) {
+            return {
+                status: 'error',
+                error: error.error || error.message || String(error),
+                jobs: []
+            };
+        }
+    }
+
+    /**
+     * Store the API response for a finished job so later polls return it unchanged
+     * @param {string} jobId - Detection job id
+     * @param {Object} payload - Response body that was sent for the job
+     */
+    async deliverDetectionJob(jobId, payload) {
+        return this.runPythonScript(
+            'python3',
+            ['deliver', String(jobId), JSON.stringify(payload)],
+            this.queueScriptPath
+        );
+    }
+
+    /**
+     * Detect food over a sequence of camera frames (capture order)
+     * Near-identical frames are skipped, changed ones are batched within a
+     * per-second inference budget and smoothed into a stable label
+     * @param {Array<string>} framePaths - Frame image paths in capture order
+     * @param {Object} options - { fps, budget } frames per second and max inferences per second
+     * @returns {Promise<Object>} - Smoothed label, stability flag and per-frame timeline
+     */
+    async detectStream(framePaths, options = {}) {
+        try {
+            const missing = framePaths.find((framePath) => !fs.existsSync(framePath));
+            if (missing) {
+                return {
+                    status: 'error',
+                    error: `Image not found: ${missing}`
+                };
+            }
+
+            const args = ['--stream', ...framePaths, '--fps', String(options.fps || 10)];
+            if (options.budget) {
+                args.push('--budget', String(options.budget));
+            }
+
+            return await this.runPythonScript('python3', args);
+        } catch (error) {
+            return {
+                status: 'error',
+                error: error.error || error.message || String(error),
+                details: error.details || error.hint
+            };
+        }
+    }
+
+    /**
+     * Add a confirmed meal to the user's embedding index so repeat
+     * photos of it are recognised without the classifier or CSV lookup
+     * (runs on the persistent binary worker, which already holds the backbone)
+     * @param {string} userId - User who confirmed the meal
+     * @param {string} imagePath - Path to the meal image
+     * @param {string} label - Confirmed food name
+     * @param {Object} nutrition - Nutrition to return on future matches
+     * @returns {Promise<Object>} - Index update result
+     */
+    async confirmMeal(userId, imagePath, label, nutrition = {}) {
+        try {
+            const image = await fs.promises.readFile(imagePath);
+            return await this.getWorker().confirmMeal(userId, image, label, nutrition);
+        } catch (error) {
+            return {
+                status: 'error',
+                error: error.error || error.message || String(error)
+            };
+        }
+    }
+
     /**
      * Get nutrition information for a food
      * @param {string} foodName - Name of the food
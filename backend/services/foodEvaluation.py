@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Food Detector Evaluation - Offline accuracy over labelled image directories
+Streams <dir>/<food_class>/<image> through batched inference with parallel
+preprocessing; checkpoints running totals so long runs can resume
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.webp')
+CALIBRATION_BINS = 10
+
+
+def iter_labelled_images(root: str, classes: List[str]) -> Iterator[Tuple[str, int]]:
+    """(path, class_idx) in a stable order, without listing the whole corpus up front"""
+    for class_dir in sorted(Path(root).iterdir()):
+        if not class_dir.is_dir():
+            continue
+        if class_dir.name not in classes:
+            print(f"⚠️ Skipping unknown class folder: {class_dir.name}", file=sys.stderr)
+            continue
+        label = classes.index(class_dir.name)
+        with os.scandir(class_dir) as entries:
+            names = sorted(e.name for e in entries if e.is_file())
+        for name in names:
+            if name.lower().endswith(IMAGE_SUFFIXES):
+                yield str(class_dir / name), label
+
+
+class EvaluationState:
+    """Running totals; everything the report needs, small enough to checkpoint"""
+
+    def __init__(self, num_classes: int):
+        self.processed = 0
+        self.failed = 0
+        self.elapsed = 0.0
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.bin_count = np.zeros(CALIBRATION_BINS, dtype=np.int64)
+        self.bin_confidence = np.zeros(CALIBRATION_BINS, dtype=np.float64)
+        self.bin_correct = np.zeros(CALIBRATION_BINS, dtype=np.int64)
+
+    def update(self, scores: np.ndarray, labels: np.ndarray):
+        predicted = scores.argmax(axis=1)
+        confidence = scores.max(axis=1)
+        np.add.at(self.confusion, (labels, predicted), 1)
+
+        bins = np.minimum((confidence * CALIBRATION_BINS).astype(int), CALIBRATION_BINS - 1)
+        np.add.at(self.bin_count, bins, 1)
+        np.add.at(self.bin_confidence, bins, confidence)
+        np.add.at(self.bin_correct, bins, (predicted == labels).astype(np.int64))
+
+    def to_dict(self) -> Dict:
+        return {
+            'processed': self.processed,
+            'failed': self.failed,
+            'elapsed': self.elapsed,
+            'confusion': self.confusion.tolist(),
+            'bin_count': self.bin_count.tolist(),
+            'bin_confidence': self.bin_confidence.tolist(),
+            'bin_correct': self.bin_correct.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'EvaluationState':
+        state = cls(len(data['confusion']))
+        state.processed = data['processed']
+        state.failed = data['failed']
+        state.elapsed = data['elapsed']
+        state.confusion = np.array(data['confusion'], dtype=np.int64)
+        state.bin_count = np.array(data['bin_count'], dtype=np.int64)
+        state.bin_confidence = np.array(data['bin_confidence'], dtype=np.float64)
+        state.bin_correct = np.array(data['bin_correct'], dtype=np.int64)
+        return state
+
+
+def save_checkpoint(path: str, root: str, classes: List[str], state: EvaluationState):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'dataset': str(Path(root).resolve()), 'classes': classes, **state.to_dict()}, f)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str, root: str, classes: List[str]) -> EvaluationState:
+    """Resume state, or a fresh one if the checkpoint belongs to another run"""
+    if not path or not Path(path).exists():
+        return EvaluationState(len(classes))
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('dataset') != str(Path(root).resolve()) or data.get('classes') != classes:
+        print(f"⚠️ Checkpoint {path} is for a different dataset; starting over", file=sys.stderr)
+        return EvaluationState(len(classes))
+    print(f"↻ Resuming after {data['processed']} images", file=sys.stderr)
+    return EvaluationState.from_dict(data)
+
+
+def build_report(state: EvaluationState, classes: List[str]) -> Dict:
+    confusion = state.confusion
+    total = int(confusion.sum())
+    correct = np.diag(confusion)
+    predicted = confusion.sum(axis=0)
+    actual = confusion.sum(axis=1)
+
+    per_class = {}
+    for i, food in enumerate(classes):
+        if not actual[i] and not predicted[i]:
+            continue
+        precision = correct[i] / predicted[i] if predicted[i] else 0.0
+        recall = correct[i] / actual[i] if actual[i] else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_class[food] = {
+            'precision': round(float(precision), 4),
+            'recall': round(float(recall), 4),
+            'f1': round(float(f1), 4),
+            'support': int(actual[i])
+        }
+
+    curve = []
+    ece = 0.0
+    for b in range(CALIBRATION_BINS):
+        count = int(state.bin_count[b])
+        if not count:
+            continue
+        mean_confidence = state.bin_confidence[b] / count
+        accuracy = state.bin_correct[b] / count
+        ece += count / max(total, 1) * abs(accuracy - mean_confidence)
+        curve.append({
+            'bin': [b / CALIBRATION_BINS, (b + 1) / CALIBRATION_BINS],
+            'count': count,
+            'mean_confidence': round(float(mean_confidence), 4),
+            'accuracy': round(float(accuracy), 4)
+        })
+
+    return {
+        'images': total,
+        'failed_images': state.failed,
+        'accuracy': round(float(correct.sum() / total), 4) if total else None,
+        'per_class': per_class,
+        'confusion_matrix': {
+            'labels': classes,
+            'matrix': confusion.tolist()
+        },
+        'calibration': {
+            'expected_calibration_error': round(float(ece), 4),
+            'curve': curve
+        },
+        'elapsed_seconds': round(state.elapsed, 2),
+        'images_per_second': round(total / state.elapsed, 2) if state.elapsed else None
+    }
+
+
+def evaluate(detector, root: str, batch_size: int = 32, workers: int = 4,
+             checkpoint: str = None, checkpoint_every: int = 10) -> Dict:
+    """Evaluate detector.model on a labelled directory"""
+    classes = detector.food_classes
+    state = load_checkpoint(checkpoint, root, classes)
+    stream = islice(iter_labelled_images(root, classes), state.processed, None)
+
+    def load(item):
+        try:
+            return detector.preprocess_image(item[0]), item[1]
+        except Exception:
+            return None, item[1]
+
+    def next_chunk():
+        return list(islice(stream, batch_size))
+
+    run_started = time.perf_counter()
+    previous_elapsed = state.elapsed
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        chunk = next_chunk()
+        pending = pool.map(load, chunk) if chunk else None
+        batches = 0
+        while pending is not None:
+            loaded = list(pending)
+            count = len(chunk)
+
+            # Preprocess the next batch while this one runs through the model
+            chunk = next_chunk()
+            pending = pool.map(load, chunk) if chunk else None
+
+            ok = [(array, label) for array, label in loaded if array is not None]
+            state.failed += count - len(ok)
+            if ok:
+                scores = detector.predictor.predict(np.concatenate([a for a, _ in ok]))
+                state.update(scores, np.array([label for _, label in ok]))
+
+            state.processed += count
+            state.elapsed = previous_elapsed + time.perf_counter() - run_started
+            batches += 1
+            if checkpoint and batches % checkpoint_every == 0:
+                save_checkpoint(checkpoint, root, classes, state)
+                print(f"   {state.processed} images, {state.processed / state.elapsed:.1f} img/s",
+                      file=sys.stderr)
+
+    if checkpoint:
+        save_checkpoint(checkpoint, root, classes, state)
+    return build_report(state, classes)
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Food Log Analytics - Columnar daily, weekly and rolling nutrition summaries
+FoodLoggingService.getWeeklySummary filters a user's whole log list, groups
+it by date string and runs a reduce per nutrient per day on every request.
+Here each user's logs are append-only columns (day, calories, protein,
+carbs, fats, fiber), and a per-day rollup array is updated as each log is
+appended. A daily summary is one row of the rollup, and a weekly or
+rolling N-day summary is a slice of N rows, however many meals were logged.
+Export builds the same windows for many users in one pass for dashboards.
+
+Days are UTC calendar days (logged_at.split('T')[0] in the JS service). The
+weekly summary covers the 7 calendar days ending on the given day; the JS
+version uses the last 7*24 hours, which can also catch part of an eighth day.
+Calories are summed as logged and only the totals are rounded.
+
+A FoodLogAnalytics instance may be shared between threads: appends and
+reads take the same lock.
+
+Usage:
+  python foodLogAnalytics.py weekly --db food_logs.sqlite3 --user USER_ID [--end 2026-10-19]
+  python foodLogAnalytics.py export --db food_logs.sqlite3 [--users a,b] [--days 7] [--end 2026-10-19] [--format ndjson|csv]
+  python foodLogAnalytics.py --stdin-ndjson [--db food_logs.sqlite3] [--chunk-size 256]
+  python foodLogAnalytics.py benchmark [--users 2000] [--logs 400]
+"""
+
+import csv
+import json
+import math
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fats', 'fiber')
+# Rollup columns: the nutrient totals plus meal_count
+ROLLUP_COLUMNS = NUTRIENTS + ('meal_count',)
+MEAL_COUNT = len(NUTRIENTS)
+EPOCH = date(1970, 1, 1)
+TOTAL_KEYS = tuple(f'total_{n}' for n in NUTRIENTS)
+
+
+def to_day(value) -> int:
+    """Days since 1970-01-01 (UTC) for an ISO timestamp/date string, date or day number"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, datetime):
+        value = value.astimezone(timezone.utc).isoformat() if value.tzinfo else value.isoformat()
+    return int(np.datetime64(str(value)[:10], 'D').astype(np.int64))
+
+
+def to_days(values: Iterable) -> np.ndarray:
+    """to_day over many ISO strings"""
+    return np.array([str(v)[:10] for v in values], dtype='datetime64[D]').astype(np.int64)
+
+
+def day_string(day: int) -> str:
+    return (EPOCH + timedelta(days=int(day))).isoformat()
+
+
+def today() -> int:
+    return to_day(datetime.now(timezone.utc).date().isoformat())
+
+
+def _round(value: float) -> int:
+    """Math.round"""
+    return math.floor(value + 0.5)
+
+
+class UserFoodLog:
+    """Append-only log columns and the per-day rollup of one user"""
+
+    def __init__(self, capacity: int = 64):
+        self.size = 0
+        self.days = np.zeros(capacity, dtype=np.int32)
+        self.values = np.zeros((capacity, len(NUTRIENTS)), dtype=np.float64)
+        self.first_day: Optional[int] = None
+        # rollup[d - first_day] = nutrient totals and meal count of day d
+        self.rollup = np.zeros((0, len(ROLLUP_COLUMNS)), dtype=np.float64)
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, rows: int):
+        needed = self.size + rows
+        if needed <= len(self.days):
+            return
+        capacity = max(needed, 2 * len(self.days))
+        self.days = np.resize(self.days, capacity)
+        self.values = np.resize(self.values, (capacity, len(NUTRIENTS)))
+
+    def _cover(self, lo: int, hi: int):
+        """Grow the rollup so days lo..hi have rows (doubling, like the log columns)"""
+        if self.first_day is None:
+            self.first_day = lo
+            self.rollup = np.zeros((max(hi - lo + 1, 32), len(ROLLUP_COLUMNS)))
+            return
+        if lo < self.first_day:
+            pad = max(self.first_day - lo, len(self.rollup))
+            self.rollup = np.vstack([np.zeros((pad, len(ROLLUP_COLUMNS))), self.rollup])
+            self.first_day -= pad
+        if hi - self.first_day >= len(self.rollup):
+            grow = max(hi - self.first_day + 1 - len(self.rollup), len(self.rollup))
+            self.rollup = np.vstack([self.rollup, np.zeros((grow, len(ROLLUP_COLUMNS)))])
+
+    def append(self, days: np.ndarray, values: np.ndarray, counts: np.ndarray):
+        """Append log rows and fold them into the rollup (counts is +1 per log, -1 per removal)"""
+        days = np.asarray(days, dtype=np.int64)
+        if not len(days):
+            return
+        self._reserve(len(days))
+        self.days[self.size:self.size + len(days)] = days
+        self.values[self.size:self.size + len(days)] = values
+        self.size += len(days)
+
+        self._cover(int(days.min()), int(days.max()))
+        rows = days - self.first_day
+        np.add.at(self.rollup, (rows, slice(0, MEAL_COUNT)), values)
+        np.add.at(self.rollup[:, MEAL_COUNT], rows, counts)
+
+    def window(self, end_day: int, days: int) -> np.ndarray:
+        """(days, ROLLUP_COLUMNS) rollup rows for end_day - days + 1 .. end_day, oldest first"""
+        out = np.zeros((days, len(ROLLUP_COLUMNS)))
+        if self.first_day is None:
+            return out
+        start = end_day - days + 1
+        lo = max(start, self.first_day)
+        hi = min(end_day, self.first_day + len(self.rollup) - 1)
+        if lo <= hi:
+            out[lo - start:hi - start + 1] = self.rollup[lo - self.first_day:hi - self.first_day + 1]
+        return out
+
+
+def _day_summary(day: int, row: List[float]) -> Dict:
+    summary = {'date': day_string(day)}
+    summary.update(zip(TOTAL_KEYS, row))
+    summary['total_calories'] = _round(row[0])
+    summary['meal_count'] = int(row[MEAL_COUNT])
+    return summary
+
+
+def _window_totals(rows: np.ndarray) -> Dict:
+    days_logged = int(np.count_nonzero(rows[:, MEAL_COUNT] > 0))
+    totals = rows.sum(axis=0).tolist()
+    result = dict(zip(TOTAL_KEYS, totals))
+    result['total_calories'] = _round(totals[0])
+    result['average_calories'] = _round(totals[0] / days_logged) if days_logged else 0
+    result['days_logged'] = days_logged
+    result['meal_count'] = int(totals[MEAL_COUNT])
+    return result
+
+
+def _rollup_dict(row: List[float]) -> Dict:
+    result = dict(zip(NUTRIENTS, row))
+    result['calories'] = _round(row[0])
+    result['meal_count'] = int(row[MEAL_COUNT])
+    return result
+
+
+class FoodLogAnalytics:
+    """Per-user columnar food logs with incrementally maintained daily rollups"""
+
+    def __init__(self):
+        self._users: Dict[str, UserFoodLog] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._users)
+
+    def user_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._users)
+
+    def _user(self, user_id) -> UserFoodLog:
+        user_id = str(user_id)
+        log = self._users.get(user_id)
+        if log is None:
+            log = self._users[user_id] = UserFoodLog()
+        return log
+
+    @staticmethod
+    def _values(entry: Dict) -> List[float]:
+        return [float(entry.get(n) or 0) for n in NUTRIENTS]
+
+    def _window(self, user_id, end_day: int, days: int) -> np.ndarray:
+        """Copy of a user's rollup window, taken under the lock"""
+        with self._lock:
+            log = self._users.get(str(user_id))
+            return log.window(end_day, days) if log is not None else UserFoodLog().window(end_day, days)
+
+    def log_food(self, user_id, entry: Dict):
+        """One logged meal (a FoodLoggingService log entry; logged_at defaults to now)"""
+        day = to_day(entry.get('logged_at') or datetime.now(timezone.utc).isoformat())
+        with self._lock:
+            self._user(user_id).append([day], [self._values(entry)], [1])
+
+    def remove_food(self, user_id, entry: Dict):
+        """A deleted meal: appended as a negated row, so the log stays append-only"""
+        day = to_day(entry['logged_at'])
+        with self._lock:
+            self._user(user_id).append([day], [[-v for v in self._values(entry)]], [-1])
+
+    def load(self, user_ids: Iterable, logged_at: Iterable, values: np.ndarray):
+        """Bulk append (e.g. a food_logs table scan): one grouped append per user"""
+        user_ids = np.asarray([str(u) for u in user_ids], dtype=object)
+        if not len(user_ids):
+            return
+        days = to_days(logged_at)
+        values = np.asarray(values, dtype=np.float64).reshape(len(user_ids), len(NUTRIENTS))
+
+        order = np.argsort(user_ids, kind='stable')
+        sorted_ids = user_ids[order]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        with self._lock:
+            for start, end in zip(starts, ends):
+                rows = order[start:end]
+                self._user(sorted_ids[start]).append(days[rows], values[rows], np.ones(len(rows)))
+
+    def daily(self, user_id, day=None) -> Dict:
+        """Totals of one day (getTodayLogs summary)"""
+        day = today() if day is None else to_day(day)
+        return _day_summary(day, self._window(user_id, day, 1)[0].tolist())
+
+    def rolling(self, user_id, days: int, end=None) -> Dict:
+        """Logged days (newest first) and totals over the N days ending on end"""
+        end = today() if end is None else to_day(end)
+        rows = self._window(user_id, end, days)
+        start = end - days + 1
+        summaries = [_day_summary(start + i, row) for i, row in reversed(list(enumerate(rows.tolist())))
+                     if row[MEAL_COUNT] > 0]
+        return {'summaries': summaries, 'totals': _window_totals(rows)}
+
+    def weekly(self, user_id, end=None) -> Dict:
+        """getWeeklySummary: per-day summaries and weeklyTotals for the 7 days ending on end"""
+        result = self.rolling(user_id, 7, end)
+        totals = result['totals']
+        return {
+            'status': 'success',
+            'summaries': [{k: v for k, v in s.items() if k != 'total_fiber'} for s in result['summaries']],
+            'weeklyTotals': {k: totals[k] for k in ('total_calories', 'total_protein', 'total_carbs',
+                                                    'total_fats', 'average_calories', 'days_logged')}
+        }
+
+    def export(self, user_ids: Iterable = None, days: int = 7, end=None) -> Dict:
+        """
+        Rollup windows for many users at once: a (users, days, ROLLUP_COLUMNS)
+        array plus per-user window totals, for dashboard batches
+        """
+        end = today() if end is None else to_day(end)
+        empty = UserFoodLog()
+        with self._lock:
+            user_ids = [str(u) for u in (list(self._users) if user_ids is None else user_ids)]
+            cube = np.stack([self._users.get(u, empty).window(end, days) for u in user_ids]) if user_ids \
+                else np.zeros((0, days, len(ROLLUP_COLUMNS)))
+        totals = cube.sum(axis=1)
+        days_logged = (cube[:, :, MEAL_COUNT] > 0).sum(axis=1)
+        return {
+            'user_ids': user_ids,
+            'dates': [day_string(end - days + 1 + i) for i in range(days)],
+            'columns': list(ROLLUP_COLUMNS),
+            'daily': cube,
+            'totals': totals,
+            'average_calories': np.floor(np.divide(totals[:, 0], np.maximum(days_logged, 1)) + 0.5),
+            'days_logged': days_logged
+        }
+
+    def export_records(self, user_ids: Iterable = None, days: int = 7, end=None) -> Iterator[Dict]:
+        """export() as one JSON-ready record per user"""
+        batch = self.export(user_ids, days, end)
+        for i, user_id in enumerate(batch['user_ids']):
+            daily = batch['daily'][i].tolist()
+            yield {
+                'user_id': user_id,
+                'days': [{'date': batch['dates'][d], **_rollup_dict(daily[d])}
+                         for d in np.flatnonzero(batch['daily'][i, :, MEAL_COUNT] > 0)],
+                'totals': _rollup_dict(batch['totals'][i].tolist()),
+                'average_calories': int(batch['average_calories'][i]),
+                'days_logged': int(batch['days_logged'][i])
+            }
+
+
+def load_food_logs(dsn: str, analytics: FoodLogAnalytics = None, page_size: int = 100_000) -> FoodLogAnalytics:
+    """Fill the analytics store from food_logs (SQLite file or postgresql:// DSN)"""
+    analytics = analytics or FoodLogAnalytics()
+    if dsn.startswith(('postgres://', 'postgresql://')):
+        import psycopg2
+        conn = psycopg2.connect(dsn)
+    else:
+        conn = sqlite3.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT user_id, logged_at, {', '.join(NUTRIENTS)} FROM food_logs")
+        while True:
+            rows = cursor.fetchmany(page_size)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            values = np.array([[v or 0 for v in c] for c in columns[2:]], dtype=np.float64).T
+            analytics.load(columns[0], columns[1], values)
+    finally:
+        conn.close()
+    return analytics
+
+
+def handle_requests(analytics: FoodLogAnalytics, requests: List[Dict]) -> List[Dict]:
+    """
+    NDJSON ops: {"op": "log"|"remove", "user_id", "entry"}, {"op": "daily",
+    "user_id", "date"}, {"op": "weekly", "user_id", "end"}, {"op": "rolling",
+    "user_id", "days", "end"}, {"op": "export", "user_ids", "days", "end"}
+    """
+    results = []
+    for request in requests:
+        # Errors are caught per request: ndjsonStream retries a failed chunk one
+        # request at a time, which would apply the chunk's log/remove ops twice
+        try:
+            results.append(_handle_request(analytics, request))
+        except Exception as e:
+            results.append({'status': 'error', 'error': str(e)})
+    return results
+
+
+def _handle_request(analytics: FoodLogAnalytics, request: Dict) -> Dict:
+    op = request.get('op')
+    if op == 'log':
+        analytics.log_food(request['user_id'], request['entry'])
+        return {'status': 'success'}
+    if op == 'remove':
+        analytics.remove_food(request['user_id'], request['entry'])
+        return {'status': 'success'}
+    if op == 'daily':
+        return {'status': 'success', 'summary': analytics.daily(request['user_id'], request.get('date'))}
+    if op == 'weekly':
+        return analytics.weekly(request['user_id'], request.get('end'))
+    if op == 'rolling':
+        return {'status': 'success',
+                **analytics.rolling(request['user_id'], int(request.get('days', 30)), request.get('end'))}
+    if op == 'export':
+        return {'status': 'success', 'users': list(analytics.export_records(
+            request.get('user_ids'), int(request.get('days', 7)), request.get('end')))}
+    raise ValueError(f'Unknown op: {op!r}')
+
+
+def weekly_per_request(logs: List[Dict], end_day: int) -> Dict:
+    """The JS getWeeklySummary algorithm (filter, group by date, reduce per nutrient), for benchmarks"""
+    start = day_string(end_day - 6)
+    stop = day_string(end_day)
+    week = [log for log in logs if start <= log['logged_at'][:10] <= stop]
+    groups: Dict[str, List[Dict]] = {}
+    for log in week:
+        groups.setdefault(log['logged_at'][:10], []).append(log)
+    summaries = [{
+        'date': date,
+        'total_calories': sum(log['calories'] for log in day_logs),
+        'total_protein': sum(log['protein'] for log in day_logs),
+        'total_carbs': sum(log['carbs'] for log in day_logs),
+        'total_fats': sum(log['fats'] for log in day_logs),
+        'meal_count': len(day_logs)
+    } for date, day_logs in groups.items()]
+    summaries.sort(key=lambda s: s['date'], reverse=True)
+    total_calories = sum(s['total_calories'] for s in summaries)
+    return {
+        'summaries': summaries,
+        'total_calories': total_calories,
+        'average_calories': _round(total_calories / len(summaries)) if summaries else 0,
+        'days_logged': len(summaries)
+    }
+
+
+def benchmark(users: int = 2000, logs_per_user: int = 400, seed: int = 0) -> Dict:
+    """Weekly summaries for every user: per-request scan vs rollup lookups"""
+    rng = np.random.default_rng(seed)
+    end = today()
+    total = users * logs_per_user
+    user_ids = np.repeat([f'user-{i}' for i in range(users)], logs_per_user)
+    days = end - rng.integers(0, 180, total)
+    logged_at = [f'{day_string(d)}T12:00:00.000Z' for d in days]
+    values = np.column_stack([
+        rng.integers(50, 900, total), *(np.round(rng.random(total) * 60, 1) for _ in NUTRIENTS[1:])
+    ])
+
+    started = time.perf_counter()
+    analytics = FoodLogAnalytics()
+    analytics.load(user_ids, logged_at, values)
+    load_s = time.perf_counter() - started
+
+    per_user: Dict[str, List[Dict]] = {}
+    for u, at, row in zip(user_ids, logged_at, values.tolist()):
+        per_user.setdefault(u, []).append({'logged_at': at, **dict(zip(NUTRIENTS, row))})
+
+    started = time.perf_counter()
+    columnar = [analytics.weekly(u, end) for u in per_user]
+    columnar_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    export = analytics.export(list(per_user), 7, end)
+    export_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    reference = [weekly_per_request(logs, end) for logs in per_user.values()]
+    per_request_s = time.perf_counter() - started
+
+    for fast, slow in zip(columnar, reference):
+        assert fast['weeklyTotals']['total_calories'] == slow['total_calories']
+        assert fast['weeklyTotals']['days_logged'] == slow['days_logged']
+        assert [s['meal_count'] for s in fast['summaries']] == [s['meal_count'] for s in slow['summaries']]
+    assert int(export['totals'][:, 0].sum()) == sum(s['total_calories'] for s in reference)
+
+    report = {
+        'users': users,
+        'logs': total,
+        'load_s': round(load_s, 3),
+        'weekly_columnar_s': round(columnar_s, 3),
+        'weekly_export_s': round(export_s, 3),
+        'weekly_per_request_s': round(per_request_s, 3),
+        'speedup': round(per_request_s / columnar_s, 1)
+    }
+    print(f"   {users} weekly summaries over {total} logs: columnar {report['weekly_columnar_s']}s "
+          f"(batch export {report['weekly_export_s']}s), per-request scan "
+          f"{report['weekly_per_request_s']}s ({report['speedup']}x)", file=sys.stderr)
+    return report
+
+
+def main():
+    args = sys.argv[1:]
+    commands = ('weekly', 'export', '--stdin-ndjson', 'benchmark')
+    if not args or args[0] not in commands:
+        print(__doc__[__doc__.index('Usage:'):].strip())
+        sys.exit(1)
+
+    def option(name: str, default=None):
+        return args[args.index(name) + 1] if name in args else default
+
+    if args[0] == 'benchmark':
+        print(json.dumps(benchmark(int(option('--users', 2000)), int(option('--logs', 400))), indent=2))
+        return
+
+    dsn = option('--db')
+    if dsn is None and args[0] != '--stdin-ndjson':
+        print('✗ --db is required', file=sys.stderr)
+        sys.exit(1)
+    started = time.perf_counter()
+    analytics = load_food_logs(dsn) if dsn else FoodLogAnalytics()
+    if dsn:
+        print(f"✓ Loaded {len(analytics)} users from {dsn} in {time.perf_counter() - started:.2f}s",
+              file=sys.stderr)
+
+    if args[0] == 'weekly':
+        print(json.dumps(analytics.weekly(option('--user'), option('--end')), indent=2))
+    elif args[0] == 'export':
+        users = option('--users')
+        records = analytics.export_records(users.split(',') if users else None,
+                                           int(option('--days', 7)), option('--end'))
+        if option('--format', 'ndjson') == 'csv':
+            writer = csv.writer(sys.stdout)
+            writer.writerow(['user_id', 'date', *ROLLUP_COLUMNS])
+            for record in records:
+                for day in record['days']:
+                    writer.writerow([record['user_id'], day['date'], *(day[c] for c in ROLLUP_COLUMNS)])
+        else:
+            for record in records:
+                sys.stdout.write(json.dumps(record) + '\n')
+    else:
+        from ndjsonStream import run_ndjson
+        run_ndjson(lambda requests: handle_requests(analytics, requests), int(option('--chunk-size', 256)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Frame Stream - Streaming food detection over a sequence of camera frames
+Near-identical frames are skipped using tiny grayscale thumbnails (a 1/8
+draft decode), changed frames are classified in batches within a per-second
+inference budget, and class probabilities are smoothed over a sliding window
+so the reported label is stable rather than flickering frame to frame
+"""
+
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from imageLoader import open_reduced
+from mlMetrics import REGISTRY, RequestTimer
+
+STREAM_FRAMES = REGISTRY.counter(
+    'ml_stream_frames_total',
+    'Streamed camera frames by action (inferred, skipped_duplicate, skipped_budget)',
+    ('action',)
+)
+
+# Side of the grayscale thumbnail used to compare consecutive frames
+SIGNATURE_SIZE = 32
+
+
+def frame_signature(path: str) -> np.ndarray:
+    """Grayscale SIGNATURE_SIZE^2 thumbnail in [0, 1]"""
+    img = open_reduced(path, (SIGNATURE_SIZE, SIGNATURE_SIZE))
+    thumb = img.convert('L').resize((SIGNATURE_SIZE, SIGNATURE_SIZE), Image.BILINEAR)
+    return np.asarray(thumb, dtype=np.float32) / 255.0
+
+
+def frame_difference(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean absolute pixel difference between two signatures (0 = identical)"""
+    return float(np.mean(np.abs(a - b)))
+
+
+class FrameStream:
+    """
+    Incremental detector over frames pushed in capture order
+
+    A frame is inferred when it differs from the last inferred frame by at
+    least diff_threshold and the token bucket (budget_per_second, refilled
+    on frame timestamps) has a token; otherwise it reports the current
+    smoothed label. Changed frames wait for a batch of batch_size, or at
+    most max_batch_delay seconds of stream time. A skipped duplicate shows
+    the same scene, so it re-enters its reference frame's probabilities into
+    the smoothing window.
+    """
+
+    def __init__(self, detector, window: int = 5, diff_threshold: float = 0.04,
+                 budget_per_second: float = 6.0, batch_size: int = 4,
+                 max_batch_delay: float = 0.25, confidence_threshold: float = 0.5):
+        self.detector = detector
+        self.diff_threshold = diff_threshold
+        self.budget_per_second = budget_per_second
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+        self.confidence_threshold = confidence_threshold
+        self.history = deque(maxlen=window)
+
+        self._reference: Optional[np.ndarray] = None
+        # [frame index, timestamp, path, duplicates seen since] per queued frame
+        self._pending: List[list] = []
+        self._last_scores: Optional[np.ndarray] = None
+        self._tokens = max(1.0, budget_per_second)
+        self._last_timestamp: Optional[float] = None
+        self.counts = {'frames': 0, 'inferred': 0, 'skipped_duplicate': 0, 'skipped_budget': 0, 'batches': 0}
+        self.timings = {'signature_ms': 0.0, 'inference_ms': 0.0}
+
+    def _refill(self, timestamp: float):
+        if self._last_timestamp is not None:
+            elapsed = max(0.0, timestamp - self._last_timestamp)
+            self._tokens = min(max(1.0, self.budget_per_second), self._tokens + elapsed * self.budget_per_second)
+        self._last_timestamp = timestamp
+
+    def push(self, path: str, timestamp: float) -> List[Dict]:
+        """Add one frame; returns results for every frame resolved by this call"""
+        index = self.counts['frames']
+        self.counts['frames'] += 1
+        self._refill(timestamp)
+
+        results = []
+        if self._pending and timestamp - self._pending[0][1] >= self.max_batch_delay:
+            results.extend(self.flush())
+
+        started = time.perf_counter()
+        signature = frame_signature(path)
+        self.timings['signature_ms'] += (time.perf_counter() - started) * 1000
+
+        if self._reference is not None and frame_difference(signature, self._reference) < self.diff_threshold:
+            # The reference is either the newest queued frame or the last inferred one
+            if self._pending:
+                self._pending[-1][3] += 1
+            elif self._last_scores is not None:
+                self.history.append(self._last_scores)
+            results.append(self._skipped(index, timestamp, 'skipped_duplicate'))
+        elif self._tokens < 1:
+            results.append(self._skipped(index, timestamp, 'skipped_budget'))
+        else:
+            self._tokens -= 1
+            self._reference = signature
+            self._pending.append([index, timestamp, path, 0])
+            if len(self._pending) >= self.batch_size:
+                results.extend(self.flush())
+        return results
+
+    def flush(self) -> List[Dict]:
+        """Classify the pending changed frames in one batch"""
+        if not self._pending:
+            return []
+        pending, self._pending = self._pending, []
+        timer = RequestTimer('food_detector')
+        try:
+            batch = np.concatenate([self.detector.preprocess_image(path, timer) for _, _, path, _ in pending])
+            timer.record_shape('frames', batch.shape)
+            started = time.perf_counter()
+            with timer.stage('predict'):
+                scores = self.detector.predictor.predict(batch)
+            self.timings['inference_ms'] += (time.perf_counter() - started) * 1000
+        finally:
+            timer.finish()
+
+        self.counts['batches'] += 1
+        results = []
+        for (index, timestamp, _, duplicates), frame_scores in zip(pending, scores):
+            for _ in range(1 + duplicates):
+                self.history.append(frame_scores)
+            self._last_scores = frame_scores
+            self.counts['inferred'] += 1
+            STREAM_FRAMES.inc('inferred')
+            top = int(np.argmax(frame_scores))
+            result = self._result(index, timestamp, 'inferred')
+            result['frame_prediction'] = {
+                'food': self.detector.food_classes[top],
+                'confidence': round(float(frame_scores[top]), 4)
+            }
+            results.append(result)
+        return results
+
+    def _skipped(self, index: int, timestamp: float, action: str) -> Dict:
+        self.counts[action] += 1
+        STREAM_FRAMES.inc(action)
+        return self._result(index, timestamp, action)
+
+    def smoothed(self) -> Tuple[Optional[str], float, bool]:
+        """(label, smoothed confidence, stable) over the sliding window"""
+        if not self.history:
+            return None, 0.0, False
+        window = np.stack(self.history)
+        mean = window.mean(axis=0)
+        top = int(np.argmax(mean))
+        votes = int(np.sum(window.argmax(axis=1) == top))
+        stable = (
+            float(mean[top]) >= self.confidence_threshold
+            and votes * 2 > len(window)
+            and len(window) >= min(3, self.history.maxlen)
+        )
+        return self.detector.food_classes[top], float(mean[top]), stable
+
+    def _result(self, index: int, timestamp: float, action: str) -> Dict:
+        label, confidence, stable = self.smoothed()
+        return {
+            'frame': index,
+            'timestamp': round(timestamp, 3),
+            'action': action,
+            'label': label,
+            'confidence': round(confidence, 4),
+            'stable': stable
+        }
+
+    def run(self, frames: Iterable[str], timestamps: Iterable[float] = None, fps: float = 10.0) -> Dict:
+        """Process a whole frame sequence; timestamps default to index / fps"""
+        frames = list(frames)
+        if timestamps is None:
+            timestamps = [i / fps for i in range(len(frames))]
+        timestamps = list(timestamps)
+
+        timeline = []
+        for path, timestamp in zip(frames, timestamps):
+            timeline.extend(self.push(path, timestamp))
+        timeline.extend(self.flush())
+        timeline.sort(key=lambda r: r['frame'])
+
+        label, confidence, stable = self.smoothed()
+        duration = (timestamps[-1] - timestamps[0] + 1 / fps) if timestamps else 0.0
+        result = {
+            'status': 'success' if label else 'no_food_detected',
+            'mode': 'stream',
+            'detected_food': label,
+            'confidence': round(confidence, 4),
+            'probability': f"{confidence * 100:.2f}%",
+            'stable': stable,
+            **self.counts,
+            'stream_seconds': round(duration, 3),
+            'inferences_per_second': round(self.counts['inferred'] / duration, 2) if duration else 0.0,
+            'signature_ms': round(self.timings['signature_ms'], 2),
+            'inference_ms': round(self.timings['inference_ms'], 2),
+            'timeline': timeline
+        }
+        if label and stable:
+            result['nutrition'] = self.detector._nutrition(label)
+        return result
@@ -3,6 +3,7 @@
  * Combines CSV lookup with AI detection for best of both worlds
  * 
  * Priority:
+ * 0. User's confirmed meal (embedding index hit, CSV skipped)
  * 1. Exact match in CSV dataset
  * 2. Fuzzy match in CSV dataset
  * 3. AI detection fallback
@@ -40,11 +41,11 @@ class HybridFoodDetection {
      *   detected_food: string,
      *   confidence: number,
      *   nutrition: { calories, protein, carbs, fats, ... },
-     *   source: 'csv' | 'ai' | 'csv_fuzzy',
+     *   source: 'meal_index' | 'csv_exact' | 'csv_fuzzy' | 'ai_fallback',
      *   alternativeMatches: [ { name, confidence, ... } ]
      * }
      */
-    async detectFood(imagePath, confidenceThreshold = 0.3) {
+    async detectFood(imagePath, confidenceThreshold = 0.3, userId = null) {
         const startTime = Date.now();
 
         try {
@@ -57,12 +58,33 @@ class HybridFoodDetection {
             console.log('[HYBRID] Attempting AI detection...');
             let aiResult;
             try {
-                aiResult = await foodDetectionService.detectFood(imagePath, confidenceThreshold);
+                aiResult = await foodDetectionService.detectFood(imagePath, confidenceThreshold, userId);
             } catch (error) {
                 console.warn('[HYBRID] AI detection failed, will use CSV fallback:', error.message);
                 aiResult = null;
             }
 
+            return this.resolveDetection(aiResult, startTime);
+        } catch (error) {
+            console.error('[HYBRID] Hybrid detection error:', error);
+            return {
+                status: 'error',
+                error: error.message,
+                source: 'none'
+            };
+        }
+    }
+
+    /**
+     * Steps 1b-4 for an AI result that is already available
+     * (e.g. a finished detection job from the queue)
+     */
+    async resolveDetection(aiResult, startTime = Date.now()) {
+        try {
+            if (!this.csvInitialized) {
+                await this.initialize();
+            }
+
             if (!aiResult) {
                 return {
                     status: 'detection_failed',
@@ -71,6 +93,23 @@ class HybridFoodDetection {
                 };
             }
 
+            // Step 1b: Repeat of a confirmed meal - label and nutrition are already known
+            if (aiResult.source === 'meal_index') {
+                console.log(`[HYBRID] ✅ Matched confirmed meal: ${aiResult.detected_food}`);
+                return {
+                    detected_food: aiResult.detected_food,
+                    confidence: aiResult.confidence,
+                    nutrition: aiResult.nutrition,
+                    source: 'meal_index',
+                    nutritionSource: 'Confirmed Meal',
+                    processingTime: Date.now() - startTime,
+                    details: {
+                        similarity: aiResult.similarity,
+                        matchType: 'embedding'
+                    }
+                };
+            }
+
             const detectedFoodName = aiResult.detected_food;
             const initialConfidence = aiResult.confidence;
 
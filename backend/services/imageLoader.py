@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Image Loader - Reduced-resolution decoding for model inputs
+JPEGs are decoded in draft mode, letting libjpeg scale by 1/2, 1/4 or 1/8 in
+the DCT domain, so a 12MP upload never exists as a full-size bitmap when the
+model only needs 224x224. Other formats decode normally.
+
+Usage:
+  python imageLoader.py benchmark <image> [<image> ...] [--size 224]
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+from PIL import Image
+
+from mlMetrics import REGISTRY, RequestTimer
+
+IMAGE_DECODES = REGISTRY.counter(
+    'ml_image_decodes_total',
+    'Image decodes by DCT scale denominator (1 = full resolution)',
+    ('scale',)
+)
+
+IMAGE_DECODED_BYTES = REGISTRY.histogram(
+    'ml_image_decoded_bytes',
+    'Size of the decoded bitmap before the final resize',
+    buckets=(2 ** 18, 2 ** 20, 2 ** 22, 2 ** 24, 2 ** 26, 2 ** 28)
+)
+
+
+def open_reduced(path: str, min_size: Tuple[int, int], timer: RequestTimer = None) -> Image.Image:
+    """
+    Decoded RGB image, at least min_size (width, height) where the source allows
+
+    Draft mode picks the largest 1/2, 1/4 or 1/8 reduction that keeps both
+    sides at or above min_size.
+    """
+    timer = timer or RequestTimer()
+    with timer.stage('image_load'):
+        img = Image.open(path)
+        source_width = img.width
+        if img.format == 'JPEG':
+            img.draft('RGB', min_size)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img.load()
+    scale = max(1, round(source_width / img.width))
+    IMAGE_DECODES.inc(str(scale))
+    IMAGE_DECODED_BYTES.observe(img.width * img.height * 3)
+    timer.record_shape('decoded', (img.height, img.width, 3))
+    return img
+
+
+def load_image(path: str, target_size: Tuple[int, int], timer: RequestTimer = None) -> Image.Image:
+    """Reduced decode then resize to target_size (width, height), like keras load_img"""
+    img = open_reduced(path, target_size, timer)
+    if img.size != tuple(target_size):
+        # Nearest, as keras.preprocessing.image.load_img does
+        img = img.resize(tuple(target_size), Image.NEAREST)
+    return img
+
+
+def _decode_stats(path: str, size: int, reduced: bool) -> Dict:
+    """Decode time and peak RSS of one decode, measured in a fresh process"""
+    import resource
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if reduced:
+        img = load_image(path, (size, size))
+    else:
+        img = Image.open(path).convert('RGB').resize((size, size), Image.NEAREST)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'decode_ms': round(elapsed * 1000, 2),
+        'peak_rss_added_mb': round((peak - baseline) / 1024, 1),
+        'output_size': list(img.size)
+    }
+
+
+def benchmark(paths, size: int = 224) -> Dict:
+    """Full versus reduced decode per image; each decode runs in its own process"""
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for path in paths:
+        with Image.open(path) as img:
+            source = {'width': img.width, 'height': img.height, 'format': img.format}
+        row = {'image': str(path), 'source': source}
+        for mode, reduced in (('full', False), ('reduced', True)):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                row[mode] = pool.submit(_decode_stats, str(path), size, reduced).result()
+        row['speedup'] = round(row['full']['decode_ms'] / max(row['reduced']['decode_ms'], 1e-3), 2)
+        rows.append(row)
+        print(f"   {Path(path).name} {source['width']}x{source['height']}: "
+              f"{row['full']['decode_ms']}ms/{row['full']['peak_rss_added_mb']}MB -> "
+              f"{row['reduced']['decode_ms']}ms/{row['reduced']['peak_rss_added_mb']}MB", file=sys.stderr)
+    return {'target_size': size, 'images': rows}
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] != 'benchmark':
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(1)
+    size = 224
+    if '--size' in args:
+        i = args.index('--size')
+        size = int(args[i + 1])
+        del args[i:i + 2]
+    print(json.dumps(benchmark(args[1:], size), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Inference Tuning - Per-host CPU thread profile for the inference workers
+TensorFlow sizes its intra-op and inter-op pools to every core by default,
+so several detector and task workers on one host oversubscribe the CPU and
+slow each other down. `tune` benchmarks MLTaskGenerator and
+NorthIndianFoodDetector over worker counts, intra/inter-op thread counts
+and batch sizes on this host: for each combination it starts that many
+worker processes, warms them up, runs them concurrently and measures
+aggregate throughput and p95 call latency. The best combination per
+service is written to a local profile, which the inference processes apply
+at startup (apply_profile, before TensorFlow is imported).
+
+What a profile sets, per service:
+  intra_op_threads, inter_op_threads   TF_NUM_INTRAOP_THREADS / TF_NUM_INTEROP_THREADS / OMP_NUM_THREADS
+  batch_size                           task_generator: largest predict bucket (ML_PREDICT_BUCKETS)
+                                       food_detector: jobs claimed per queue batch
+  workers                              food_detector: default queue worker count
+
+Threads are tuned for the number of processes a service actually runs side
+by side. The task generator is one persistent worker per API process, so it
+is only benchmarked with one worker; the detector's worker count is tuned
+and used by the queue workers.
+
+Variables already set in the environment and explicit command line flags
+win over the profile. A profile tuned on a host with a different CPU count
+is ignored.
+
+Environment:
+  ML_INFERENCE_PROFILE   profile path (default ml_models/inference_profile.json); "off" disables it
+
+Usage:
+  python inferenceTuning.py show
+  python inferenceTuning.py tune [--service all|task_generator|food_detector] [--workers 1,2]
+         [--intra 1,2,4] [--inter 1,2] [--batch-sizes 1,8,32] [--seconds 3] [--images <dir>]
+         [--model <food_model.h5>] [--max-p95-ms <ms>] [--dry-run]
+"""
+
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SERVICES = ('task_generator', 'food_detector')
+
+DEFAULT_PROFILE_PATH = Path(__file__).resolve().parent.parent / 'ml_models' / 'inference_profile.json'
+
+# Predict buckets the task generator profile trims to its batch size (mirrors bucketedPredict)
+TASK_BUCKETS = (1, 8, 32, 128)
+
+# Services whose process count is fixed by how they are deployed (not tuned)
+FIXED_WORKERS = {
+    'task_generator': [1]
+}
+
+DEFAULT_BATCH_SIZES = {
+    'task_generator': (1, 8, 32, 128),
+    'food_detector': (1, 8, 32)
+}
+
+def profile_path() -> Optional[Path]:
+    value = os.environ.get('ML_INFERENCE_PROFILE')
+    if value == 'off':
+        return None
+    return Path(value) if value else DEFAULT_PROFILE_PATH
+
+
+def host_fingerprint() -> Dict:
+    return {
+        'hostname': socket.gethostname(),
+        'cpus': os.cpu_count() or 1,
+        'machine': platform.machine()
+    }
+
+
+def load_profile(service: str) -> Dict:
+    """Tuned settings for one service on this host, or {} when there are none"""
+    path = profile_path()
+    if path is None or not path.exists():
+        return {}
+    try:
+        profile = json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Inference profile {path} unreadable: {e}", file=sys.stderr)
+        return {}
+    tuned_cpus = profile.get('host', {}).get('cpus')
+    if tuned_cpus != host_fingerprint()['cpus']:
+        print(f"⚠️ Inference profile {path} was tuned for {tuned_cpus} CPUs, "
+              f"this host has {host_fingerprint()['cpus']}; ignoring it", file=sys.stderr)
+        return {}
+    return profile.get('services', {}).get(service, {})
+
+
+def profile_environment(service: str, settings: Dict) -> Dict[str, str]:
+    """Environment variables a service's settings translate to"""
+    env = {}
+    if settings.get('intra_op_threads'):
+        env['TF_NUM_INTRAOP_THREADS'] = str(settings['intra_op_threads'])
+        env['OMP_NUM_THREADS'] = str(settings['intra_op_threads'])
+    if settings.get('inter_op_threads'):
+        env['TF_NUM_INTEROP_THREADS'] = str(settings['inter_op_threads'])
+    if service == 'task_generator' and settings.get('batch_size'):
+        batch = int(settings['batch_size'])
+        env['ML_PREDICT_BUCKETS'] = ','.join(str(b) for b in (*[b for b in TASK_BUCKETS if b < batch], batch))
+    return env
+
+
+def apply_profile(service: str) -> Dict:
+    """
+    Export the service's tuned thread settings before TensorFlow is imported
+
+    TensorFlow reads the thread variables when it creates its first context,
+    so this must run ahead of the first `import tensorflow`. Variables that
+    are already set are left alone.
+    """
+    settings = load_profile(service)
+    applied = {}
+    for name, value in profile_environment(service, settings).items():
+        if name not in os.environ:
+            os.environ[name] = value
+            applied[name] = value
+    if applied:
+        print(f"✓ Inference profile: {', '.join(f'{k}={v}' for k, v in applied.items())}", file=sys.stderr)
+    return settings
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_bench(service: str, batch_sizes: List[int], seconds: float, images_dir: str = None,
+              model_path: str = None) -> Dict:
+    """
+    One benchmark worker: load and warm the service, wait for "go" on stdin,
+    then call it back to back at each batch size for `seconds`
+    """
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+    if service == 'task_generator':
+        from mlTaskGenerator import MLTaskGenerator
+        from syntheticData import synthetic_users
+
+        generator = MLTaskGenerator()
+        generator.warm_up()
+        users = synthetic_users(max(batch_sizes), seed=7)
+
+        def call(batch):
+            generator.generate_tasks(users[:batch])
+    else:
+        import tempfile
+        from northIndianFoodDetector import NorthIndianFoodDetector
+        from syntheticData import synthetic_image_corpus
+
+        if images_dir:
+            paths = sorted(str(p) for p in Path(images_dir).rglob('*')
+                           if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+        else:
+            paths = synthetic_image_corpus(os.path.join(tempfile.gettempdir(), 'inference-tuning-images'), 16)
+        if not paths:
+            raise ValueError(f'No images under {images_dir}')
+        # Timing only: an untrained network costs the same as the real one
+        detector = NorthIndianFoodDetector(model_path if model_path and Path(model_path).exists() else None,
+                                           weights=None)
+        detector.warm_up()
+        paths = (paths * (max(batch_sizes) // len(paths) + 1))[:max(batch_sizes)]
+
+        def call(batch):
+            detector.detect_foods(paths[:batch])
+
+    print(json.dumps({'ready': True}), flush=True)
+    sys.stdin.readline()
+
+    results = {}
+    for batch in batch_sizes:
+        call(batch)
+        latencies = []
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds or len(latencies) < 3:
+            t0 = time.perf_counter()
+            call(batch)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        elapsed = time.perf_counter() - started
+        results[str(batch)] = {
+            'calls': len(latencies),
+            'items_per_s': round(len(latencies) * batch / elapsed, 2),
+            'p50_ms': round(_percentile(latencies, 0.5), 2),
+            'p95_ms': round(_percentile(latencies, 0.95), 2)
+        }
+    return results
+
+
+def run_trial(service: str, workers: int, intra: int, inter: int, batch_sizes: List[int],
+              seconds: float, images_dir: str = None, model_path: str = None) -> List[Dict]:
+    """Start `workers` benchmark processes with one thread setting and run them together"""
+    env = dict(os.environ)
+    env.update({
+        'TF_NUM_INTRAOP_THREADS': str(intra),
+        'TF_NUM_INTEROP_THREADS': str(inter),
+        'OMP_NUM_THREADS': str(intra),
+        'ML_INFERENCE_PROFILE': 'off',
+        'TF_CPP_MIN_LOG_LEVEL': env.get('TF_CPP_MIN_LOG_LEVEL', '2')
+    })
+    if service == 'task_generator':
+        env['ML_PREDICT_BUCKETS'] = ','.join(str(b) for b in batch_sizes)
+
+    command = [sys.executable, str(Path(__file__).resolve()), '_bench', service,
+               '--batch-sizes', ','.join(str(b) for b in batch_sizes), '--seconds', str(seconds)]
+    if images_dir:
+        command += ['--images', images_dir]
+    if model_path:
+        command += ['--model', model_path]
+
+    processes = [subprocess.Popen(command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                  stderr=subprocess.DEVNULL, text=True)
+                 for _ in range(workers)]
+    try:
+        # Everyone warms up first so the measured windows overlap
+        for process in processes:
+            if not process.stdout.readline():
+                raise RuntimeError(f'{service} benchmark worker exited during warm-up')
+        for process in processes:
+            process.stdin.write('go\n')
+            process.stdin.flush()
+        reports = []
+        for process in processes:
+            output = process.stdout.read()
+            if process.wait() != 0 or not output.strip():
+                raise RuntimeError(f'{service} benchmark worker failed (exit {process.returncode})')
+            reports.append(json.loads(output))
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+
+    trials = []
+    for batch in batch_sizes:
+        per_worker = [report[str(batch)] for report in reports]
+        trials.append({
+            'workers': workers,
+            'intra_op_threads': intra,
+            'inter_op_threads': inter,
+            'batch_size': batch,
+            'items_per_s': round(sum(r['items_per_s'] for r in per_worker), 2),
+            'p50_ms': max(r['p50_ms'] for r in per_worker),
+            'p95_ms': max(r['p95_ms'] for r in per_worker)
+        })
+    return trials
+
+
+def _powers_of_two(limit: int) -> List[int]:
+    values, n = [], 1
+    while n <= limit:
+        values.append(n)
+        n *= 2
+    return values
+
+
+def candidate_grid(cpus: int, workers: List[int] = None, intra: List[int] = None,
+                   inter: List[int] = None) -> List[tuple]:
+    """
+    (workers, intra, inter) combinations to try
+
+    By default worker counts and intra-op pools are powers of two up to the
+    core count, and combinations that need more intra-op threads than there
+    are cores are skipped (that oversubscription is what tuning avoids).
+    Explicit lists are tried as given.
+    """
+    explicit = workers is not None or intra is not None
+    workers = workers or _powers_of_two(cpus)
+    intra = intra or _powers_of_two(cpus)
+    inter = inter or [1, 2]
+    return [(w, i, j) for w in workers for i in intra for j in inter
+            if explicit or w * i <= cpus]
+
+
+def choose_best(trials: List[Dict], max_p95_ms: float = None) -> Optional[Dict]:
+    """Highest throughput within the latency budget (fewest threads on a tie)"""
+    eligible = [t for t in trials if max_p95_ms is None or t['p95_ms'] <= max_p95_ms]
+    if not eligible:
+        return None
+    return max(eligible, key=lambda t: (t['items_per_s'],
+                                        -(t['workers'] * (t['intra_op_threads'] + t['inter_op_threads']))))
+
+
+def tune(services: List[str], workers: List[int] = None, intra: List[int] = None, inter: List[int] = None,
+         batch_sizes: List[int] = None, seconds: float = 3.0, images_dir: str = None,
+         model_path: str = None, max_p95_ms: float = None) -> Dict:
+    host = host_fingerprint()
+    profile = {
+        'host': host,
+        'tuned_at': datetime.now(timezone.utc).isoformat(),
+        'max_p95_ms': max_p95_ms,
+        'services': {},
+        'trials': {}
+    }
+    for service in services:
+        sizes = batch_sizes or list(DEFAULT_BATCH_SIZES[service])
+        service_workers = FIXED_WORKERS.get(service, workers)
+        if workers and service in FIXED_WORKERS:
+            print(f"   {service} runs {service_workers[0]} worker per API process; ignoring --workers",
+                  file=sys.stderr)
+        grid = candidate_grid(host['cpus'], service_workers, intra, inter)
+        print(f"📊 Tuning {service}: {len(grid)} thread settings x {len(sizes)} batch sizes, "
+              f"{seconds}s each", file=sys.stderr)
+        trials = []
+        for w, i, j in grid:
+            try:
+                results = run_trial(service, w, i, j, sizes, seconds, images_dir, model_path)
+            except RuntimeError as e:
+                print(f"   ✗ workers={w} intra={i} inter={j}: {e}", file=sys.stderr)
+                continue
+            for trial in results:
+                print(f"   workers={w} intra={i} inter={j} batch={trial['batch_size']}: "
+                      f"{trial['items_per_s']}/s, p95 {trial['p95_ms']}ms", file=sys.stderr)
+            trials.extend(results)
+
+        best = choose_best(trials, max_p95_ms)
+        profile['trials'][service] = trials
+        if best is None:
+            print(f"⚠️ No {service} setting met the latency budget; not profiled", file=sys.stderr)
+            continue
+        profile['services'][service] = best
+        print(f"✓ {service}: workers={best['workers']} intra={best['intra_op_threads']} "
+              f"inter={best['inter_op_threads']} batch={best['batch_size']} "
+              f"({best['items_per_s']}/s, p95 {best['p95_ms']}ms)", file=sys.stderr)
+    return profile
+
+
+def write_profile(profile: Dict, path: Path = None) -> Path:
+    path = Path(path or profile_path() or DEFAULT_PROFILE_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(profile, indent=2))
+    os.replace(tmp, path)
+    return path
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def main():
+    import argparse
+
+    args = sys.argv[1:]
+    if not args or args[0] not in ('show', 'tune', '_bench'):
+        print(__doc__[__doc__.index('Usage:'):].strip())
+        sys.exit(1)
+
+    if args[0] == 'show':
+        path = profile_path()
+        settings = {service: load_profile(service) for service in SERVICES}
+        print(json.dumps({
+            'path': str(path) if path else None,
+            'host': host_fingerprint(),
+            'services': settings,
+            'environment': {service: profile_environment(service, s) for service, s in settings.items()}
+        }, indent=2))
+        return
+
+    parser = argparse.ArgumentParser(prog=f'inferenceTuning.py {args[0]}')
+    if args[0] == '_bench':
+        parser.add_argument('service', choices=SERVICES)
+    else:
+        parser.add_argument('--service', default='all', choices=('all',) + SERVICES)
+        parser.add_argument('--workers', type=_int_list)
+        parser.add_argument('--intra', type=_int_list, help='Intra-op thread counts to try')
+        parser.add_argument('--inter', type=_int_list, help='Inter-op thread counts to try')
+        parser.add_argument('--max-p95-ms', type=float, help='Only pick settings within this call latency')
+        parser.add_argument('--dry-run', action='store_true', help='Print the profile without saving it')
+    parser.add_argument('--batch-sizes', type=_int_list)
+    parser.add_argument('--seconds', type=float, default=3.0, help='Measured time per batch size')
+    parser.add_argument('--images', help='Food images to benchmark with (default: synthetic)')
+    parser.add_argument('--model', help='Food model (default: ml_models/north_indian_food_model.h5)')
+    options = parser.parse_args(args[1:])
+
+    if args[0] == '_bench':
+        sizes = options.batch_sizes or list(DEFAULT_BATCH_SIZES[options.service])
+        print(json.dumps(run_bench(options.service, sizes, options.seconds, options.images, options.model)))
+        return
+
+    model_path = options.model or str(DEFAULT_PROFILE_PATH.parent / 'north_indian_food_model.h5')
+    services = list(SERVICES) if options.service == 'all' else [options.service]
+    profile = tune(services, options.workers, options.intra, options.inter, options.batch_sizes,
+                   options.seconds, options.images, model_path, options.max_p95_ms)
+    if not options.dry_run and profile['services']:
+        path = profile_path() or DEFAULT_PROFILE_PATH
+        if path.exists():
+            # Keep services that were not re-tuned this run
+            try:
+                previous = json.loads(path.read_text())
+                if previous.get('host', {}).get('cpus') == profile['host']['cpus']:
+                    for service in SERVICES:
+                        if service not in services:
+                            for key in ('services', 'trials'):
+                                if service in previous.get(key, {}):
+                                    profile[key][service] = previous[key][service]
+            except (OSError, ValueError):
+                pass
+        print(f"✓ Profile saved to {write_profile(profile, path)}", file=sys.stderr)
+    summary = dict(profile)
+    summary.pop('trials')
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Meal Embedding Index - Per-user nearest-neighbour index of confirmed meals
+Stores L2-normalized MobileNetV2 embeddings (optionally product-quantized)
+so repeat photos of a user's usual dishes can be recognised by a dot product
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: per-process locking only
+    fcntl = None
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Row-wise L2 normalization (dot product == cosine similarity)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class ProductQuantizer:
+    """Splits vectors into subspaces, each encoded by a k-means codebook"""
+
+    def __init__(self, subvectors: int = 16, centroids: int = 256):
+        self.subvectors = subvectors
+        self.centroids = centroids
+        self.codebooks: Optional[np.ndarray] = None  # (subvectors, k, sub_dim)
+
+    def fit(self, vectors: np.ndarray, iterations: int = 20, seed: int = 0) -> 'ProductQuantizer':
+        n, dim = vectors.shape
+        if dim % self.subvectors:
+            raise ValueError(f'Dimension {dim} not divisible by {self.subvectors} subvectors')
+        sub_dim = dim // self.subvectors
+        k = min(self.centroids, n)
+        rng = np.random.default_rng(seed)
+
+        codebooks = np.zeros((self.subvectors, k, sub_dim), dtype=np.float32)
+        for m in range(self.subvectors):
+            sub = vectors[:, m * sub_dim:(m + 1) * sub_dim]
+            centers = sub[rng.choice(n, k, replace=False)].copy()
+            for _ in range(iterations):
+                assign = self._nearest(sub, centers)
+                for c in range(k):
+                    members = sub[assign == c]
+                    if len(members):
+                        centers[c] = members.mean(axis=0)
+            codebooks[m] = centers
+        self.codebooks = codebooks
+        return self
+
+    @staticmethod
+    def _nearest(sub: np.ndarray, centers: np.ndarray) -> np.ndarray:
+        distances = (
+            (sub ** 2).sum(axis=1, keepdims=True)
+            - 2 * sub @ centers.T
+            + (centers ** 2).sum(axis=1)
+        )
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        sub_dim = self.codebooks.shape[2]
+        codes = np.zeros((len(vectors), self.subvectors), dtype=np.uint8)
+        for m in range(self.subvectors):
+            sub = vectors[:, m * sub_dim:(m + 1) * sub_dim]
+            codes[:, m] = self._nearest(sub, self.codebooks[m])
+        return codes
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Asymmetric dot products between one query and encoded vectors"""
+        sub_dim = self.codebooks.shape[2]
+        table = np.einsum('mkd,md->mk', self.codebooks, query.reshape(self.subvectors, sub_dim))
+        return table[np.arange(self.subvectors), codes].sum(axis=1)
+
+
+class UserMealIndex:
+    """
+    Confirmed meals of one user
+
+    Holds either the raw vectors or, once quantized, only the PQ codes; raw
+    vectors are kept alongside the codes only when keep_vectors is set (to
+    re-fit the codebooks later).
+    """
+
+    def __init__(self, dim: int, keep_vectors: bool = False):
+        self.dim = dim
+        self.keep_vectors = keep_vectors
+        self.vectors: Optional[np.ndarray] = np.zeros((0, dim), dtype=np.float32)
+        self.labels: List[str] = []
+        self.meta: List[Dict] = []
+        self.pq: Optional[ProductQuantizer] = None
+        self.codes: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def add(self, embedding: np.ndarray, label: str, meta: Dict):
+        vector = normalize(embedding.reshape(1, -1))
+        if self.pq is not None:
+            self.codes = np.vstack([self.codes, self.pq.encode(vector)])
+        if self.vectors is not None:
+            self.vectors = np.vstack([self.vectors, vector])
+        self.labels.append(label)
+        self.meta.append(meta)
+
+    def quantize(self, subvectors: int):
+        """Fit PQ codebooks on the raw vectors and switch to codes"""
+        self.pq = ProductQuantizer(subvectors).fit(self.vectors)
+        self.codes = self.pq.encode(self.vectors)
+        if not self.keep_vectors:
+            self.vectors = None
+
+    def scores(self, embedding: np.ndarray) -> np.ndarray:
+        query = normalize(embedding.reshape(-1))
+        if self.pq is not None:
+            return self.pq.scores(query, self.codes)
+        return self.vectors @ query
+
+
+class MealEmbeddingIndex:
+    """Per-user, disk-persisted index of confirmed meal embeddings"""
+
+    DEFAULT_MIN_SIMILARITY = 0.92
+
+    DEFAULT_MAX_CACHED_USERS = 256
+
+    def __init__(self, root_dir: str, dim: int = 1280, pq_subvectors: int = None,
+                 pq_min_vectors: int = 1024, keep_vectors: bool = False,
+                 max_cached_users: int = DEFAULT_MAX_CACHED_USERS):
+        """
+        keep_vectors: also store raw vectors once a user's index is quantized
+        (needed only to re-fit the codebooks; otherwise PQ saves no space)
+        max_cached_users: users kept in memory, least recently used evicted
+        """
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.pq_subvectors = pq_subvectors
+        self.pq_min_vectors = pq_min_vectors
+        self.keep_vectors = keep_vectors
+        self.max_cached_users = max(1, max_cached_users)
+        self._users: 'OrderedDict[str, UserMealIndex]' = OrderedDict()
+        self._mtimes: Dict[str, Optional[int]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, user_id: str) -> Path:
+        digest = hashlib.sha1(str(user_id).encode('utf-8')).hexdigest()[:24]
+        return self.root_dir / f'{digest}.npz'
+
+    def _mtime(self, user_id: str) -> Optional[int]:
+        try:
+            return self._path(user_id).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _user(self, user_id: str) -> UserMealIndex:
+        """Cached index, reloaded when another process has saved a newer file"""
+        user_id = str(user_id)
+        index = self._users.get(user_id)
+        mtime = self._mtime(user_id)
+        if index is None or self._mtimes.get(user_id) != mtime:
+            index = self._load(user_id)
+            self._users[user_id] = index
+            self._mtimes[user_id] = mtime
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_cached_users:
+            evicted, _ = self._users.popitem(last=False)
+            self._mtimes.pop(evicted, None)
+        return index
+
+    @contextmanager
+    def _file_lock(self, user_id: str):
+        """Exclusive per-user lock shared by every process using this directory"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(user_id).with_suffix('.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self, user_id: str) -> UserMealIndex:
+        index = UserMealIndex(self.dim, self.keep_vectors)
+        path = self._path(user_id)
+        if not path.exists():
+            return index
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                index.vectors = data['vectors'].astype(np.float32) if 'vectors' in data else None
+                records = json.loads(str(data['records']))
+                index.labels = [r['label'] for r in records]
+                index.meta = [r['meta'] for r in records]
+                if 'codebooks' in data:
+                    index.pq = ProductQuantizer(data['codebooks'].shape[0], data['codebooks'].shape[1])
+                    index.pq.codebooks = data['codebooks']
+                    index.codes = data['codes']
+                    if not self.keep_vectors:
+                        index.vectors = None
+        except Exception as e:
+            print(f"⚠️ Could not load meal index for user {user_id}: {e}", file=sys.stderr)
+            index = UserMealIndex(self.dim, self.keep_vectors)
+        return index
+
+    def _save(self, user_id: str, index: UserMealIndex):
+        records = json.dumps([{'label': l, 'meta': m} for l, m in zip(index.labels, index.meta)])
+        arrays = {'records': np.array(records)}
+        if index.vectors is not None:
+            arrays['vectors'] = index.vectors.astype(np.float16)
+        if index.pq is not None:
+            arrays['codebooks'] = index.pq.codebooks
+            arrays['codes'] = index.codes
+
+        # Atomic replace so readers never see a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix='.npz')
+        os.close(fd)
+        try:
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, self._path(user_id))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def add(self, user_id: str, embedding: np.ndarray, label: str, meta: Dict = None):
+        """
+        Add a confirmed meal and persist the user's index
+
+        The read-modify-write runs under the user's file lock on a fresh load,
+        so concurrent confirmations from other processes are not overwritten.
+        """
+        user_id = str(user_id)
+        with self._lock, self._file_lock(user_id):
+            index = self._user(user_id)
+            index.add(np.asarray(embedding, dtype=np.float32), label, meta or {})
+            if (self.pq_subvectors and index.pq is None and len(index) >= self.pq_min_vectors):
+                index.quantize(self.pq_subvectors)
+            self._save(user_id, index)
+            self._mtimes[user_id] = self._mtime(user_id)
+
+    def search(self, user_id: str, embedding: np.ndarray, k: int = 5) -> List[Dict]:
+        """Top-k confirmed meals by cosine similarity"""
+        with self._lock:
+            index = self._user(user_id)
+            if not len(index):
+                return []
+            scores = index.scores(np.asarray(embedding, dtype=np.float32))
+            labels, meta = list(index.labels), list(index.meta)
+
+        top = np.argsort(-scores)[:k]
+        return [
+            {'label': labels[i], 'similarity': float(scores[i]), 'meta': meta[i]}
+            for i in top
+        ]
+
+    def match(self, user_id: str, embedding: np.ndarray,
+              min_similarity: float = DEFAULT_MIN_SIMILARITY) -> Optional[Dict]:
+        """Best confirmed meal if it is close enough, else None"""
+        results = self.search(user_id, embedding, k=1)
+        if results and results[0]['similarity'] >= min_similarity:
+            return results[0]
+        return None
+
+    def size(self, user_id: str) -> int:
+        with self._lock:
+            return len(self._user(user_id))
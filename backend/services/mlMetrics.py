@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+ML Metrics - Hot-path instrumentation for the Python inference services
+Records per-stage latencies into low-overhead histograms, exposes them in
+Prometheus text format and keeps a log of slow requests with input shapes
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds (0.5ms .. 10s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Requests slower than this (ms) are written to the slow-request log
+DEFAULT_SLOW_REQUEST_MS = float(os.environ.get('ML_SLOW_REQUEST_MS', 500))
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple[str, ...], extra: str = '') -> str:
+    """Render a Prometheus label set"""
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """Fixed-bucket histogram keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        """Record one observation (seconds)"""
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[label_values] = series
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Dict]:
+        """Copy of the current series with cumulative bucket counts"""
+        with self._lock:
+            items = [(key, list(s[0]), s[1], s[2]) for key, s in self._series.items()]
+
+        result = {}
+        for key, counts, total, count in items:
+            cumulative = []
+            running = 0
+            for c in counts:
+                running += c
+                cumulative.append(running)
+            result[key] = {'buckets': cumulative, 'sum': total, 'count': count}
+        return result
+
+    def quantile(self, q: float, *label_values: str) -> Optional[float]:
+        """Approximate quantile (bucket upper bound) for one series"""
+        series = self.snapshot().get(label_values)
+        if not series or series['count'] == 0:
+            return None
+        target = q * series['count']
+        for bound, cumulative in zip(self.buckets, series['buckets']):
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for key, series in sorted(self.snapshot().items()):
+            for bound, cumulative in zip(self.buckets, series['buckets']):
+                labels = _format_labels(self.label_names, key, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{labels} {series["buckets"][-1]}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {series["sum"]:.6f}')
+            lines.append(f'{self.name}_count{labels} {series["count"]}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.label_names, key)} {value:g}')
+        return lines
+
+
+class MetricsRegistry:
+    """Holds all metrics of the inference process"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def histogram(self, name: str, help_text: str, label_names: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def counter(self, name: str, help_text: str, label_names: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_LATENCY = REGISTRY.histogram(
+    'ml_stage_latency_seconds',
+    'Latency of inference hot-path stages',
+    ('service', 'stage')
+)
+REQUEST_LATENCY = REGISTRY.histogram(
+    'ml_request_latency_seconds',
+    'End-to-end latency of inference requests',
+    ('service',)
+)
+SLOW_REQUESTS = REGISTRY.counter(
+    'ml_slow_requests_total',
+    'Requests slower than the slow-request threshold',
+    ('service',)
+)
+
+# Most recent slow requests, served on /slow-requests
+SLOW_REQUEST_LOG = deque(maxlen=200)
+
+
+class RequestTimer:
+    """Times the stages of one inference request"""
+
+    def __init__(self, service: str = None, slow_request_ms: float = None):
+        self.service = service
+        self.enabled = service is not None
+        self.slow_request_ms = DEFAULT_SLOW_REQUEST_MS if slow_request_ms is None else slow_request_ms
+        self.stages: Dict[str, float] = {}
+        self.shapes: Dict[str, object] = {}
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block and feed it to the stage histogram"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            STAGE_LATENCY.observe(elapsed, self.service, name)
+
+    def record_shape(self, name: str, shape):
+        """Remember an input shape for the slow-request log"""
+        if self.enabled:
+            self.shapes[name] = list(shape) if isinstance(shape, (tuple, list)) else shape
+
+    def finish(self) -> float:
+        """Close the request; returns total latency in ms"""
+        total = time.perf_counter() - self.start
+        if not self.enabled:
+            return total * 1000
+
+        REQUEST_LATENCY.observe(total, self.service)
+        if total * 1000 >= self.slow_request_ms:
+            SLOW_REQUESTS.inc(self.service)
+            entry = {
+                'timestamp': time.time(),
+                'service': self.service,
+                'total_ms': round(total * 1000, 3),
+                'stages_ms': {k: round(v * 1000, 3) for k, v in self.stages.items()},
+                'input_shapes': self.shapes
+            }
+            SLOW_REQUEST_LOG.append(entry)
+            print(f"⚠️ Slow request: {json.dumps(entry)}", file=sys.stderr)
+        return total * 1000
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body = REGISTRY.render().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/slow-requests':
+            body = json.dumps(list(SLOW_REQUEST_LOG)).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Serve /metrics and /slow-requests from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='ml-metrics', daemon=True)
+    thread.start()
+    print(f"✓ Metrics endpoint on http://{host}:{server.server_port}/metrics", file=sys.stderr)
+    return server
+
+
+def maybe_start_metrics_server() -> Optional[ThreadingHTTPServer]:
+    """Start the metrics endpoint when ML_METRICS_PORT is set"""
+    port = os.environ.get('ML_METRICS_PORT')
+    if not port:
+        return None
+    try:
+        return start_metrics_server(int(port))
+    except OSError as e:
+        print(f"⚠️ Metrics endpoint not started: {e}", file=sys.stderr)
+        return None
@@ -4,33 +4,77 @@ ML Task Generator Service - Generates personalized fitness tasks using neural ne
 Uses the trained model to predict tasks based on user profile
 """
 
+import sys
+from pathlib import Path
+
+# Installed first so --profile-startup sees every import below
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from startupProfiler import STARTUP
+from inferenceTuning import apply_profile
+
+# Tuned thread settings must be in the environment before TensorFlow loads
+apply_profile('task_generator')
+
+import copy
+import hashlib
+import os
 import pickle
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
 import numpy as np
 import json
-import sys
-from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+from bucketedPredict import BucketedPredictor, buckets_from_env
+from mlMetrics import REGISTRY, RequestTimer, maybe_start_metrics_server
+from singleFlight import SingleFlight, content_hash
+from taskModel import CATEGORY_CLASSES, DIFFICULTY_CLASSES, STAT_NAMES, StudentTaskModel, load_preprocessor
+
+TASK_CACHE = REGISTRY.counter(
+    'ml_task_cache_total',
+    'Deterministic task cache lookups',
+    ('result',)
+)
+
 class MLTaskGenerator:
     """Generates personalized fitness tasks using neural network predictions"""
     
-    def __init__(self):
-        """Initialize with loaded model and preprocessor"""
+    # Deterministic tasks kept for retries, keyed by (user id, day, slot)
+    TASK_CACHE_SIZE = 4096
+    
+    # 'teacher': full network; 'student': distilled NumPy model (distill-task-model.py)
+    MODEL_VARIANTS = ('teacher', 'student')
+    
+    def __init__(self, model_dir=None, model_variant='teacher'):
+        """Initialize with loaded model and preprocessor (from model_dir, default ml_models/)"""
+        if model_variant not in self.MODEL_VARIANTS:
+            raise ValueError(f'Unknown model_variant: {model_variant}')
+        self.model_variant = model_variant
         try:
             # Build paths relative to this file
             backend_dir = Path(__file__).parent.parent
-            ml_models_dir = backend_dir.parent / 'ml_models'
+            ml_models_dir = Path(model_dir or os.environ.get('ML_TASK_MODEL_DIR') or backend_dir / 'ml_models')
             
             # Load model
-            model_path = ml_models_dir / 'fitness_model.pkl'
-            with open(model_path, 'rb') as f:
-                self.model = pickle.load(f)
+            if model_variant == 'student':
+                with STARTUP.phase('load fitness_model_student.npz', 'model_load'):
+                    self.model = StudentTaskModel.load(ml_models_dir / 'fitness_model_student.npz')
+            else:
+                model_path = ml_models_dir / 'fitness_model.pkl'
+                with STARTUP.phase('unpickle fitness_model.pkl', 'model_load'):
+                    with open(model_path, 'rb') as f:
+                        self.model = pickle.load(f)
+            
+            # Keras teacher runs through fixed-size compiled buckets; the NumPy student needs none
+            self.predictor = self.model if model_variant == 'student' else \
+                BucketedPredictor(self.model, 'task_generator', buckets_from_env())
             
             # Load preprocessor
             preprocessor_path = ml_models_dir / 'feature_preprocessor.pkl'
-            with open(preprocessor_path, 'rb') as f:
-                self.preprocessor = pickle.load(f)
+            with STARTUP.phase('unpickle feature_preprocessor.pkl', 'model_load'):
+                self.preprocessor = load_preprocessor(preprocessor_path)
             
             print("✓ Model and preprocessor loaded successfully", file=sys.stderr)
         except Exception as e:
@@ -38,12 +82,18 @@ class MLTaskGenerator:
             raise
         
         # Constants
-        self.STAT_NAMES = ['strength', 'constitution', 'dexterity', 'wisdom', 'charisma']
-        self.CATEGORY_CLASSES = ['strength', 'cardio', 'flexibility', 'health', 'hiit']
-        self.DIFFICULTY_CLASSES = ['easy', 'medium', 'hard']
+        self.STAT_NAMES = list(STAT_NAMES)
+        self.CATEGORY_CLASSES = list(CATEGORY_CLASSES)
+        self.DIFFICULTY_CLASSES = list(DIFFICULTY_CLASSES)
         
         # Exercise database - comprehensive list
         self.EXERCISES = self._load_exercises()
+        
+        self._task_cache = OrderedDict()
+        self._task_cache_lock = threading.Lock()
+        
+        # Concurrent identical requests share one inference
+        self._inflight = SingleFlight('task_generator')
     
     def _load_exercises(self):
         """Load complete exercise database organized by category and difficulty"""
@@ -210,56 +260,257 @@ class MLTaskGenerator:
             },
         }
     
-    def generate_task(self, user_data):
-        """Generate a single personalized task"""
+    def warm_up(self):
+        """Trace every predict bucket so no request pays for graph tracing"""
+        with STARTUP.phase('first predict', 'warm_up'):
+            if isinstance(self.predictor, BucketedPredictor):
+                self.predictor.warm_up()
+            else:
+                self.predictor.predict(np.zeros((1, 19), dtype=np.float32))
+    
+    def generate_task(self, user_data, deterministic=False, day=None, slot=0):
+        """
+        Generate a single personalized task
+        
+        With deterministic=True the task is keyed by (user id, day, slot): the
+        exercise pick comes from a counter-based RNG seeded by that key, so a
+        retried or duplicated request returns the same task from the cache.
+        """
+        if not deterministic:
+            key = ('features', content_hash(self._build_features(user_data).tobytes()))
+            return self._inflight.do(key, self._generate_task, user_data)
+        
+        key = self.task_key(user_data, day, slot)
+        with self._task_cache_lock:
+            cached = self._task_cache.get(key)
+            if cached is not None:
+                self._task_cache.move_to_end(key)
+        if cached is not None:
+            TASK_CACHE.inc('hit')
+            return copy.deepcopy(cached)
+        
+        TASK_CACHE.inc('miss')
+        return self._inflight.do(key, self._generate_and_cache, user_data, key)
+    
+    def _generate_and_cache(self, user_data, key):
+        task = self._generate_task(user_data, rng=self.task_rng(key))
+        with self._task_cache_lock:
+            self._task_cache[key] = task
+            if len(self._task_cache) > self.TASK_CACHE_SIZE:
+                self._task_cache.popitem(last=False)
+        return task
+    
+    @staticmethod
+    def task_key(user_data, day=None, slot=0):
+        """(user id, UTC day, slot) identifying one deterministic task"""
+        user_id = user_data.get('user_id', user_data.get('id'))
+        if user_id is None:
+            raise ValueError('Deterministic generation needs user_id')
+        day = day or datetime.now(timezone.utc).date().isoformat()
+        return (str(user_id), str(day), int(slot))
+    
+    @staticmethod
+    def task_rng(key):
+        """Counter-based (Philox) generator seeded from a task key"""
+        digest = hashlib.blake2b('|'.join(map(str, key)).encode('utf-8'), digest_size=16).digest()
+        return np.random.Generator(np.random.Philox(key=int.from_bytes(digest, 'little')))
+    
+    def _generate_task(self, user_data, rng=None):
+        """Run the model once and decode a task; rng drives the exercise pick"""
+        timer = RequestTimer('task_generator')
         try:
             # Prepare features
-            features = self._prepare_features(user_data)
+            with timer.stage('feature_prep'):
+                raw_features = self._build_features(user_data)
+            with timer.stage('scaling'):
+                features = self._scale_features(raw_features)
+            timer.record_shape('features', features.shape)
             
             # Get model predictions
-            predictions = self.model.predict(features.reshape(1, -1), verbose=0)
-            y_cat, y_diff, y_xp, y_dur, y_stats = predictions
+            with timer.stage('predict'):
+                predictions = self.predictor.predict(features.reshape(1, -1))
             
-            # Process category and difficulty
-            category_idx = np.argmax(y_cat[0])
-            difficulty_idx = np.argmax(y_diff[0])
+            with timer.stage('decode'):
+                task = self._decode_predictions(predictions, rng)
             
-            category = self.CATEGORY_CLASSES[category_idx]
-            difficulty = self.DIFFICULTY_CLASSES[difficulty_idx]
-            
-            # Denormalize XP and duration
-            xp = self._denormalize_xp(y_xp[0][0])
-            duration = self._denormalize_duration(y_dur[0][0])
+            return task
+        except Exception as e:
+            print(f"✗ Error generating task: {e}", file=sys.stderr)
+            raise
+        finally:
+            timer.finish()
+    
+    def generate_tasks(self, users_data, deterministic=False, day=None, slot=0, raw_features=None):
+        """
+        Generate one task per user with a single batched predict
+        
+        deterministic=True matches generate_task: cached tasks are reused and
+        only the misses go through the model, each with its own key's RNG.
+        slot may be one slot for every user or a list with one per user.
+        raw_features (rows of _build_features) replaces the profile fields,
+        so users_data then only needs user_id.
+        """
+        if not deterministic:
+            return self._generate_tasks(users_data, raw_features=raw_features)
+        
+        slots = slot if isinstance(slot, (list, tuple)) else [slot] * len(users_data)
+        keys = [self.task_key(user, day, user_slot) for user, user_slot in zip(users_data, slots)]
+        tasks = [None] * len(users_data)
+        with self._task_cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._task_cache.get(key)
+                if cached is not None:
+                    self._task_cache.move_to_end(key)
+                    tasks[i] = copy.deepcopy(cached)
+        misses = [i for i, task in enumerate(tasks) if task is None]
+        TASK_CACHE.inc('hit', amount=len(tasks) - len(misses))
+        TASK_CACHE.inc('miss', amount=len(misses))
+        if misses:
+            # Duplicate keys in one batch run once; identical concurrent batches coalesce
+            first = {}
+            for i in misses:
+                first.setdefault(keys[i], i)
+            rows = list(first.values())
+            fresh = self._inflight.do(
+                ('tasks',) + tuple(first), self._generate_and_cache_many,
+                [users_data[i] for i in rows], list(first),
+                None if raw_features is None else np.asarray(raw_features)[rows]
+            )
+            by_key = dict(zip(first, fresh))
+            for i in misses:
+                tasks[i] = copy.deepcopy(by_key[keys[i]])
+        return tasks
+    
+    def _generate_and_cache_many(self, users_data, keys, raw_features=None):
+        tasks = self._generate_tasks(users_data, [self.task_rng(key) for key in keys], raw_features)
+        with self._task_cache_lock:
+            for key, task in zip(keys, tasks):
+                self._task_cache[key] = task
+            while len(self._task_cache) > self.TASK_CACHE_SIZE:
+                self._task_cache.popitem(last=False)
+        return tasks
+    
+    def _generate_tasks(self, users_data, rngs=None, raw_features=None):
+        if not users_data:
+            return []
+        timer = RequestTimer('task_generator')
+        try:
+            with timer.stage('feature_prep'):
+                if raw_features is None:
+                    raw_features = np.stack([self._build_features(user) for user in users_data])
+            with timer.stage('scaling'):
+                features = self.preprocessor.transform(raw_features)
+            timer.record_shape('features', features.shape)
             
-            # Convert stats to simple integers (1/2/3 based on difficulty)
-            stat_values = np.round(y_stats[0] * 3.0).astype(int)
-            stat_values = np.clip(stat_values, 1, 3)
+            with timer.stage('predict'):
+                predictions = self.predictor.predict(features)
             
-            stat_rewards = {
-                stat_name: int(stat_values[i]) 
-                for i, stat_name in enumerate(self.STAT_NAMES)
-            }
+            with timer.stage('decode'):
+                return [
+                    self._decode_predictions([head[i:i + 1] for head in predictions],
+                                             rngs[i] if rngs else None)
+                    for i in range(len(users_data))
+                ]
+        finally:
+            timer.finish()
+    
+    def task_fields(self, raw_features):
+        """
+        Vectorized decode for a (rows, 19) raw feature matrix
+        
+        Returns per-row class indices, exercise index, xp, duration and stat
+        rewards as arrays (the binary IPC worker packs these as records).
+        """
+        timer = RequestTimer('task_generator')
+        try:
+            with timer.stage('scaling'):
+                features = self.preprocessor.transform(np.asarray(raw_features, dtype=np.float32))
+            timer.record_shape('features', features.shape)
             
-            # Select exercise
-            exercise = self._select_exercise(category, difficulty)
+            with timer.stage('predict'):
+                y_cat, y_diff, y_xp, y_dur, y_stats = self.predictor.predict(features)
             
-            return {
-                'exercise_name': exercise['name'],
-                'exercise_description': exercise['description'],
-                'exercise_target': exercise.get('reps', exercise.get('duration', 'N/A')),
-                'category': category,
-                'difficulty': difficulty,
-                'xp': int(xp),
-                'duration': int(duration),
-                'stat_rewards': stat_rewards
-            }
-        except Exception as e:
-            print(f"✗ Error generating task: {e}", file=sys.stderr)
-            raise
+            with timer.stage('decode'):
+                category = np.argmax(y_cat, axis=1)
+                difficulty = np.argmax(y_diff, axis=1)
+                counts = np.array([
+                    [len(self.EXERCISES[c][d]) for d in self.DIFFICULTY_CLASSES]
+                    for c in self.CATEGORY_CLASSES
+                ])
+                exercise = (np.random.random(len(category)) * counts[category, difficulty]).astype(int)
+                return {
+                    'category': category,
+                    'difficulty': difficulty,
+                    'exercise': exercise,
+                    'xp': self._denormalize_xp(y_xp[:, 0]).astype(int),
+                    'duration': self._denormalize_duration(y_dur[:, 0]).astype(int),
+                    'stats': np.clip(np.round(y_stats * 3.0).astype(int), 1, 3)
+                }
+        finally:
+            timer.finish()
+    
+    def task_fields_from_tasks(self, tasks):
+        """task_fields-shaped arrays for decoded task dictionaries (binary IPC records)"""
+        exercise_names = {
+            (c, d): [exercise['name'] for exercise in self.EXERCISES[c][d]]
+            for c in self.CATEGORY_CLASSES for d in self.DIFFICULTY_CLASSES
+        }
+        return {
+            'category': np.array([self.CATEGORY_CLASSES.index(t['category']) for t in tasks]),
+            'difficulty': np.array([self.DIFFICULTY_CLASSES.index(t['difficulty']) for t in tasks]),
+            'exercise': np.array([exercise_names[t['category'], t['difficulty']].index(t['exercise_name'])
+                                  for t in tasks]),
+            'xp': np.array([t['xp'] for t in tasks]),
+            'duration': np.array([t['duration'] for t in tasks]),
+            'stats': np.array([[t['stat_rewards'][name] for name in self.STAT_NAMES] for t in tasks])
+        }
+    
+    def _decode_predictions(self, predictions, rng=None):
+        """Turn the five model heads into a task dictionary"""
+        y_cat, y_diff, y_xp, y_dur, y_stats = predictions
+        
+        # Process category and difficulty
+        category_idx = np.argmax(y_cat[0])
+        difficulty_idx = np.argmax(y_diff[0])
+        
+        category = self.CATEGORY_CLASSES[category_idx]
+        difficulty = self.DIFFICULTY_CLASSES[difficulty_idx]
+        
+        # Denormalize XP and duration
+        xp = self._denormalize_xp(y_xp[0][0])
+        duration = self._denormalize_duration(y_dur[0][0])
+        
+        # Convert stats to simple integers (1/2/3 based on difficulty)
+        stat_values = np.round(y_stats[0] * 3.0).astype(int)
+        stat_values = np.clip(stat_values, 1, 3)
+        
+        stat_rewards = {
+            stat_name: int(stat_values[i]) 
+            for i, stat_name in enumerate(self.STAT_NAMES)
+        }
+        
+        # Select exercise
+        exercise = self._select_exercise(category, difficulty, rng)
+        
+        return {
+            'exercise_name': exercise['name'],
+            'exercise_description': exercise['description'],
+            'exercise_target': exercise.get('reps', exercise.get('duration', 'N/A')),
+            'category': category,
+            'difficulty': difficulty,
+            'xp': int(xp),
+            'duration': int(duration),
+            'stat_rewards': stat_rewards
+        }
     
     def _prepare_features(self, user_data):
         """Prepare user data for model - 19 features in specific order"""
-        features = np.array([
+        return self._scale_features(self._build_features(user_data))
+    
+    @classmethod
+    def _build_features(cls, user_data):
+        """Raw (unscaled) 19-feature vector in model order"""
+        return np.array([
             float(user_data.get('age', 30)),
             float(user_data.get('height', 175)),
             float(user_data.get('weight', 75)),
@@ -274,14 +525,15 @@ class MLTaskGenerator:
             float(user_data.get('bmi', 24)),
             float(user_data.get('sleep_quality', 70)),
             float(user_data.get('stress_level', 50)),
-            self._encode_gender(user_data.get('gender', 'M')),
-            self._encode_fitness_level(user_data.get('fitness_level', 'Intermediate')),
-            self._encode_activity_level(user_data.get('activity_level', 'Moderate')),
-            self._encode_rank(user_data.get('rank', 'C')),
-            self._encode_goal(user_data.get('primary_goal', 'balanced')),
+            cls._encode_gender(user_data.get('gender', 'M')),
+            cls._encode_fitness_level(user_data.get('fitness_level', 'Intermediate')),
+            cls._encode_activity_level(user_data.get('activity_level', 'Moderate')),
+            cls._encode_rank(user_data.get('rank', 'C')),
+            cls._encode_goal(user_data.get('primary_goal', 'balanced')),
         ], dtype=np.float32)
-        
-        # Normalize using preprocessor
+    
+    def _scale_features(self, features):
+        """Normalize using preprocessor"""
         return self.preprocessor.transform(features.reshape(1, -1))[0]
     
     def _denormalize_xp(self, xp_norm):
@@ -292,10 +544,13 @@ class MLTaskGenerator:
         """Convert normalized duration (0-1) to actual range (10-120 min)"""
         return dur_norm * 110 + 10
     
-    def _select_exercise(self, category, difficulty):
+    def _select_exercise(self, category, difficulty, rng=None):
         """Select random exercise from database"""
         exercises = self.EXERCISES[category][difficulty]
-        idx = np.random.randint(0, len(exercises))
+        if rng is not None:
+            idx = int(rng.integers(0, len(exercises)))
+        else:
+            idx = np.random.randint(0, len(exercises))
         return exercises[idx]
     
     @staticmethod
@@ -326,6 +581,15 @@ class MLTaskGenerator:
 
 def main():
     """Main entry point - read user data from stdin and output task as JSON"""
+    if STARTUP.enabled:
+        sys.exit(profile_startup())
+    
+    if '--serve-binary' in sys.argv[1:]:
+        sys.exit(serve_binary(parse_options(sys.argv[1:])))
+    
+    if '--stdin-ndjson' in sys.argv[1:]:
+        sys.exit(serve_ndjson(parse_options(sys.argv[1:])))
+    
     try:
         # Read user data from command line argument
         if len(sys.argv) < 2:
@@ -333,12 +597,20 @@ def main():
             sys.exit(1)
         
         user_data = json.loads(sys.argv[1])
+        options = parse_options(sys.argv[2:])
+        
+        maybe_start_metrics_server()
         
         # Initialize generator
-        generator = MLTaskGenerator()
+        generator = MLTaskGenerator(model_variant=options['model_variant'])
         
         # Generate task
-        task = generator.generate_task(user_data)
+        task = generator.generate_task(
+            user_data,
+            deterministic=options['deterministic'],
+            day=options['day'],
+            slot=options['slot']
+        )
         
         # Output as JSON
         print(json.dumps(task))
@@ -349,5 +621,70 @@ def main():
         sys.exit(1)
 
 
+def parse_options(args):
+    """Optional flags: --deterministic [--day YYYY-MM-DD] [--slot N] [--model-variant student] [--chunk-size N]"""
+    options = {'deterministic': False, 'day': None, 'slot': 0, 'chunk_size': None,
+               'model_variant': os.environ.get('ML_TASK_MODEL_VARIANT', 'teacher')}
+    i = 0
+    while i < len(args):
+        if args[i] == '--deterministic':
+            options['deterministic'] = True
+        elif args[i] == '--day' and i + 1 < len(args):
+            options['day'] = args[i + 1]
+            i += 1
+        elif args[i] == '--slot' and i + 1 < len(args):
+            options['slot'] = int(args[i + 1])
+            i += 1
+        elif args[i] == '--model-variant' and i + 1 < len(args):
+            options['model_variant'] = args[i + 1]
+            i += 1
+        elif args[i] == '--chunk-size' and i + 1 < len(args):
+            options['chunk_size'] = int(args[i + 1])
+            i += 1
+        i += 1
+    return options
+
+
+def serve_binary(options):
+    """--serve-binary: persistent worker speaking the binaryIpc framing on stdin/stdout"""
+    from binaryIpc import serve, task_handlers
+    from workerMemory import MemoryWatchdog
+    
+    maybe_start_metrics_server()
+    generator = MLTaskGenerator(model_variant=options['model_variant'])
+    generator.warm_up()
+    watchdog = MemoryWatchdog.from_env('task_generator', os.getpid())
+    handlers = task_handlers(generator, deterministic=options['deterministic'],
+                             day=options['day'], slot=options['slot'])
+    return serve(handlers, watchdog=watchdog)
+
+
+def serve_ndjson(options):
+    """--stdin-ndjson: one user JSON per stdin line, one task JSON per stdout line"""
+    from inferenceTuning import load_profile
+    from ndjsonStream import run_ndjson
+    
+    maybe_start_metrics_server()
+    generator = MLTaskGenerator(model_variant=options['model_variant'])
+    generator.warm_up()
+    chunk_size = options['chunk_size'] or load_profile('task_generator').get('batch_size') or 128
+    run_ndjson(
+        lambda users: generator.generate_tasks(users, deterministic=options['deterministic'],
+                                               day=options['day'], slot=options['slot']),
+        chunk_size
+    )
+    return 0
+
+
+def profile_startup():
+    """--profile-startup: load and warm the model, report the cold-start breakdown"""
+    try:
+        generator = MLTaskGenerator()
+        generator.warm_up()
+    except Exception as e:
+        print(f"✗ Startup failed: {e}", file=sys.stderr)
+    return STARTUP.finish('task_generator')
+
+
 if __name__ == '__main__':
     main()
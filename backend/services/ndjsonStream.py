@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+NDJSON Stream - Chunked batch mode for the inference CLIs
+`--stdin-ndjson` reads one JSON request per line from stdin. Lines are
+grouped into chunks, each chunk goes through the service's batched path,
+and one result line per request is written, in input order, as soon as its
+chunk is done. Only one chunk is held at a time, so memory stays flat
+however long the input is.
+
+A line that is not valid JSON, or a request that fails on its own, gets an
+error line ({"status": "error", "error": ..., "line": n}); the rest of its
+chunk is unaffected.
+"""
+
+import json
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
+
+
+def read_chunks(stream, chunk_size: int) -> Iterator[List[Tuple[int, object]]]:
+    """(line number, parsed request or the parse error) in chunks; blank lines are skipped"""
+    chunk = []
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            chunk.append((line_no, json.loads(line)))
+        except ValueError as e:
+            chunk.append((line_no, e))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _error(line_no: int, error: Exception) -> Dict:
+    return {'status': 'error', 'error': str(error), 'line': line_no}
+
+
+def _process_chunk(process_batch: Callable[[List], List[Dict]], chunk: List[Tuple[int, object]]) -> List[Dict]:
+    results = [None] * len(chunk)
+    pending = []
+    for i, (line_no, request) in enumerate(chunk):
+        if isinstance(request, Exception):
+            results[i] = _error(line_no, request)
+        else:
+            pending.append(i)
+    if not pending:
+        return results
+
+    try:
+        batch = process_batch([chunk[i][1] for i in pending])
+        for i, result in zip(pending, batch):
+            results[i] = result
+    except Exception:
+        # Retry one at a time so only the failing requests get error lines
+        for i in pending:
+            line_no, request = chunk[i]
+            try:
+                results[i] = process_batch([request])[0]
+            except Exception as e:
+                results[i] = _error(line_no, e)
+    return results
+
+
+def run_ndjson(process_batch: Callable[[List], List[Dict]], chunk_size: int,
+               instream=None, outstream=None) -> Dict:
+    """
+    Serve NDJSON requests until end of input
+
+    process_batch takes a list of parsed requests and returns one result
+    dict per request, in order.
+    """
+    instream = instream or sys.stdin
+    outstream = outstream or sys.stdout
+    started = time.perf_counter()
+    stats = {'requests': 0, 'errors': 0, 'chunks': 0}
+
+    for chunk in read_chunks(instream, max(1, chunk_size)):
+        for result in _process_chunk(process_batch, chunk):
+            if result.get('status') == 'error':
+                stats['errors'] += 1
+            outstream.write(json.dumps(result) + '\n')
+        outstream.flush()
+        stats['requests'] += len(chunk)
+        stats['chunks'] += 1
+
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    print(f"✓ {stats['requests']} requests ({stats['errors']} errors) in {stats['chunks']} chunks, "
+          f"{stats['seconds']}s", file=sys.stderr)
+    return stats
@@ -5,14 +5,33 @@ Uses transfer learning to detect and classify North Indian foods
 Includes nutrition information for detected foods
 """
 
-import numpy as np
-import json
+import os
 import sys
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Tuple
+
+# Installed first so --profile-startup sees every import below
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from startupProfiler import STARTUP
+from inferenceTuning import apply_profile
+
+# Tuned thread settings must be in the environment before TensorFlow loads
+apply_profile('food_detector')
+
+import numpy as np
+import json
+from typing import Dict, List, Optional, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
+from bucketedPredict import DEFAULT_BUCKETS, BucketedPredictor, buckets_from_env
+from mlMetrics import REGISTRY, RequestTimer, maybe_start_metrics_server
+from singleFlight import SingleFlight, file_hash
+from frameStream import FrameStream
+from imageLoader import load_image, open_reduced
+from mealEmbeddingIndex import MealEmbeddingIndex
+from plateRegions import grid_regions, merge_detections, saliency_map, salient_regions
+
 try:
     import tensorflow as tf
     from tensorflow.keras.applications import MobileNetV2
@@ -30,6 +49,36 @@ except ImportError:
     from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
     from tensorflow.keras.models import Sequential, load_model
 
+CASCADE_EXITS = REGISTRY.counter(
+    'ml_cascade_exits_total',
+    'Food detections answered by each cascade stage',
+    ('stage',)
+)
+
+MEAL_INDEX_LOOKUPS = REGISTRY.counter(
+    'ml_meal_index_lookups_total',
+    'Per-user meal index lookups by result (hit skips the classifier head)',
+    ('result',)
+)
+
+
+def model_metadata_path(model_path: str) -> Path:
+    """Sidecar JSON stored next to a saved model"""
+    return Path(model_path).with_suffix('.json')
+
+
+def read_model_metadata(model_path: str) -> Dict:
+    path = model_metadata_path(model_path)
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_model_metadata(model_path: str, metadata: Dict):
+    with open(model_metadata_path(model_path), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
 
 class NorthIndianFoodDetector:
     """Detects and classifies North Indian foods from images"""
@@ -268,101 +317,401 @@ class NorthIndianFoodDetector:
         }
     }
     
-    def __init__(self, model_path: str = None):
-        """Initialize the food detector with pre-trained model or create new one"""
+    # Main classifier defaults; a saved model's metadata overrides them.
+    # MobileNetV2 ImageNet weights exist for these input sizes and width multipliers
+    DEFAULT_INPUT_SIZE = 224
+    DEFAULT_ALPHA = 1.0
+    INPUT_SIZES = (128, 160, 192, 224)
+    ALPHAS = (0.35, 0.5, 0.75, 1.0)
+    
+    # Cascade first stage: low resolution, reduced width MobileNetV2
+    STAGE1_INPUT_SIZE = 128
+    STAGE1_ALPHA = 0.35
+    DEFAULT_CASCADE_THRESHOLD = 0.85
+    
+    # Compiled predict batch sizes for image inputs (largest covers plate mode and evaluate);
+    # ML_PREDICT_BUCKETS overrides them
+    IMAGE_BUCKETS = (1, 8, 32)
+    
+    # Plate mode: tile grids and the resolution used for the saliency filter
+    PLATE_GRIDS = (2, 3)
+    PLATE_SALIENCY_SIZE = 256
+    
+    def __init__(self, model_path: str = None, cascade_model_path: str = None,
+                 cascade_threshold: float = None, meal_index_dir: str = None,
+                 meal_match_threshold: float = MealEmbeddingIndex.DEFAULT_MIN_SIMILARITY,
+                 input_size: int = None, alpha: float = None, weights: str = 'imagenet'):
+        """
+        Initialize the food detector with pre-trained model or create new one
+        
+        input_size / alpha / weights only apply to a newly created model; a
+        loaded model takes its resolution and width from its metadata
+        """
         self.model = None
+        self.input_size = input_size or self.DEFAULT_INPUT_SIZE
+        self.alpha = alpha or self.DEFAULT_ALPHA
+        self.embedding_model = None
+        self.head_model = None
+        self.image_buckets = buckets_from_env(self.IMAGE_BUCKETS)
         self.model_path = model_path
         self.food_classes = list(self.NORTH_INDIAN_FOODS.keys())
         self.num_classes = len(self.food_classes)
         
+        # Optional early-exit first stage (see load_cascade)
+        self.stage1_model = None
+        self.stage1_predictor = None
+        self.stage1_input_size = self.STAGE1_INPUT_SIZE
+        self.stage1_alpha = self.STAGE1_ALPHA
+        self.cascade_threshold = None
+        
+        # Optional per-user index of confirmed meals (see confirm_meal)
+        self.meal_index = None
+        self.meal_match_threshold = meal_match_threshold
+        
+        # Concurrent requests for the same image share one inference
+        self._inflight = SingleFlight('food_detector')
+        
         if model_path and Path(model_path).exists():
             self.load_model(model_path)
         else:
-            self.create_model()
+            self.create_model(weights=weights)
+        
+        if cascade_model_path and Path(cascade_model_path).exists():
+            self.load_cascade(cascade_model_path, cascade_threshold)
+        
+        if meal_index_dir:
+            pq_subvectors = int(os.environ.get('ML_MEAL_INDEX_PQ_SUBVECTORS', '0')) or None
+            self.meal_index = MealEmbeddingIndex(
+                meal_index_dir, self.embedding_model.output_shape[-1], pq_subvectors,
+                keep_vectors=os.environ.get('ML_MEAL_INDEX_KEEP_VECTORS') == '1',
+                max_cached_users=int(os.environ.get('ML_MEAL_INDEX_CACHE_USERS',
+                                                    MealEmbeddingIndex.DEFAULT_MAX_CACHED_USERS))
+            )
     
-    def create_model(self):
+    def _build_classifier(self, input_size: int = 224, alpha: float = 1.0, weights: str = 'imagenet'):
+        """MobileNetV2 backbone (frozen) with the food classification head"""
+        # Load pre-trained MobileNetV2 (trained on ImageNet)
+        base_model = MobileNetV2(
+            input_shape=(input_size, input_size, 3),
+            alpha=alpha,
+            include_top=False,
+            weights=weights
+        )
+        
+        # Freeze base model layers
+        base_model.trainable = False
+        
+        return Sequential([
+            base_model,
+            GlobalAveragePooling2D(),
+            Dense(256, activation='relu'),
+            Dropout(0.3),
+            Dense(128, activation='relu'),
+            Dropout(0.2),
+            Dense(self.num_classes, activation='softmax')
+        ])
+    
+    @staticmethod
+    def _compile_classifier(model):
+        model.compile(
+            optimizer='adam',
+            loss='categorical_crossentropy',
+            metrics=['accuracy']
+        )
+    
+    def create_model(self, input_size: int = None, alpha: float = None, weights: str = 'imagenet'):
         """Create a transfer learning model using MobileNetV2"""
-        print("🏗️ Creating transfer learning model...", file=sys.stderr)
+        self.input_size = input_size or self.input_size
+        self.alpha = alpha or self.alpha
+        print(f"🏗️ Creating transfer learning model ({self.input_size}px, alpha={self.alpha})...",
+              file=sys.stderr)
         
         try:
-            # Load pre-trained MobileNetV2 (trained on ImageNet)
-            base_model = MobileNetV2(
-                input_shape=(224, 224, 3),
-                include_top=False,
-                weights='imagenet'
-            )
+            with STARTUP.phase('build model', 'model_build'):
+                self.model = self._build_classifier(self.input_size, self.alpha, weights)
             
-            # Freeze base model layers
-            base_model.trainable = False
-            
-            # Build model
-            self.model = Sequential([
-                base_model,
-                GlobalAveragePooling2D(),
-                Dense(256, activation='relu'),
-                Dropout(0.3),
-                Dense(128, activation='relu'),
-                Dropout(0.2),
-                Dense(self.num_classes, activation='softmax')
-            ])
-            
-            self.model.compile(
-                optimizer='adam',
-                loss='categorical_crossentropy',
-                metrics=['accuracy']
-            )
+            with STARTUP.phase('compile model', 'model_build'):
+                self._compile_classifier(self.model)
+            self._split_model()
             
             print(f"✓ Model created with {self.num_classes} food classes", file=sys.stderr)
         except Exception as e:
             print(f"✗ Error creating model: {e}", file=sys.stderr)
             raise
     
+    def create_cascade_model(self, input_size: int = None, alpha: float = None, weights: str = 'imagenet'):
+        """Create an untrained first-stage classifier for cascade mode"""
+        self.stage1_input_size = input_size or self.STAGE1_INPUT_SIZE
+        alpha = alpha or self.STAGE1_ALPHA
+        print(f"🏗️ Creating cascade stage 1 ({self.stage1_input_size}px, alpha={alpha})...", file=sys.stderr)
+        self.stage1_model = self._build_classifier(self.stage1_input_size, alpha, weights)
+        self._compile_classifier(self.stage1_model)
+        self.stage1_predictor = BucketedPredictor(self.stage1_model, 'food_stage1', self.image_buckets)
+        self.stage1_alpha = alpha
+        return self.stage1_model
+    
+    def load_cascade(self, model_path: str, threshold: float = None):
+        """Load a first-stage model; its metadata carries size and calibrated threshold"""
+        try:
+            metadata = read_model_metadata(model_path)
+            with STARTUP.phase(f'load {Path(model_path).name}', 'model_load'):
+                self.stage1_model = load_model(model_path)
+            self.stage1_predictor = BucketedPredictor(self.stage1_model, 'food_stage1', self.image_buckets)
+            self.stage1_input_size = int(metadata.get('input_size', self.stage1_model.input_shape[1]))
+            self.stage1_alpha = metadata.get('alpha', self.STAGE1_ALPHA)
+            self.cascade_threshold = (
+                threshold if threshold is not None
+                else metadata.get('threshold', self.DEFAULT_CASCADE_THRESHOLD)
+            )
+            print(f"✓ Cascade stage 1 loaded ({self.stage1_input_size}px, "
+                  f"threshold={self.cascade_threshold:.3f})", file=sys.stderr)
+        except Exception as e:
+            print(f"✗ Error loading cascade model: {e}", file=sys.stderr)
+            raise
+    
+    def save_cascade(self, model_path: str, threshold: float = None):
+        """Save the first-stage model and its metadata"""
+        if not self.stage1_model:
+            return
+        if threshold is not None:
+            self.cascade_threshold = threshold
+        self.stage1_model.save(model_path)
+        write_model_metadata(model_path, {
+            'role': 'cascade_stage1',
+            'input_size': self.stage1_input_size,
+            'alpha': self.stage1_alpha,
+            'threshold': self.cascade_threshold,
+            'classes': self.food_classes
+        })
+        print(f"✓ Cascade model saved to {model_path}", file=sys.stderr)
+    
     def load_model(self, model_path: str):
-        """Load a pre-trained model"""
+        """Load a pre-trained model; its metadata carries input size and width"""
         try:
-            self.model = load_model(model_path)
-            print(f"✓ Model loaded from {model_path}", file=sys.stderr)
+            metadata = read_model_metadata(model_path)
+            with STARTUP.phase(f'load {Path(model_path).name}', 'model_load'):
+                self.model = load_model(model_path)
+            model_size = int(self.model.input_shape[1])
+            self.input_size = int(metadata.get('input_size', model_size))
+            if self.input_size != model_size:
+                raise ValueError(f"Metadata input_size {self.input_size} does not match the "
+                                 f"model input ({model_size}px)")
+            self.alpha = metadata.get('alpha', self.DEFAULT_ALPHA)
+            self._split_model()
+            print(f"✓ Model loaded from {model_path} ({self.input_size}px, alpha={self.alpha})",
+                  file=sys.stderr)
         except Exception as e:
             print(f"✗ Error loading model: {e}", file=sys.stderr)
             raise
     
-    def save_model(self, model_path: str):
-        """Save the trained model"""
+    def _split_model(self):
+        """Backbone + pooling (embedding) and the dense head as separate models"""
+        # layers: [MobileNetV2, GlobalAveragePooling2D, Dense, Dropout, ..., Dense]
+        self.embedding_model = tf.keras.Model(self.model.inputs, self.model.layers[1].output)
+        embedding = tf.keras.Input(shape=self.embedding_model.output_shape[1:])
+        x = embedding
+        for layer in self.model.layers[2:]:
+            x = layer(x)
+        self.head_model = tf.keras.Model(embedding, x)
+        
+        # Fixed-shape compiled predict for each model (see bucketedPredict)
+        self.predictor = BucketedPredictor(self.model, 'food_classifier', self.image_buckets)
+        self.embedding_predictor = BucketedPredictor(self.embedding_model, 'food_embedding', self.image_buckets)
+        self.head_predictor = BucketedPredictor(self.head_model, 'food_head', buckets_from_env(DEFAULT_BUCKETS))
+    
+    def save_model(self, model_path: str, extra_metadata: Dict = None):
+        """Save the trained model and its metadata"""
         if self.model:
             self.model.save(model_path)
+            write_model_metadata(model_path, {
+                'role': 'classifier',
+                'input_size': self.input_size,
+                'alpha': self.alpha,
+                'classes': self.food_classes,
+                **(extra_metadata or {})
+            })
             print(f"✓ Model saved to {model_path}", file=sys.stderr)
     
-    def preprocess_image(self, image_path: str) -> np.ndarray:
+    def warm_up(self):
+        """Trace every predict bucket so no request pays for graph tracing"""
+        with STARTUP.phase('first predict', 'warm_up'):
+            self.predictor.warm_up()
+            if self.stage1_predictor is not None:
+                self.stage1_predictor.warm_up()
+            if self.meal_index is not None:
+                self.embedding_predictor.warm_up()
+                self.head_predictor.warm_up()
+    
+    def preprocess_image(self, image_path: str, timer: RequestTimer = None) -> np.ndarray:
         """Preprocess image for model input"""
+        timer = timer or RequestTimer()
         try:
-            # Load image
-            img = image.load_img(image_path, target_size=(224, 224))
-            
-            # Convert to array
-            img_array = image.img_to_array(img)
+            # Load image (reduced-resolution JPEG decode, then resize)
+            img = load_image(image_path, (self.input_size, self.input_size), timer)
             
-            # Normalize (MobileNetV2 expects values in range [-1, 1])
-            img_array = tf.keras.applications.mobilenet_v2.preprocess_input(img_array)
-            
-            # Add batch dimension
-            img_array = np.expand_dims(img_array, axis=0)
-            
-            return img_array
+            with timer.stage('preprocess'):
+                return self._image_to_batch(img)
         except Exception as e:
             print(f"✗ Error preprocessing image: {e}", file=sys.stderr)
             raise
     
-    def detect_food(self, image_path: str, confidence_threshold: float = 0.3) -> Dict:
+    @staticmethod
+    def _image_to_batch(img) -> np.ndarray:
+        """PIL image -> normalized (1, H, W, 3) batch"""
+        # Convert to array
+        img_array = image.img_to_array(img)
+        
+        # Normalize (MobileNetV2 expects values in range [-1, 1])
+        img_array = tf.keras.applications.mobilenet_v2.preprocess_input(img_array)
+        
+        # Add batch dimension
+        return np.expand_dims(img_array, axis=0)
+    
+    def embed_image(self, image_path: str, timer: RequestTimer = None) -> np.ndarray:
+        """Pooled MobileNetV2 embedding of an image"""
+        timer = timer or RequestTimer()
+        img_array = self.preprocess_image(image_path, timer)
+        timer.record_shape('image', img_array.shape)
+        with timer.stage('embed'):
+            return self.embedding_predictor.predict(img_array)[0]
+    
+    def confirm_meal(self, user_id: str, image_path: str, label: str, nutrition: Dict = None) -> Dict:
+        """Remember a confirmed detection so repeat photos match it directly"""
+        if self.meal_index is None:
+            return {'status': 'error', 'error': 'Meal index not enabled'}
+        try:
+            if nutrition is None and label in self.NORTH_INDIAN_FOODS:
+                nutrition = self._nutrition(label)
+            self.meal_index.add(user_id, self.embed_image(image_path), label, {
+                'nutrition': nutrition or {},
+                'confirmed_at': datetime.now(timezone.utc).isoformat()
+            })
+            return {
+                'status': 'success',
+                'user_id': str(user_id),
+                'label': label,
+                'indexed_meals': self.meal_index.size(user_id)
+            }
+        except Exception as e:
+            return {
+                'status': 'error',
+                'error': str(e)
+            }
+    
+    def _lookup_meal(self, user_id: str, embedding: np.ndarray, timer: RequestTimer) -> Optional[Dict]:
+        """Detection result for a confirmed meal close to the embedding, else None"""
+        with timer.stage('index_search'):
+            match = self.meal_index.match(user_id, embedding, self.meal_match_threshold)
+        if match is None:
+            MEAL_INDEX_LOOKUPS.inc('miss')
+            return None
+        MEAL_INDEX_LOOKUPS.inc('hit')
+        similarity = match['similarity']
+        return {
+            'status': 'success',
+            'detected_food': match['label'],
+            'confidence': similarity,
+            'probability': f"{similarity * 100:.2f}%",
+            'nutrition': match['meta'].get('nutrition', {}),
+            'source': 'meal_index',
+            'similarity': similarity,
+            'matched_meal_confirmed_at': match['meta'].get('confirmed_at')
+        }
+    
+    def _match_meal(self, user_id: str, image_path: str, timer: RequestTimer):
+        """(index result or None, class scores on a miss) from one backbone pass"""
+        embedding = self.embed_image(image_path, timer)
+        meal_match = self._lookup_meal(user_id, embedding, timer)
+        if meal_match is not None:
+            return meal_match, None
+        with timer.stage('predict'):
+            scores = self.head_predictor.predict(embedding[np.newaxis])[0]
+        return None, scores
+    
+    def _predict_cascade(self, image_path: str, timer: RequestTimer) -> Tuple[np.ndarray, int]:
+        """Stage 1 at low resolution; fall through to the full model when unsure"""
+        img = load_image(image_path, (self.input_size, self.input_size), timer)
+        
+        with timer.stage('preprocess'):
+            size = self.stage1_input_size
+            small_batch = self._image_to_batch(img.resize((size, size)))
+        timer.record_shape('image', small_batch.shape)
+        
+        with timer.stage('stage1_predict'):
+            stage1_scores = self.stage1_predictor.predict(small_batch)[0]
+        
+        if float(np.max(stage1_scores)) >= self.cascade_threshold:
+            CASCADE_EXITS.inc('1')
+            return stage1_scores, 1
+        
+        with timer.stage('preprocess'):
+            full_batch = self._image_to_batch(img)
+        with timer.stage('predict'):
+            scores = self.predictor.predict(full_batch)[0]
+        CASCADE_EXITS.inc('2')
+        return scores, 2
+    
+    def decode_image(self, image_path: str, timer: RequestTimer = None):
+        """Decoded RGB image at the full model's input size (path or file object)"""
+        return load_image(image_path, (self.input_size, self.input_size), timer)
+    
+    def predict_images(self, images: List, timer: RequestTimer = None) -> np.ndarray:
+        """
+        Class scores for decoded images, through the cascade when one is loaded
+        
+        Stage 1 scores the whole batch at low resolution; only the images it
+        is unsure about are batched again through the full model.
+        """
+        timer = timer or RequestTimer()
+        if self.stage1_model is None:
+            with timer.stage('preprocess'):
+                batch = np.concatenate([self._image_to_batch(img) for img in images])
+            timer.record_shape('images', batch.shape)
+            with timer.stage('predict'):
+                return self.predictor.predict(batch)
+        
+        size = self.stage1_input_size
+        with timer.stage('preprocess'):
+            small_batch = np.concatenate([self._image_to_batch(img.resize((size, size))) for img in images])
+        timer.record_shape('images', small_batch.shape)
+        with timer.stage('stage1_predict'):
+            scores = np.array(self.stage1_predictor.predict(small_batch), dtype=np.float32)
+        
+        unsure = np.flatnonzero(scores.max(axis=1) < self.cascade_threshold)
+        CASCADE_EXITS.inc('1', amount=len(scores) - len(unsure))
+        if len(unsure):
+            with timer.stage('preprocess'):
+                full_batch = np.concatenate([self._image_to_batch(images[i]) for i in unsure])
+            with timer.stage('predict'):
+                scores[unsure] = self.predictor.predict(full_batch)
+            CASCADE_EXITS.inc('2', amount=len(unsure))
+        return scores
+    
+    def detect_food(self, image_path: str, confidence_threshold: float = 0.3,
+                    user_id: str = None) -> Dict:
         """
         Detect food in image and return predictions
         
         Args:
             image_path: Path to the food image
             confidence_threshold: Minimum confidence for predictions
+            user_id: Check this user's confirmed meals first (needs the meal index)
             
         Returns:
             Dictionary with detected food, confidence, and nutrition info
         """
+        if self.meal_index is None:
+            user_id = None
+        try:
+            key = (file_hash(image_path), confidence_threshold, user_id)
+        except OSError:
+            # Unreadable file: let the normal path report the error
+            return self._detect_food(image_path, confidence_threshold, user_id)
+        return self._inflight.do(key, self._detect_food, image_path, confidence_threshold, user_id)
+    
+    def _detect_food(self, image_path: str, confidence_threshold: float, user_id: str = None) -> Dict:
+        """Uncoalesced detection for one image"""
+        timer = RequestTimer('food_detector')
         try:
             if not self.model:
                 return {
@@ -370,13 +719,38 @@ class NorthIndianFoodDetector:
                     'status': 'failed'
                 }
             
-            # Preprocess image
-            img_array = self.preprocess_image(image_path)
-            
-            # Make prediction
-            predictions = self.model.predict(img_array, verbose=0)
-            confidence_scores = predictions[0]
+            cascade_stage = None
+            if user_id is not None:
+                # Backbone once: the embedding serves the index and, on a miss, the head
+                meal_match, confidence_scores = self._match_meal(user_id, image_path, timer)
+                if meal_match is not None:
+                    return meal_match
+            elif self.stage1_model is not None:
+                confidence_scores, cascade_stage = self._predict_cascade(image_path, timer)
+            else:
+                # Preprocess image
+                img_array = self.preprocess_image(image_path, timer)
+                timer.record_shape('image', img_array.shape)
+                
+                # Make prediction
+                with timer.stage('predict'):
+                    predictions = self.predictor.predict(img_array)
+                confidence_scores = predictions[0]
             
+            return self._scores_to_result(confidence_scores, confidence_threshold, timer, cascade_stage)
+        
+        except Exception as e:
+            return {
+                'status': 'error',
+                'error': str(e)
+            }
+        finally:
+            timer.finish()
+    
+    def _scores_to_result(self, confidence_scores: np.ndarray, confidence_threshold: float,
+                          timer: RequestTimer, cascade_stage: int = None) -> Dict:
+        """Detection result for one image's class scores"""
+        with timer.stage('decode'):
             # Get predictions above threshold
             detected_foods = []
             for idx, confidence in enumerate(confidence_scores):
@@ -390,35 +764,168 @@ class NorthIndianFoodDetector:
             
             # Sort by confidence
             detected_foods.sort(key=lambda x: x['confidence'], reverse=True)
+        
+        if not detected_foods:
+            result = {
+                'status': 'no_food_detected',
+                'message': 'No food detected with sufficient confidence',
+                'top_prediction': self._get_top_prediction(confidence_scores)
+            }
+            if cascade_stage:
+                result['cascade_stage'] = cascade_stage
+            return result
+        
+        # Get top prediction with full details
+        with timer.stage('nutrition_join'):
+            top_food = detected_foods[0]['food']
+            top_confidence = detected_foods[0]['confidence']
             
-            if not detected_foods:
+            result = {
+                'status': 'success',
+                'detected_food': top_food,
+                'confidence': float(top_confidence),
+                'probability': f"{float(top_confidence) * 100:.2f}%",
+                'nutrition': self._nutrition(top_food),
+                'all_predictions': detected_foods[:5]  # Top 5 predictions
+            }
+            if cascade_stage:
+                result['cascade_stage'] = cascade_stage
+            return result
+    
+    def detect_foods(self, image_paths: List[str], confidence_threshold: float = 0.3,
+                     user_ids: List[Optional[str]] = None) -> List[Dict]:
+        """
+        Detect food in several images with batched forward passes
+        
+        Used by the job queue workers. Images without a user run through the
+        cascade (see predict_images). Images with a user (user_ids, needs the
+        meal index) are embedded in one backbone pass, matched against their
+        user's confirmed meals, and the misses share one head pass. Unreadable
+        images get an error result without failing the rest of the batch.
+        """
+        timer = RequestTimer('food_detector')
+        if self.meal_index is None or user_ids is None:
+            user_ids = [None] * len(image_paths)
+        try:
+            results: List[Dict] = [None] * len(image_paths)
+            plain, personal = [], []
+            for i, path in enumerate(image_paths):
+                try:
+                    image = self.decode_image(path, timer)
+                except Exception as e:
+                    results[i] = {'status': 'error', 'error': str(e)}
+                    continue
+                (plain if user_ids[i] is None else personal).append((i, image))
+            
+            if plain:
+                scores = self.predict_images([image for _, image in plain], timer)
+                for (i, _), image_scores in zip(plain, scores):
+                    results[i] = self._scores_to_result(image_scores, confidence_threshold, timer)
+            
+            if personal:
+                with timer.stage('preprocess'):
+                    batch = np.concatenate([self._image_to_batch(image) for _, image in personal])
+                timer.record_shape('images', batch.shape)
+                with timer.stage('embed'):
+                    embeddings = self.embedding_predictor.predict(batch)
+                misses, rows = [], []
+                for row, ((i, _), embedding) in enumerate(zip(personal, embeddings)):
+                    results[i] = self._lookup_meal(user_ids[i], embedding, timer)
+                    if results[i] is None:
+                        misses.append(i)
+                        rows.append(row)
+                if misses:
+                    with timer.stage('predict'):
+                        scores = self.head_predictor.predict(embeddings[rows])
+                    for i, image_scores in zip(misses, scores):
+                        results[i] = self._scores_to_result(image_scores, confidence_threshold, timer)
+            return results
+        finally:
+            timer.finish()
+    
+    def detect_plate(self, image_path: str, confidence_threshold: float = 0.5,
+                     grids: Tuple[int, ...] = None) -> Dict:
+        """
+        Detect every dish on a plate (e.g. a thali)
+        
+        Candidate regions (grid tiles minus empty ones) are classified in a
+        single batched predict; overlapping regions of the same class merge
+        into one item.
+        
+        Returns:
+            Dictionary with per-item nutrition and meal totals
+        """
+        timer = RequestTimer('food_detector')
+        try:
+            if not self.model:
+                return {
+                    'error': 'Model not loaded',
+                    'status': 'failed'
+                }
+            
+            # Tiles of the finest grid still need input_size pixels per side
+            finest = self.input_size * max(grids or self.PLATE_GRIDS)
+            img = open_reduced(image_path, (finest, finest), timer)
+            width, height = img.size
+            
+            with timer.stage('propose'):
+                regions = grid_regions(width, height, grids or self.PLATE_GRIDS)
+                scale = self.PLATE_SALIENCY_SIZE / max(width, height)
+                thumb = img.resize((max(1, int(width * scale)), max(1, int(height * scale))))
+                regions = salient_regions(regions, saliency_map(np.asarray(thumb)), scale)
+                if not regions:
+                    regions = [(0, 0, width, height)]
+            
+            with timer.stage('preprocess'):
+                batch = np.concatenate([
+                    self._image_to_batch(img.crop(box).resize((self.input_size, self.input_size)))
+                    for box in regions
+                ])
+            timer.record_shape('regions', batch.shape)
+            
+            # One forward pass for all regions
+            with timer.stage('predict'):
+                scores = self.predictor.predict(batch)
+            
+            with timer.stage('decode'):
+                top = scores.argmax(axis=1)
+                detections = [
+                    {
+                        'food': self.food_classes[idx],
+                        'confidence': float(scores[i, idx]),
+                        'box': box
+                    }
+                    for i, (idx, box) in enumerate(zip(top, regions))
+                    if scores[i, idx] >= confidence_threshold
+                ]
+                items = merge_detections(detections)
+            
+            if not items:
                 return {
                     'status': 'no_food_detected',
                     'message': 'No food detected with sufficient confidence',
-                    'top_prediction': self._get_top_prediction(confidence_scores)
+                    'regions_evaluated': len(regions)
                 }
             
-            # Get top prediction with full details
-            top_food = detected_foods[0]['food']
-            top_confidence = detected_foods[0]['confidence']
-            nutrition_info = self.NORTH_INDIAN_FOODS[top_food]
+            with timer.stage('nutrition_join'):
+                totals = {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0}
+                for item in items:
+                    item['nutrition'] = self._nutrition(item['food'])
+                    item['probability'] = f"{item['confidence'] * 100:.2f}%"
+                    item['box'] = [
+                        round(item['box'][0] / width, 4), round(item['box'][1] / height, 4),
+                        round(item['box'][2] / width, 4), round(item['box'][3] / height, 4)
+                    ]
+                    for key in totals:
+                        totals[key] += item['nutrition'][key]
             
             return {
                 'status': 'success',
-                'detected_food': top_food,
-                'confidence': float(top_confidence),
-                'probability': f"{float(top_confidence) * 100:.2f}%",
-                'nutrition': {
-                    'name': nutrition_info.get('name'),
-                    'calories': nutrition_info.get('calories'),
-                    'protein': nutrition_info.get('protein'),
-                    'carbs': nutrition_info.get('carbs'),
-                    'fat': nutrition_info.get('fat'),
-                    'fiber': nutrition_info.get('fiber'),
-                    'category': nutrition_info.get('category'),
-                    'region': nutrition_info.get('region')
-                },
-                'all_predictions': detected_foods[:5]  # Top 5 predictions
+                'mode': 'plate',
+                'items': items,
+                'item_count': len(items),
+                'totals': totals,
+                'regions_evaluated': len(regions)
             }
         
         except Exception as e:
@@ -426,6 +933,47 @@ class NorthIndianFoodDetector:
                 'status': 'error',
                 'error': str(e)
             }
+        finally:
+            timer.finish()
+    
+    def detect_stream(self, frame_paths: List[str], fps: float = 10.0, timestamps: List[float] = None,
+                      **options) -> Dict:
+        """
+        Detect food over a sequence of camera frames
+        
+        Near-identical frames are skipped, changed frames are classified in
+        batches within a per-second inference budget, and probabilities are
+        smoothed over a sliding window (options: see FrameStream).
+        
+        Returns:
+            Smoothed label with stability flag, frame counts and a per-frame timeline
+        """
+        try:
+            if not self.model:
+                return {
+                    'error': 'Model not loaded',
+                    'status': 'failed'
+                }
+            return FrameStream(self, **options).run(frame_paths, timestamps, fps)
+        except Exception as e:
+            return {
+                'status': 'error',
+                'error': str(e)
+            }
+    
+    def _nutrition(self, food: str) -> Dict:
+        """Nutrition block of a detection result"""
+        nutrition_info = self.NORTH_INDIAN_FOODS[food]
+        return {
+            'name': nutrition_info.get('name'),
+            'calories': nutrition_info.get('calories'),
+            'protein': nutrition_info.get('protein'),
+            'carbs': nutrition_info.get('carbs'),
+            'fat': nutrition_info.get('fat'),
+            'fiber': nutrition_info.get('fiber'),
+            'category': nutrition_info.get('category'),
+            'region': nutrition_info.get('region')
+        }
     
     def _get_top_prediction(self, predictions: np.ndarray) -> Dict:
         """Get top prediction details"""
@@ -477,30 +1025,184 @@ class NorthIndianFoodDetector:
 
 def main():
     """CLI interface for the food detector"""
+    if STARTUP.enabled:
+        sys.exit(profile_startup())
+    
     if len(sys.argv) < 2:
         print("Usage: python northIndianFoodDetector.py <image_path> [confidence_threshold]")
+        print("       python northIndianFoodDetector.py <image_path> [confidence_threshold] --user <user_id>")
+        print("       python northIndianFoodDetector.py --plate <image_path> [confidence_threshold]")
+        print("       python northIndianFoodDetector.py --stream <frames_dir|frame ...> [--fps 10] [--budget 6]")
+        print("       python northIndianFoodDetector.py --confirm-meal <user_id> <image_path> <label> [nutrition_json]")
+        print("       python northIndianFoodDetector.py evaluate <labelled_dir> [--batch-size 32] [--workers 4] "
+              "[--checkpoint <file>] [--report <file>]")
         print("       python northIndianFoodDetector.py --list-foods")
+        print("       python northIndianFoodDetector.py --serve-binary")
+        print("       python northIndianFoodDetector.py --stdin-ndjson [--threshold 0.3] [--chunk-size 8] < requests.ndjson")
+        print("       python northIndianFoodDetector.py --profile-startup [--startup-budget <budget.json>]")
         sys.exit(1)
     
-    command = sys.argv[1]
+    args = sys.argv[1:]
+    user_id = None
+    if '--user' in args:
+        i = args.index('--user')
+        user_id = args[i + 1]
+        del args[i:i + 2]
+    command = args[0]
+    
+    maybe_start_metrics_server()
     
     # Initialize detector
     backend_dir = Path(__file__).parent.parent
     ml_models_dir = backend_dir / 'ml_models'
     model_path = ml_models_dir / 'north_indian_food_model.h5'
+    cascade_path = ml_models_dir / 'north_indian_food_stage1.h5'
     
-    detector = NorthIndianFoodDetector(str(model_path) if model_path.exists() else None)
+    detector = NorthIndianFoodDetector(
+        str(model_path) if model_path.exists() else None,
+        cascade_model_path=str(cascade_path),
+        meal_index_dir=str(ml_models_dir / 'meal_index')
+    )
     
     if command == '--list-foods':
         result = detector.get_all_foods()
         print(json.dumps(result, indent=2))
+    elif command == 'evaluate':
+        run_evaluation(detector, args[1:])
+    elif command == '--plate':
+        confidence_threshold = float(args[2]) if len(args) > 2 else 0.5
+        result = detector.detect_plate(args[1], confidence_threshold)
+        print(json.dumps(result, indent=2))
+    elif command == '--serve-binary':
+        from binaryIpc import detector_handlers, serve
+        from workerMemory import MemoryWatchdog
+        detector.warm_up()
+        watchdog = MemoryWatchdog.from_env('food_detector', os.getpid())
+        sys.exit(serve(detector_handlers(detector), watchdog=watchdog))
+    elif command == '--stdin-ndjson':
+        run_stdin_ndjson(detector, args[1:])
+    elif command == '--stream':
+        result = run_stream(detector, args[1:])
+        print(json.dumps(result, indent=2))
+    elif command == '--confirm-meal':
+        nutrition = json.loads(args[4]) if len(args) > 4 else None
+        result = detector.confirm_meal(args[1], args[2], args[3], nutrition)
+        print(json.dumps(result, indent=2))
     else:
         image_path = command
-        confidence_threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+        confidence_threshold = float(args[1]) if len(args) > 1 else 0.3
         
-        result = detector.detect_food(image_path, confidence_threshold)
+        result = detector.detect_food(image_path, confidence_threshold, user_id)
         print(json.dumps(result, indent=2))
 
 
+def run_stream(detector: NorthIndianFoodDetector, argv: List[str]) -> Dict:
+    """--stream: frames given as files or one folder (sorted by name = capture order)"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='northIndianFoodDetector.py --stream')
+    parser.add_argument('frames', nargs='+')
+    parser.add_argument('--fps', type=float, default=10.0)
+    parser.add_argument('--budget', type=float, default=6.0, help='Max inferences per second of stream')
+    parser.add_argument('--window', type=int, default=5, help='Frames in the smoothing window')
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--diff-threshold', type=float, default=0.04)
+    parser.add_argument('--confidence-threshold', type=float, default=0.5)
+    options = parser.parse_args(argv)
+    
+    frames = options.frames
+    if len(frames) == 1 and Path(frames[0]).is_dir():
+        frames = sorted(str(p) for p in Path(frames[0]).iterdir()
+                        if p.suffix.lower() in ('.jpg', '.jpeg', '.png', '.webp'))
+    detector.warm_up()
+    return detector.detect_stream(
+        frames, fps=options.fps, budget_per_second=options.budget, window=options.window,
+        batch_size=options.batch_size, diff_threshold=options.diff_threshold,
+        confidence_threshold=options.confidence_threshold
+    )
+
+
+def run_stdin_ndjson(detector: NorthIndianFoodDetector, argv: List[str]) -> Dict:
+    """
+    --stdin-ndjson: one request per stdin line, either an image path string or
+    {"image_path": ..., "confidence_threshold": ...}; one result per stdout line
+    
+    Chunks run through detect_foods' batched forward pass (full classifier,
+    like the queue workers), grouped by threshold.
+    """
+    import argparse
+    from inferenceTuning import load_profile
+    from ndjsonStream import run_ndjson
+    
+    parser = argparse.ArgumentParser(prog='northIndianFoodDetector.py --stdin-ndjson')
+    parser.add_argument('--threshold', type=float, default=0.3, help='Default confidence threshold')
+    parser.add_argument('--chunk-size', type=int, help='Images per batch (default: tuned profile, else 8)')
+    options = parser.parse_args(argv)
+    
+    def parse(request) -> Tuple[str, float]:
+        if isinstance(request, str):
+            return request, options.threshold
+        if not isinstance(request, dict) or not request.get('image_path'):
+            raise ValueError('Request must be an image path or an object with image_path')
+        return request['image_path'], float(request.get('confidence_threshold', options.threshold))
+    
+    def process(requests: List) -> List[Dict]:
+        items = [parse(request) for request in requests]
+        by_threshold: Dict[float, List[int]] = {}
+        for i, (_, threshold) in enumerate(items):
+            by_threshold.setdefault(threshold, []).append(i)
+        results: List[Dict] = [None] * len(items)
+        for threshold, indices in by_threshold.items():
+            detections = detector.detect_foods([items[i][0] for i in indices], threshold)
+            for i, detection in zip(indices, detections):
+                results[i] = {'image_path': items[i][0], **detection}
+        return results
+    
+    detector.warm_up()
+    chunk_size = options.chunk_size or load_profile('food_detector').get('batch_size') or 8
+    return run_ndjson(process, chunk_size)
+
+
+def run_evaluation(detector: NorthIndianFoodDetector, argv: List[str]):
+    """evaluate: accuracy, per-class P/R, confusion and calibration over a labelled folder"""
+    import argparse
+    from foodEvaluation import evaluate
+    
+    parser = argparse.ArgumentParser(prog='northIndianFoodDetector.py evaluate')
+    parser.add_argument('labelled_dir', help='Folder laid out as <dir>/<food_class>/<image>')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=4, help='Preprocessing threads')
+    parser.add_argument('--checkpoint', help='Save progress here and resume from it')
+    parser.add_argument('--report', help='Write the JSON report here (default: stdout)')
+    options = parser.parse_args(argv)
+    
+    detector.warm_up()
+    report = evaluate(detector, options.labelled_dir, options.batch_size, options.workers, options.checkpoint)
+    print(f"✓ Accuracy {report['accuracy']} over {report['images']} images "
+          f"({report['images_per_second']} img/s)", file=sys.stderr)
+    
+    output = json.dumps(report, indent=2)
+    if options.report:
+        Path(options.report).write_text(output)
+    else:
+        print(output)
+
+
+def profile_startup():
+    """--profile-startup: load and warm the model, report the cold-start breakdown"""
+    backend_dir = Path(__file__).parent.parent
+    model_path = backend_dir / 'ml_models' / 'north_indian_food_model.h5'
+    cascade_path = backend_dir / 'ml_models' / 'north_indian_food_stage1.h5'
+    try:
+        detector = NorthIndianFoodDetector(
+            str(model_path) if model_path.exists() else None,
+            cascade_model_path=str(cascade_path)
+        )
+        detector.warm_up()
+    except Exception as e:
+        print(f"✗ Startup failed: {e}", file=sys.stderr)
+    return STARTUP.finish('food_detector')
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Plate Regions - Candidate regions for multi-item (thali) detection
+Grid tiles at a few scales, a cheap saliency filter to drop empty
+plate/table tiles, and merging of overlapping same-class detections
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+Box = Tuple[int, int, int, int]  # (left, top, right, bottom) in pixels
+
+
+def grid_regions(width: int, height: int, grids: Sequence[int] = (2, 3),
+                 overlap: float = 0.25) -> List[Box]:
+    """Square-ish tiles for each n x n grid, enlarged by `overlap` on every side"""
+    regions = []
+    for n in grids:
+        tile_w, tile_h = width / n, height / n
+        pad_w, pad_h = tile_w * overlap, tile_h * overlap
+        for row in range(n):
+            for col in range(n):
+                left = max(0, int(col * tile_w - pad_w))
+                top = max(0, int(row * tile_h - pad_h))
+                right = min(width, int((col + 1) * tile_w + pad_w))
+                bottom = min(height, int((row + 1) * tile_h + pad_h))
+                regions.append((left, top, right, bottom))
+    return regions
+
+
+def saliency_map(rgb: np.ndarray) -> np.ndarray:
+    """Colour distance from the image's dominant (median) colour, in [0, 1]"""
+    rgb = rgb.astype(np.float32)
+    background = np.median(rgb.reshape(-1, 3), axis=0)
+    distance = np.linalg.norm(rgb - background, axis=-1)
+    return distance / max(float(distance.max()), 1e-6)
+
+
+def salient_regions(regions: List[Box], saliency: np.ndarray, scale: float = 1.0,
+                    min_saliency: float = 0.15) -> List[Box]:
+    """Regions whose mean saliency suggests there is food in them"""
+    # Integral image: O(1) mean per region
+    integral = np.pad(saliency.cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+    kept = []
+    for box in regions:
+        l, t, r, b = (int(v * scale) for v in box)
+        r, b = max(r, l + 1), max(b, t + 1)
+        total = integral[b, r] - integral[t, r] - integral[b, l] + integral[t, l]
+        if total / ((r - l) * (b - t)) >= min_saliency:
+            kept.append(box)
+    return kept
+
+
+def overlaps(a: Box, b: Box) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def merge_detections(detections: List[Dict]) -> List[Dict]:
+    """
+    Union overlapping detections of the same class
+
+    Each detection is {'food', 'confidence', 'box'}; the merged item keeps
+    the highest confidence, the enclosing box and the number of regions
+    """
+    merged = []
+    for food in sorted({d['food'] for d in detections}):
+        pending = [d for d in detections if d['food'] == food]
+        while pending:
+            group = [pending.pop(0)]
+            grew = True
+            while grew:
+                grew = False
+                for d in list(pending):
+                    if any(overlaps(d['box'], g['box']) for g in group):
+                        group.append(d)
+                        pending.remove(d)
+                        grew = True
+            merged.append({
+                'food': food,
+                'confidence': max(g['confidence'] for g in group),
+                'box': (
+                    min(g['box'][0] for g in group), min(g['box'][1] for g in group),
+                    max(g['box'][2] for g in group), max(g['box'][3] for g in group)
+                ),
+                'regions': len(group)
+            })
+    return sorted(merged, key=lambda m: m['confidence'], reverse=True)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Progression Engine - Vectorized level and rank computation
+NumPy port of utils/level.js (generateLevelThresholds, getLevelFromXp,
+getLevelProgress) and utils/rank.js (getRankFromLevel, getRankForXp) for
+bulk work. The JS helpers rebuild the 340-level threshold table on every
+call and walk it level by level; here the tables for every prestige are
+built once and millions of total_xp values map to level, rank and
+next-level percent with np.searchsorted.
+
+Results match the JS helpers exactly (same float formula for the per-level
+XP, Math.round half-up for the percent).
+
+Usage:
+  python progressionEngine.py tables [--prestige 0]
+  python progressionEngine.py benchmark [--rows 1000000]
+"""
+
+import json
+import math
+import sys
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+
+import numpy as np
+
+# LEVEL_CONFIG in utils/level.js
+MAX_LEVEL = 340
+BASE_XP = 1000
+EXPONENT = 1.18
+PRESTIGE_MAX = 10
+
+# rankTiers in utils/rank.js: (rank, first level)
+RANK_TIERS = (
+    ('F', 1), ('E', 20), ('E+', 40), ('D', 60), ('D+', 80), ('C', 100), ('C+', 120), ('B', 140),
+    ('B+', 160), ('B++', 180), ('A', 200), ('A+', 220), ('S', 240), ('S+', 260), ('S++', 280),
+    ('SS', 300), ('SS+', 320), ('Monarch', 340)
+)
+RANK_NAMES = np.array([rank for rank, _ in RANK_TIERS], dtype=object)
+RANK_MIN_LEVELS = np.array([level for _, level in RANK_TIERS], dtype=np.int64)
+
+
+def level_xp(level: int, prestige: int = 0) -> int:
+    """calculateLevelXp: XP needed to go from level - 1 to level"""
+    if level <= 1:
+        return 0
+    return math.floor(BASE_XP * math.pow(level - 1, EXPONENT) * (1 + prestige * 0.5))
+
+
+@lru_cache(maxsize=64)
+def _thresholds(prestige: int) -> np.ndarray:
+    thresholds = np.empty(MAX_LEVEL, dtype=np.int64)
+    cumulative = 0
+    for level in range(1, MAX_LEVEL + 1):
+        thresholds[level - 1] = cumulative
+        cumulative += level_xp(level + 1, prestige)
+    thresholds.flags.writeable = False
+    return thresholds
+
+
+def level_thresholds(prestige: int = 0) -> np.ndarray:
+    """generateLevelThresholds: cumulative XP to reach each level (index 0 = level 1)"""
+    return _thresholds(int(prestige))
+
+
+# Every prestige the game allows, built once
+LEVEL_TABLE = np.stack([level_thresholds(p) for p in range(PRESTIGE_MAX + 1)])
+
+
+def _as_int64(values) -> np.ndarray:
+    """Number(x || 0) for arrays that may hold None/NaN"""
+    array = np.asarray(values)
+    if array.dtype == object:
+        array = np.array([0 if v is None else v for v in array.ravel()], dtype=np.float64).reshape(array.shape)
+    if array.dtype.kind == 'f':
+        array = np.nan_to_num(array, nan=0.0)
+    return array.astype(np.int64)
+
+
+def _per_prestige(xp: np.ndarray, prestige, fn) -> np.ndarray:
+    """Apply fn(xp_subset, thresholds) per distinct prestige (at most a handful)"""
+    if prestige is None or np.isscalar(prestige):
+        return fn(xp, level_thresholds(int(prestige or 0)))
+    prestige = _as_int64(prestige)
+    out = np.empty(xp.shape, dtype=np.int64)
+    for p in np.unique(prestige):
+        mask = prestige == p
+        out[mask] = fn(xp[mask], level_thresholds(int(p)))
+    return out
+
+
+def levels_for_xp(total_xp, prestige=0) -> np.ndarray:
+    """getLevelFromXp over an array (prestige: scalar or per-row array)"""
+    xp = _as_int64(total_xp)
+    levels = _per_prestige(xp, prestige, lambda x, t: np.searchsorted(t, x, side='right'))
+    return np.maximum(levels, 1)
+
+
+def ranks_for_levels(levels) -> np.ndarray:
+    """getRankFromLevel over an array, as rank indices into RANK_NAMES"""
+    levels = np.maximum(_as_int64(levels), 1)
+    return np.searchsorted(RANK_MIN_LEVELS, levels, side='right') - 1
+
+
+def ranks_for_xp(total_xp, prestige=0) -> np.ndarray:
+    """getRankForXp over an array, as rank names"""
+    return RANK_NAMES[ranks_for_levels(levels_for_xp(total_xp, prestige))]
+
+
+def next_level_percent(total_xp, levels, prestige=0) -> np.ndarray:
+    """getLevelProgress(...).percentToNext for precomputed levels"""
+    xp = _as_int64(total_xp)
+    levels = _as_int64(levels)
+
+    def percent(rows, table):
+        lvl = levels[rows]
+        current = table[lvl - 1]
+        following = table[np.minimum(lvl, MAX_LEVEL - 1)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = np.floor((xp[rows] - current) / (following - current) * 100 + 0.5)
+        return np.where(lvl >= MAX_LEVEL, 100, pct)
+
+    out = np.empty(xp.shape, dtype=np.float64)
+    if prestige is None or np.isscalar(prestige):
+        out[:] = percent(np.arange(len(xp)), level_thresholds(int(prestige or 0)))
+        return out
+    prestige = _as_int64(prestige)
+    for p in np.unique(prestige):
+        rows = np.flatnonzero(prestige == p)
+        out[rows] = percent(rows, level_thresholds(int(p)))
+    return out
+
+
+def progression(total_xp, prestige=0) -> Dict[str, np.ndarray]:
+    """Level, rank index, rank name and next-level percent for every row"""
+    levels = levels_for_xp(total_xp, prestige)
+    rank_index = ranks_for_levels(levels)
+    return {
+        'level': levels,
+        'rank_index': rank_index,
+        'rank': RANK_NAMES[rank_index],
+        'next_level_percent': next_level_percent(total_xp, levels, prestige)
+    }
+
+
+def rollover(total_xp, xp_today, prestige=0) -> Dict[str, np.ndarray]:
+    """
+    xpRollover.js performDailyRollover as one pass: total_xp += xp_today for
+    rows with xp_today > 0, plus old/new level and rank for change detection
+    """
+    total = _as_int64(total_xp)
+    today = np.maximum(_as_int64(xp_today), 0)
+    before = progression(total, prestige)
+    after = progression(total + today, prestige)
+    return {
+        'rolled': today > 0,
+        'total_xp': total + today,
+        'old_level': before['level'],
+        'old_rank_index': before['rank_index'],
+        'level': after['level'],
+        'rank_index': after['rank_index'],
+        'rank': after['rank'],
+        'next_level_percent': after['next_level_percent'],
+        'rank_changed': after['rank_index'] != before['rank_index']
+    }
+
+
+def rank_for_xp_per_call(total_xp: float, prestige: int = 0) -> str:
+    """Scalar port of getRankForXp as the JS runs it (table rebuilt per call), for benchmarks"""
+    thresholds = {}
+    cumulative = 0
+    for level in range(1, MAX_LEVEL + 1):
+        thresholds[level] = cumulative
+        cumulative += level_xp(level + 1, prestige)
+    user_level = 1
+    for level in sorted(thresholds):
+        if total_xp >= thresholds[level]:
+            user_level = level
+        else:
+            break
+    for rank, first_level in reversed(RANK_TIERS):
+        if user_level >= first_level:
+            return rank
+    return 'F'
+
+
+def benchmark(rows: int = 1_000_000, seed: int = 0) -> Dict:
+    rng = np.random.default_rng(seed)
+    xp = np.floor(rng.lognormal(13, 2.2, rows)).astype(np.int64)
+    prestige = rng.choice(PRESTIGE_MAX + 1, rows, p=[0.9] + [0.01] * PRESTIGE_MAX)
+
+    started = time.perf_counter()
+    result = progression(xp, prestige)
+    vectorized_s = time.perf_counter() - started
+
+    sample = min(rows, 2000)
+    started = time.perf_counter()
+    reference = [rank_for_xp_per_call(int(x), int(p)) for x, p in zip(xp[:sample], prestige[:sample])]
+    per_call_s = (time.perf_counter() - started) * rows / sample
+
+    assert list(result['rank'][:sample]) == reference
+    report = {
+        'rows': rows,
+        'vectorized_s': round(vectorized_s, 3),
+        'per_call_s_estimated': round(per_call_s, 1),
+        'speedup': round(per_call_s / vectorized_s, 1)
+    }
+    print(f"   {rows} rows: vectorized {report['vectorized_s']}s, per-call "
+          f"~{report['per_call_s_estimated']}s ({report['speedup']}x)", file=sys.stderr)
+    return report
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] not in ('tables', 'benchmark'):
+        print(__doc__[__doc__.index('Usage:'):].strip())
+        sys.exit(1)
+
+    def option(name: str, default: Optional[int]) -> Optional[int]:
+        return int(args[args.index(name) + 1]) if name in args else default
+
+    if args[0] == 'tables':
+        prestige = option('--prestige', 0)
+        thresholds = level_thresholds(prestige)
+        print(json.dumps({
+            'prestige': prestige,
+            'levels': {str(level): int(thresholds[level - 1]) for level in range(1, MAX_LEVEL + 1)},
+            'ranks': {rank: int(thresholds[first - 1]) for rank, first in RANK_TIERS}
+        }, indent=2))
+    else:
+        print(json.dumps(benchmark(option('--rows', 1_000_000)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+/**
+ * Shared Image Ring
+ * Writer side of services/sharedImageRing.py: upload handlers copy encoded
+ * image bytes into a slot of a memory-backed file (/dev/shm) and pass only
+ * the slot reference to the resident detector, instead of writing the upload
+ * to disk for Python to read back. Slots are handed out and reclaimed here;
+ * a generation stamp in each slot header lets the reader detect reuse.
+ * write() returns null when the image is larger than a slot or all slots are
+ * busy, and callers fall back to the file path.
+ */
+
+import fs from 'fs';
+import os from 'os';
+import path from 'path';
+
+const MAGIC = Buffer.from('FGRING01');
+const HEADER_SIZE = 64;
+const SLOT_HEADER_SIZE = 16;
+
+function defaultRingDir() {
+    return fs.existsSync('/dev/shm') ? '/dev/shm' : os.tmpdir();
+}
+
+class SharedImageRing {
+    /**
+     * @param {Object} options
+     * @param {number} options.slots - Concurrent images in flight
+     * @param {number} options.slotSize - Largest image (bytes) that fits a slot
+     */
+    constructor({ slots = 16, slotSize = 4 * 1024 * 1024, dir = defaultRingDir() } = {}) {
+        this.slots = slots;
+        this.slotSize = slotSize;
+        this.path = path.join(dir, `forge-image-ring-${process.pid}.bin`);
+        this.fd = null;
+        this.free = [];
+        this.generations = new Uint32Array(slots);
+        this.stats = { written: 0, overflowTooLarge: 0, overflowFull: 0 };
+    }
+
+    open() {
+        if (this.fd !== null) {
+            return;
+        }
+        this.fd = fs.openSync(this.path, 'w+');
+        fs.ftruncateSync(this.fd, HEADER_SIZE + this.slots * (SLOT_HEADER_SIZE + this.slotSize));
+        const header = Buffer.alloc(HEADER_SIZE);
+        MAGIC.copy(header, 0);
+        header.writeUInt32LE(this.slots, 8);
+        header.writeUInt32LE(this.slotSize, 12);
+        fs.writeSync(this.fd, header, 0, HEADER_SIZE, 0);
+        this.free = Array.from({ length: this.slots }, (_, i) => this.slots - 1 - i);
+        // The ring lives in shared memory; don't leave it behind
+        process.once('exit', () => this.close());
+    }
+
+    slotOffset(slot) {
+        return HEADER_SIZE + slot * (SLOT_HEADER_SIZE + this.slotSize);
+    }
+
+    /**
+     * Copy an image into a free slot
+     * @param {Buffer} buffer - Encoded image bytes
+     * @returns {Object|null} - { slot, generation, length }, or null to fall back to a file
+     */
+    write(buffer) {
+        this.open();
+        if (buffer.length > this.slotSize) {
+            this.stats.overflowTooLarge++;
+            return null;
+        }
+        const slot = this.free.pop();
+        if (slot === undefined) {
+            this.stats.overflowFull++;
+            return null;
+        }
+        // Generation 0 never matches, so an unwritten slot reads as stale
+        const generation = (this.generations[slot] % 0xffffffff) + 1;
+        this.generations[slot] = generation;
+
+        const offset = this.slotOffset(slot);
+        fs.writeSync(this.fd, buffer, 0, buffer.length, offset + SLOT_HEADER_SIZE);
+        const stamp = Buffer.alloc(8);
+        stamp.writeUInt32LE(generation, 0);
+        stamp.writeUInt32LE(buffer.length, 4);
+        fs.writeSync(this.fd, stamp, 0, 8, offset);
+        this.stats.written++;
+        return { slot, generation, length: buffer.length };
+    }
+
+    /** Reclaim a slot once the detector has answered for it */
+    release(handle) {
+        if (handle && this.generations[handle.slot] === handle.generation && !this.free.includes(handle.slot)) {
+            this.free.push(handle.slot);
+        }
+    }
+
+    inFlight() {
+        return this.fd === null ? 0 : this.slots - this.free.length;
+    }
+
+    close() {
+        if (this.fd === null) {
+            return;
+        }
+        try {
+            fs.closeSync(this.fd);
+            fs.unlinkSync(this.path);
+        } catch (error) {
+            // Already gone
+        }
+        this.fd = null;
+        this.free = [];
+    }
+}
+
+export default SharedImageRing;
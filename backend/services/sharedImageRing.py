@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Shared Image Ring - Memory-mapped slots for handing uploads to the detector
+The Node upload path writes encoded image bytes into a slot of a file on
+/dev/shm (tmpfs, so nothing touches disk) and sends only (slot, generation,
+length) to the resident detector, which maps the same file and decodes
+straight from a memoryview of the slot. Node owns slot allocation and
+reclaims a slot once the detector has answered; the generation stamp lets
+the reader notice a slot that was reused under it. Images that do not fit
+(too large, or every slot busy) fall back to the file path.
+Node side: sharedImageRing.js.
+
+Layout: 64-byte header '<8sII' (magic, slot count, slot size), then per slot
+a 16-byte header '<II' (generation, length) followed by slot_size bytes.
+
+Usage:
+  python sharedImageRing.py benchmark <image> [<image> ...] [--repeat 20]
+"""
+
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+MAGIC = b'FGRING01'
+HEADER = struct.Struct('<8sII')
+HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct('<II')
+SLOT_HEADER_SIZE = 16
+
+
+def default_ring_dir() -> str:
+    """/dev/shm where available (memory-backed), else the temp directory"""
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+class StaleSlotError(ValueError):
+    """The slot was reclaimed and rewritten (or never written) for this generation"""
+
+
+class SlotFile(io.RawIOBase):
+    """Seekable read-only file over a memoryview, so PIL decodes without a bytes copy"""
+
+    def __init__(self, view: memoryview):
+        super().__init__()
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self._view) - self._pos)
+        if size <= 0:
+            return 0
+        buffer[:size] = self._view[self._pos:self._pos + size]
+        self._pos += size
+        return size
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._pos + size)
+        data = self._view[self._pos:end].tobytes()
+        self._pos = max(self._pos, end)
+        return data
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        # Drop the slice so the ring's mmap can be closed later
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+class ImageRing:
+    """Reader over a ring file created by the Node side (or ImageRing.create)"""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.slot_count, self.slot_size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f'{self.path} is not an image ring')
+        self._view = memoryview(self._map)
+
+    @staticmethod
+    def slot_offset(slot: int, slot_size: int) -> int:
+        return HEADER_SIZE + slot * (SLOT_HEADER_SIZE + slot_size)
+
+    def slot_view(self, slot: int, generation: int, length: int) -> memoryview:
+        """Zero-copy view of one written slot; StaleSlotError if it was reused"""
+        if not 0 <= slot < self.slot_count or length > self.slot_size:
+            raise ValueError(f'Slot {slot} ({length} bytes) outside ring')
+        offset = self.slot_offset(slot, self.slot_size)
+        stamped = SLOT_HEADER.unpack_from(self._map, offset)
+        if stamped != (generation, length):
+            raise StaleSlotError(f'Slot {slot} holds generation {stamped[0]}, expected {generation}')
+        start = offset + SLOT_HEADER_SIZE
+        return self._view[start:start + length]
+
+    def still_valid(self, slot: int, generation: int) -> bool:
+        """True while the slot still carries this generation (check after decoding)"""
+        offset = self.slot_offset(slot, self.slot_size)
+        return SLOT_HEADER.unpack_from(self._map, offset)[0] == generation
+
+    def open(self, slot: int, generation: int, length: int) -> SlotFile:
+        return SlotFile(self.slot_view(slot, generation, length))
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+
+    @staticmethod
+    def create(path: str, slots: int, slot_size: int):
+        """Empty ring file (the Node writer normally does this)"""
+        with open(path, 'wb') as f:
+            f.truncate(HEADER_SIZE + slots * (SLOT_HEADER_SIZE + slot_size))
+            f.write(HEADER.pack(MAGIC, slots, slot_size))
+
+    @staticmethod
+    def write_slot(path: str, slot: int, generation: int, data: bytes):
+        """Writer side in Python, for benchmarks: data first, then the header stamp"""
+        with open(path, 'r+b') as f:
+            _, _, slot_size = HEADER.unpack(f.read(HEADER.size))
+            offset = ImageRing.slot_offset(slot, slot_size)
+            f.seek(offset + SLOT_HEADER_SIZE)
+            f.write(data)
+            f.seek(offset)
+            f.write(SLOT_HEADER.pack(generation, len(data)))
+
+
+def benchmark(paths, repeat: int = 20, upload_dir: str = None) -> Dict:
+    """Upload handoff per image: upload file write + reopen versus ring slot write + mapped decode"""
+    from PIL import Image
+
+    images = [Path(p).read_bytes() for p in paths]
+    slot_size = max(len(data) for data in images)
+    ring_path = os.path.join(default_ring_dir(), f'image-ring-bench-{os.getpid()}.bin')
+    ImageRing.create(ring_path, 4, slot_size)
+    # Same filesystem the multer/camera uploads live on
+    upload_dir = tempfile.mkdtemp(dir=upload_dir or Path(__file__).resolve().parent.parent / 'uploads')
+    ring = ImageRing(ring_path)
+
+    def via_file(i: int, data: bytes):
+        path = os.path.join(upload_dir, f'upload-{i}.jpg')
+        with open(path, 'wb') as f:
+            f.write(data)
+        with Image.open(path) as img:
+            img.draft('RGB', (224, 224))
+            img.load()
+        os.unlink(path)
+
+    def via_ring(i: int, data: bytes):
+        ImageRing.write_slot(ring_path, i % 4, i + 1, data)
+        with ring.open(i % 4, i + 1, len(data)) as slot, Image.open(slot) as img:
+            img.draft('RGB', (224, 224))
+            img.load()
+
+    results = {}
+    try:
+        for name, handoff in (('file', via_file), ('ring', via_ring)):
+            started = time.perf_counter()
+            for r in range(repeat):
+                for i, data in enumerate(images):
+                    handoff(r * len(images) + i, data)
+            elapsed = time.perf_counter() - started
+            results[name] = {'ms_per_image': round(elapsed * 1000 / (repeat * len(images)), 3)}
+            print(f"   {name}: {results[name]['ms_per_image']}ms/image", file=sys.stderr)
+    finally:
+        ring.close()
+        os.unlink(ring_path)
+        os.rmdir(upload_dir)
+    return {'images': len(images), 'repeat': repeat, 'ring_dir': default_ring_dir(), **results}
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] != 'benchmark':
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(1)
+    repeat = 20
+    if '--repeat' in args:
+        i = args.index('--repeat')
+        repeat = int(args[i + 1])
+        del args[i:i + 2]
+    print(json.dumps(benchmark(args[1:], repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
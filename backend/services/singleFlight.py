@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Single-Flight - Request coalescing for the inference services
+Concurrent calls with the same key share one in-flight computation;
+every caller receives (a copy of) the same result
+"""
+
+import copy
+import hashlib
+import threading
+from typing import Callable, Dict, Hashable
+
+from mlMetrics import REGISTRY
+
+SINGLE_FLIGHT_CALLS = REGISTRY.counter(
+    'ml_singleflight_calls_total',
+    'Inference calls by role: leader (computed) or coalesced (computation saved)',
+    ('service', 'role')
+)
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key"""
+
+    def __init__(self, service: str):
+        self.service = service
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        """Run fn once per key at a time; concurrent callers wait for that run"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            SINGLE_FLIGHT_CALLS.inc(self.service, 'coalesced')
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        SINGLE_FLIGHT_CALLS.inc(self.service, 'leader')
+        try:
+            call.result = fn(*args, **kwargs)
+            # Every caller gets its own copy so nobody mutates a shared result
+            return copy.deepcopy(call.result)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict:
+        leaders = SINGLE_FLIGHT_CALLS.value(self.service, 'leader')
+        coalesced = SINGLE_FLIGHT_CALLS.value(self.service, 'coalesced')
+        return {
+            'computations': int(leaders),
+            'coalesced': int(coalesced),
+            'saved_ratio': round(coalesced / (leaders + coalesced), 4) if leaders + coalesced else 0.0,
+            'in_flight': self.in_flight()
+        }
+
+
+def content_hash(data: bytes) -> str:
+    """Stable digest used as a coalescing / dedup key"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """content_hash of a file, read in chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Startup Profiler - Cold-start breakdown for the Python ML services
+Measures the time and memory added by each import, model load, model
+build/compile and the first (graph-tracing) predict, and checks the
+totals against a configured startup budget
+"""
+
+import builtins
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROFILE_FLAG = '--profile-startup'
+BUDGET_FLAG = '--startup-budget'
+
+# Default budget file, keyed by service name
+DEFAULT_BUDGET_PATH = Path(__file__).resolve().parent.parent / 'config' / 'startup_budget.json'
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Not Linux: fall back to the peak, which is the best we have
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class StartupProfiler:
+    """Records import and startup phases; a disabled profiler is a no-op"""
+
+    def __init__(self, enabled: bool = False, budget_path: Optional[str] = None):
+        self.enabled = enabled
+        self.budget_path = Path(budget_path) if budget_path else DEFAULT_BUDGET_PATH
+        self.imports: List[Dict] = []
+        self.phases: List[Dict] = []
+        self._import_stack: List[Dict] = []
+        self._current_phase: Optional[str] = None
+        self._original_import = None
+        self.start_time = time.perf_counter()
+        self.start_rss = current_rss_mb() if enabled else 0.0
+
+    @classmethod
+    def from_argv(cls, argv: List[str]) -> 'StartupProfiler':
+        """Build from CLI flags, removing them so positional parsing is unaffected"""
+        if PROFILE_FLAG not in argv:
+            return cls(enabled=False)
+
+        argv.remove(PROFILE_FLAG)
+        budget_path = None
+        if BUDGET_FLAG in argv:
+            idx = argv.index(BUDGET_FLAG)
+            budget_path = argv[idx + 1] if idx + 1 < len(argv) else None
+            del argv[idx:idx + 2]
+
+        profiler = cls(enabled=True, budget_path=budget_path)
+        profiler.install_import_hook()
+        return profiler
+
+    def install_import_hook(self):
+        """Wrap __import__ to time every module imported from now on"""
+        if self._original_import is not None:
+            return
+        self._original_import = builtins.__import__
+        original_import = self._original_import
+        profiler = self
+
+        def profiled_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level != 0 or name in sys.modules:
+                return original_import(name, globals, locals, fromlist, level)
+
+            record = {
+                'module': name,
+                'depth': len(profiler._import_stack),
+                'phase': profiler._current_phase,
+                'children_ms': 0.0
+            }
+            profiler._import_stack.append(record)
+            start = time.perf_counter()
+            start_rss = current_rss_mb()
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                profiler._import_stack.pop()
+                if profiler._import_stack:
+                    profiler._import_stack[-1]['children_ms'] += elapsed_ms
+                record['cumulative_ms'] = round(elapsed_ms, 3)
+                record['self_ms'] = round(elapsed_ms - record.pop('children_ms'), 3)
+                record['rss_delta_mb'] = round(current_rss_mb() - start_rss, 2)
+                profiler.imports.append(record)
+
+        builtins.__import__ = profiled_import
+
+    def uninstall_import_hook(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    @contextmanager
+    def phase(self, name: str, kind: str = 'startup'):
+        """Time a startup phase (model load, build, compile, first predict)"""
+        if not self.enabled:
+            yield
+            return
+
+        previous_phase = self._current_phase
+        self._current_phase = name
+        start = time.perf_counter()
+        start_rss = current_rss_mb()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            self._current_phase = previous_phase
+            entry = {
+                'phase': name,
+                'kind': kind,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                'rss_delta_mb': round(current_rss_mb() - start_rss, 2)
+            }
+            if error:
+                entry['error'] = error
+            self.phases.append(entry)
+
+    def load_budget(self, service: str) -> Dict:
+        """Budget for one service; empty when no budget is configured"""
+        if not self.budget_path.exists():
+            return {}
+        with open(self.budget_path) as f:
+            return json.load(f).get(service, {})
+
+    def report(self, service: str) -> Dict:
+        total_ms = (time.perf_counter() - self.start_time) * 1000
+        top_level_imports = [r for r in self.imports if r['depth'] == 0]
+        imports_ms = sum(r['cumulative_ms'] for r in top_level_imports if r['phase'] is None)
+
+        report = {
+            'service': service,
+            'total_ms': round(total_ms, 3),
+            'imports_ms': round(imports_ms, 3),
+            'rss_start_mb': round(self.start_rss, 2),
+            'rss_end_mb': round(current_rss_mb(), 2),
+            'peak_rss_mb': round(peak_rss_mb(), 2),
+            'phases': self.phases,
+            'top_level_imports': sorted(top_level_imports, key=lambda r: -r['cumulative_ms']),
+            'slowest_imports': sorted(self.imports, key=lambda r: -r['self_ms'])[:25],
+            'modules_imported': len(self.imports)
+        }
+
+        budget = self.load_budget(service)
+        report['budget'] = budget
+        report['violations'] = self._check_budget(report, budget)
+        report['within_budget'] = not report['violations']
+        return report
+
+    @staticmethod
+    def _check_budget(report: Dict, budget: Dict) -> List[str]:
+        violations = []
+        for key, actual_key in (('total_ms', 'total_ms'), ('imports_ms', 'imports_ms'),
+                                ('peak_rss_mb', 'peak_rss_mb')):
+            limit = budget.get(key)
+            if limit is not None and report[actual_key] > limit:
+                violations.append(f"{key} {report[actual_key]:.1f} > budget {limit}")
+
+        phase_limits = budget.get('phases', {})
+        for entry in report['phases']:
+            limit = phase_limits.get(entry['phase'])
+            if limit is not None and entry['duration_ms'] > limit:
+                violations.append(f"phase '{entry['phase']}' {entry['duration_ms']:.1f}ms > budget {limit}ms")
+            if 'error' in entry:
+                violations.append(f"phase '{entry['phase']}' failed: {entry['error']}")
+        return violations
+
+    def finish(self, service: str) -> int:
+        """Print the JSON report; returns the process exit code"""
+        self.uninstall_import_hook()
+        report = self.report(service)
+        print(json.dumps(report, indent=2))
+        if report['violations']:
+            for violation in report['violations']:
+                print(f"✗ Startup budget exceeded: {violation}", file=sys.stderr)
+            return 1
+        print(f"✓ Startup within budget ({report['total_ms']:.0f}ms)", file=sys.stderr)
+        return 0
+
+
+# Activated by --profile-startup before the heavy imports of the service scripts
+STARTUP = StartupProfiler.from_argv(sys.argv)
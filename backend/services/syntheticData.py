@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data - Realistic fake users and food photos for load tests,
+benchmarks and evaluation runs
+User fields follow the defaults and ranges of MLTaskGenerator._prepare_features
+"""
+
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+GENDERS = ['M', 'F', 'Other']
+GENDER_WEIGHTS = [0.52, 0.45, 0.03]
+FITNESS_LEVELS = ['Beginner', 'Intermediate', 'Advanced', 'Expert']
+FITNESS_WEIGHTS = [0.35, 0.40, 0.18, 0.07]
+ACTIVITY_LEVELS = ['Sedentary', 'Light', 'Moderate', 'Very Active']
+ACTIVITY_WEIGHTS = [0.20, 0.35, 0.30, 0.15]
+RANKS = ['E', 'D', 'C', 'B', 'A', 'S']
+RANK_WEIGHTS = [0.25, 0.25, 0.22, 0.15, 0.09, 0.04]
+GOALS = ['strength', 'cardio', 'flexibility', 'health', 'balanced']
+GOAL_WEIGHTS = [0.22, 0.22, 0.12, 0.14, 0.30]
+STAT_NAMES = ['strength', 'constitution', 'dexterity', 'wisdom', 'charisma']
+
+# Phone camera / upload resolutions seen in practice
+IMAGE_SIZES = [(4032, 3024), (3024, 4032), (1920, 1440), (1280, 960), (1080, 1080), (640, 480)]
+
+
+def synthetic_user(rng: np.random.Generator, user_id: str) -> Dict:
+    """One user profile with correlated, realistically distributed fields"""
+    gender = rng.choice(GENDERS, p=GENDER_WEIGHTS)
+    fitness_level = rng.choice(FITNESS_LEVELS, p=FITNESS_WEIGHTS)
+    fitness_idx = FITNESS_LEVELS.index(fitness_level)
+
+    age = float(np.clip(rng.normal(30, 8), 16, 75))
+    height = float(np.clip(rng.normal(176 if gender == 'M' else 163, 7), 140, 210))
+    bmi = float(np.clip(rng.normal(24, 3.5), 16, 42))
+    weight = bmi * (height / 100) ** 2
+
+    # Stats default to 100 and grow with fitness level
+    stats = {
+        name: float(np.clip(rng.normal(80 + 25 * fitness_idx, 20), 10, 300))
+        for name in STAT_NAMES
+    }
+
+    total_xp = float(np.round(rng.lognormal(6.5 + 0.6 * fitness_idx, 1.0)))
+    level = int(max(1, np.floor(np.sqrt(total_xp / 100)) + 1))
+
+    user = {
+        'user_id': user_id,
+        'age': round(age),
+        'height': round(height, 1),
+        'weight': round(weight, 1),
+        'gender': str(gender),
+        'total_xp': total_xp,
+        'level': level,
+        'weekly_xp': float(np.round(rng.gamma(2.0, 60 + 40 * fitness_idx))),
+        'bmi': round(bmi, 1),
+        'sleep_quality': float(np.clip(rng.normal(70, 12), 0, 100)),
+        'stress_level': float(np.clip(rng.normal(50, 18), 0, 100)),
+        'fitness_level': str(fitness_level),
+        'activity_level': str(rng.choice(ACTIVITY_LEVELS, p=ACTIVITY_WEIGHTS)),
+        'rank': str(rng.choice(RANKS, p=RANK_WEIGHTS)),
+        'primary_goal': str(rng.choice(GOALS, p=GOAL_WEIGHTS)),
+    }
+    user.update({name: round(value, 1) for name, value in stats.items()})
+    return user
+
+
+def synthetic_users(count: int, seed: int = 0) -> List[Dict]:
+    """A reproducible population of user profiles"""
+    rng = np.random.default_rng(seed)
+    return [synthetic_user(rng, f'synthetic-{seed}-{i}') for i in range(count)]
+
+
+# Main stat trained by each task category
+CATEGORY_STATS = {
+    'strength': 'strength', 'cardio': 'constitution', 'flexibility': 'dexterity',
+    'health': 'wisdom', 'hiit': 'constitution'
+}
+GOAL_CATEGORIES = {
+    'strength': ['strength', 'hiit'], 'cardio': ['cardio', 'hiit'], 'flexibility': ['flexibility'],
+    'health': ['health', 'flexibility'], 'balanced': ['strength', 'cardio', 'flexibility', 'health', 'hiit']
+}
+
+
+def synthetic_task_outcome(rng: np.random.Generator, user: Dict) -> Dict:
+    """A plausible completed task for a user (training target for the task network)"""
+    category = str(rng.choice(GOAL_CATEGORIES[user['primary_goal']]))
+    level = FITNESS_LEVELS.index(user['fitness_level'])
+    difficulty_idx = int(np.clip(np.round(level * 2 / 3 + rng.normal(0, 0.5)), 0, 2))
+    difficulty = ['easy', 'medium', 'hard'][difficulty_idx]
+
+    xp = float(np.clip(rng.normal([30, 70, 130][difficulty_idx], 12), 10, 200))
+    duration = float(np.clip(rng.normal([20, 35, 55][difficulty_idx] + (10 if category == 'cardio' else 0), 6), 10, 120))
+    rewards = {name: 1 for name in STAT_NAMES}
+    rewards[CATEGORY_STATS[category]] = 1 + difficulty_idx
+    if rng.random() < 0.3:
+        rewards[str(rng.choice(STAT_NAMES))] = int(rng.integers(1, 3))
+
+    return {
+        'category': category,
+        'difficulty': difficulty,
+        'xp': round(xp),
+        'duration': round(duration),
+        'stat_rewards': rewards
+    }
+
+
+def synthetic_task_log(count: int, seed: int = 0):
+    """Stream of {'user', 'task'} records shaped like logged task outcomes"""
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        user = synthetic_user(rng, f'synthetic-{seed}-{i}')
+        yield {'user': user, 'task': synthetic_task_outcome(rng, user)}
+
+
+def synthetic_food_image(rng: np.random.Generator, size=(1280, 960), class_idx: Optional[int] = None):
+    """A plate-on-table style photo; class_idx tints the food so classes are separable"""
+    from PIL import Image, ImageDraw, ImageFilter
+
+    width, height = size
+    table = tuple(int(c) for c in rng.integers(60, 200, 3))
+    img = Image.new('RGB', size, table)
+    draw = ImageDraw.Draw(img)
+
+    # Plate
+    cx, cy = width / 2 + rng.normal(0, width * 0.05), height / 2 + rng.normal(0, height * 0.05)
+    radius = min(width, height) * rng.uniform(0.32, 0.45)
+    draw.ellipse([cx - radius, cy - radius, cx + radius, cy + radius], fill=(235, 235, 230))
+
+    # Food blobs
+    if class_idx is not None:
+        base = np.array([(class_idx * 53) % 256, (class_idx * 97) % 256, (class_idx * 151) % 256])
+    else:
+        base = rng.integers(0, 256, 3)
+    for _ in range(int(rng.integers(3, 9))):
+        color = tuple(int(c) for c in np.clip(base + rng.normal(0, 20, 3), 0, 255))
+        bx = cx + rng.normal(0, radius * 0.35)
+        by = cy + rng.normal(0, radius * 0.35)
+        br = radius * rng.uniform(0.15, 0.4)
+        draw.ellipse([bx - br, by - br * rng.uniform(0.6, 1.0), bx + br, by + br], fill=color)
+
+    return img.filter(ImageFilter.GaussianBlur(radius=max(1, min(width, height) // 400)))
+
+
+def synthetic_image_corpus(out_dir: str, count: int, seed: int = 0,
+                           sizes: Optional[List] = None, quality: int = 88) -> List[str]:
+    """Write `count` JPEG food photos of mixed phone resolutions"""
+    rng = np.random.default_rng(seed)
+    sizes = sizes or IMAGE_SIZES
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    for i in range(count):
+        size = tuple(sizes[int(rng.integers(0, len(sizes)))])
+        path = out / f'synthetic-{seed}-{i:05d}.jpg'
+        if not path.exists():
+            synthetic_food_image(rng, size).save(path, 'JPEG', quality=quality)
+        paths.append(str(path))
+    return paths
+
+
+def synthetic_labelled_corpus(out_dir: str, classes: List[str], per_class: int,
+                              seed: int = 0, size=(640, 480)) -> Dict[str, List[str]]:
+    """Write a <out_dir>/<class>/<image>.jpg tree for evaluation and calibration tools"""
+    rng = np.random.default_rng(seed)
+    out = Path(out_dir)
+    corpus = {}
+    for class_idx, food in enumerate(classes):
+        class_dir = out / food
+        class_dir.mkdir(parents=True, exist_ok=True)
+        corpus[food] = []
+        for i in range(per_class):
+            path = class_dir / f'{food}-{i:04d}.jpg'
+            if not path.exists():
+                synthetic_food_image(rng, size, class_idx).save(path, 'JPEG', quality=88)
+            corpus[food].append(str(path))
+    return corpus
+
+
+def main():
+    """CLI: synthetic users as JSON, or an image corpus written to a directory"""
+    if len(sys.argv) < 3:
+        print("Usage: python syntheticData.py users <count> [seed]")
+        print("       python syntheticData.py images <out_dir> <count> [seed]")
+        print("       python syntheticData.py tasks <count> [seed]   (JSON lines)")
+        sys.exit(1)
+
+    if sys.argv[1] == 'users':
+        seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+        print(json.dumps(synthetic_users(int(sys.argv[2]), seed), indent=2))
+    elif sys.argv[1] == 'tasks':
+        seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+        for record in synthetic_task_log(int(sys.argv[2]), seed):
+            print(json.dumps(record))
+    elif sys.argv[1] == 'images':
+        seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+        paths = synthetic_image_corpus(sys.argv[2], int(sys.argv[3]), seed)
+        print(f"✓ Wrote {len(paths)} images to {sys.argv[2]}", file=sys.stderr)
+    else:
+        print(f"Unknown command: {sys.argv[1]}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
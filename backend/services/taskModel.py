@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Task Model - Feature preprocessor, network definition and target encoding
+for the task generation network (TaskGenerationNN: 19 features, 5 heads)
+Shared by MLTaskGenerator (inference) and train-task-model.py (training)
+"""
+
+import pickle
+import sys
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+FEATURE_NAMES = [
+    'age', 'height', 'weight', 'strength', 'constitution', 'dexterity', 'wisdom',
+    'charisma', 'total_xp', 'level', 'weekly_xp', 'bmi', 'sleep_quality',
+    'stress_level', 'gender', 'fitness_level', 'activity_level', 'rank', 'primary_goal'
+]
+NUM_FEATURES = len(FEATURE_NAMES)
+
+STAT_NAMES = ['strength', 'constitution', 'dexterity', 'wisdom', 'charisma']
+CATEGORY_CLASSES = ['strength', 'cardio', 'flexibility', 'health', 'hiit']
+DIFFICULTY_CLASSES = ['easy', 'medium', 'hard']
+OUTPUT_NAMES = ['category_output', 'difficulty_output', 'xp_output', 'duration_output', 'stats_output']
+
+# Head ranges (see MLTaskGenerator._denormalize_xp / _denormalize_duration)
+XP_RANGE = (10.0, 200.0)
+DURATION_RANGE = (10.0, 120.0)
+STAT_SCALE = 3.0
+
+
+class FeaturePreprocessor:
+    """StandardScaler over the 19 raw features; can be fitted incrementally"""
+
+    def __init__(self):
+        from sklearn.preprocessing import StandardScaler
+        self.scaler = StandardScaler()
+        self.feature_names = list(FEATURE_NAMES)
+        self.is_fitted = False
+
+    def partial_fit(self, features: np.ndarray) -> 'FeaturePreprocessor':
+        self.scaler.partial_fit(np.asarray(features, dtype=np.float64))
+        self.is_fitted = True
+        return self
+
+    def fit(self, features: np.ndarray) -> 'FeaturePreprocessor':
+        self.scaler.fit(np.asarray(features, dtype=np.float64))
+        self.is_fitted = True
+        return self
+
+    def transform(self, features: np.ndarray) -> np.ndarray:
+        return self.scaler.transform(features).astype(np.float32)
+
+
+class _PreprocessorUnpickler(pickle.Unpickler):
+    """Maps the original training script's __main__.FeaturePreprocessor to this module"""
+
+    def find_class(self, module, name):
+        if name == 'FeaturePreprocessor' and module in ('__main__', 'taskModel'):
+            return FeaturePreprocessor
+        return super().find_class(module, name)
+
+
+def load_preprocessor(path) -> FeaturePreprocessor:
+    with open(path, 'rb') as f:
+        return _PreprocessorUnpickler(f).load()
+
+
+def build_task_model(num_features: int = NUM_FEATURES, width: float = 1.0, learning_rate: float = 5e-4):
+    """
+    Shared trunk (256-128-64, batch norm + dropout) with one tower per head
+
+    width scales every hidden layer; 1.0 is the production network
+    """
+    import tensorflow as tf
+    from tensorflow.keras import layers
+
+    def units(n):
+        return max(4, int(round(n * width)))
+
+    inputs = tf.keras.Input(shape=(num_features,), name='user_features')
+    x = inputs
+    for i, (size, rate) in enumerate([(256, 0.2), (128, 0.2), (64, 0.15)], start=1):
+        x = layers.Dense(units(size), activation='relu', name=f'shared_dense_{size}')(x)
+        x = layers.BatchNormalization(name=f'shared_bn_{i}')(x)
+        x = layers.Dropout(rate, name=f'shared_dropout_{i}')(x)
+    shared = x
+
+    s = layers.Dense(units(64), activation='relu', name='stats_dense_1')(shared)
+    s = layers.Dropout(0.15, name='stats_dropout_1')(s)
+    s = layers.Dense(units(48), activation='relu', name='stats_dense_2')(s)
+    s = layers.Dropout(0.15, name='stats_dropout_2')(s)
+    s = layers.Dense(units(32), activation='relu', name='stats_dense_3')(s)
+    s = layers.Dropout(0.1, name='stats_dropout_3')(s)
+    s = layers.Dense(units(24), activation='relu', name='stats_dense_4')(s)
+    s = layers.Dense(units(16), activation='relu', name='stats_dense_5')(s)
+    stats = layers.Dense(len(STAT_NAMES), activation='sigmoid', name='stats_output')(s)
+
+    def tower(name, sizes, out_units, activation):
+        t = shared
+        for i, size in enumerate(sizes, start=1):
+            t = layers.Dense(units(size), activation='relu', name=f'{name}_dense_{i}')(t)
+        return layers.Dense(out_units, activation=activation, name=f'{name}_output')(t)
+
+    category = tower('category', [32, 16], len(CATEGORY_CLASSES), 'softmax')
+    difficulty = tower('difficulty', [32, 16], len(DIFFICULTY_CLASSES), 'softmax')
+    xp = tower('xp', [32, 16, 8], 1, 'sigmoid')
+    duration = tower('duration', [32, 16, 8], 1, 'sigmoid')
+
+    model = tf.keras.Model(inputs, [category, difficulty, xp, duration, stats], name='TaskGenerationNN')
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss={
+            'category_output': 'categorical_crossentropy',
+            'difficulty_output': 'categorical_crossentropy',
+            'xp_output': 'mse',
+            'duration_output': 'mse',
+            'stats_output': 'mse'
+        }
+    )
+    return model
+
+
+def build_student_model(num_features: int = NUM_FEATURES, hidden: Tuple[int, ...] = (32, 16),
+                        learning_rate: float = 2e-3):
+    """Compact distillation student: a small shared MLP feeding all five heads directly"""
+    import tensorflow as tf
+    from tensorflow.keras import layers
+
+    inputs = tf.keras.Input(shape=(num_features,), name='user_features')
+    x = inputs
+    for i, size in enumerate(hidden, start=1):
+        x = layers.Dense(size, activation='relu', name=f'student_dense_{i}')(x)
+    outputs = [
+        layers.Dense(len(CATEGORY_CLASSES), activation='softmax', name='category_output')(x),
+        layers.Dense(len(DIFFICULTY_CLASSES), activation='softmax', name='difficulty_output')(x),
+        layers.Dense(1, activation='sigmoid', name='xp_output')(x),
+        layers.Dense(1, activation='sigmoid', name='duration_output')(x),
+        layers.Dense(len(STAT_NAMES), activation='sigmoid', name='stats_output')(x)
+    ]
+    model = tf.keras.Model(inputs, outputs, name='TaskGenerationStudent')
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss={
+            # Soft teacher distributions as targets
+            'category_output': 'categorical_crossentropy',
+            'difficulty_output': 'categorical_crossentropy',
+            'xp_output': 'mse',
+            'duration_output': 'mse',
+            'stats_output': 'mse'
+        }
+    )
+    return model
+
+
+def _relu(x):
+    return np.maximum(x, 0)
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {'relu': _relu, 'sigmoid': _sigmoid, 'softmax': _softmax, 'linear': lambda x: x}
+
+
+class StudentTaskModel:
+    """
+    NumPy forward pass of a distilled student
+
+    Same predict() contract as the Keras teacher (list of five head arrays),
+    without framework dispatch overhead on single-row requests
+    """
+
+    def __init__(self, trunk: List[Tuple[np.ndarray, np.ndarray, str]],
+                 heads: List[Tuple[np.ndarray, np.ndarray, str]]):
+        self.trunk = trunk
+        self.heads = heads
+
+    @classmethod
+    def from_keras(cls, model) -> 'StudentTaskModel':
+        def dense(name):
+            layer = model.get_layer(name)
+            kernel, bias = layer.get_weights()
+            return kernel.astype(np.float32), bias.astype(np.float32), layer.get_config()['activation']
+        trunk_names = [l.name for l in model.layers if l.name.startswith('student_dense_')]
+        return cls([dense(n) for n in trunk_names], [dense(n) for n in OUTPUT_NAMES])
+
+    def save(self, path):
+        arrays = {}
+        for prefix, layers in (('trunk', self.trunk), ('head', self.heads)):
+            for i, (kernel, bias, activation) in enumerate(layers):
+                arrays[f'{prefix}_{i}_kernel'] = kernel
+                arrays[f'{prefix}_{i}_bias'] = bias
+                arrays[f'{prefix}_{i}_activation'] = np.array(activation)
+        np.savez(path, **arrays)
+        print(f"✓ Saved {path}", file=sys.stderr)
+
+    @classmethod
+    def load(cls, path) -> 'StudentTaskModel':
+        with np.load(path, allow_pickle=False) as data:
+            def layers(prefix):
+                out, i = [], 0
+                while f'{prefix}_{i}_kernel' in data:
+                    out.append((data[f'{prefix}_{i}_kernel'], data[f'{prefix}_{i}_bias'],
+                                str(data[f'{prefix}_{i}_activation'])))
+                    i += 1
+                return out
+            return cls(layers('trunk'), layers('head'))
+
+    def predict(self, features: np.ndarray, verbose: int = 0) -> List[np.ndarray]:
+        x = np.asarray(features, dtype=np.float32)
+        for kernel, bias, activation in self.trunk:
+            x = ACTIVATIONS[activation](x @ kernel + bias)
+        return [ACTIVATIONS[activation](x @ kernel + bias) for kernel, bias, activation in self.heads]
+
+    def count_params(self) -> int:
+        return int(sum(k.size + b.size for k, b, _ in self.trunk + self.heads))
+
+
+def encode_task(task: Dict) -> Tuple[int, int, float, float, np.ndarray]:
+    """Logged task -> (category idx, difficulty idx, xp, duration, stats) head targets in [0, 1]"""
+    xp = (float(task['xp']) - XP_RANGE[0]) / (XP_RANGE[1] - XP_RANGE[0])
+    duration = (float(task['duration']) - DURATION_RANGE[0]) / (DURATION_RANGE[1] - DURATION_RANGE[0])
+    rewards = task.get('stat_rewards', {})
+    stats = np.array([float(rewards.get(name, 1)) / STAT_SCALE for name in STAT_NAMES], dtype=np.float32)
+    return (
+        CATEGORY_CLASSES.index(task['category']),
+        DIFFICULTY_CLASSES.index(task['difficulty']),
+        float(np.clip(xp, 0, 1)),
+        float(np.clip(duration, 0, 1)),
+        np.clip(stats, 0, 1)
+    )
+
+
+def save_pickle(obj, path):
+    with open(path, 'wb') as f:
+        pickle.dump(obj, f)
+    print(f"✓ Saved {path}", file=sys.stderr)
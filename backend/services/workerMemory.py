@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Worker Memory - RSS watchdog and recycle policy for long-lived inference workers
+TensorFlow workers creep up in RSS (allocator fragmentation, caches), so
+each worker samples its RSS, and optionally tracemalloc, as it serves
+requests. Once it crosses a memory or request limit it asks to be recycled:
+it finishes the work it already accepted, exits, and its supervisor (the
+queue worker pool, or BinaryWorker on the Node side) starts a fresh one.
+Memory growth curves are written per worker so limits can be set from data.
+
+tracemalloc only sees Python allocations, not TensorFlow's native heap; use it
+to rule Python-side leaks in or out, with RSS as the recycle signal.
+
+Environment:
+  ML_WORKER_MAX_RSS_MB     recycle above this RSS (0 = off)
+  ML_WORKER_MAX_REQUESTS   recycle after this many requests (0 = off)
+  ML_WORKER_TRACEMALLOC    traceback frames to record (0 = off)
+  ML_WORKER_STATS_DIR      where growth curves are written
+
+Usage:
+  python workerMemory.py report [--dir <stats_dir>]
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from mlMetrics import REGISTRY
+from startupProfiler import current_rss_mb
+
+DEFAULT_STATS_DIR = os.environ.get(
+    'ML_WORKER_STATS_DIR',
+    str(Path(__file__).resolve().parent.parent / 'ml_models' / 'worker_stats')
+)
+
+# Exit code of a worker that stopped to be recycled (not a crash)
+RECYCLE_EXIT_CODE = 75
+
+WORKER_RECYCLES = REGISTRY.counter(
+    'ml_worker_recycles_total',
+    'Inference workers that asked to be recycled, by reason (rss, requests)',
+    ('service', 'reason')
+)
+
+WORKER_RSS = REGISTRY.histogram(
+    'ml_worker_rss_bytes',
+    'Sampled resident set size of inference workers',
+    ('service',),
+    buckets=tuple(2 ** n * 1024 * 1024 for n in range(7, 14))
+)
+
+
+def _env_number(name: str) -> float:
+    try:
+        return float(os.environ.get(name) or 0)
+    except ValueError:
+        return 0.0
+
+
+class MemoryWatchdog:
+    """
+    Samples one worker's memory and decides when it should be recycled
+
+    Create it after warm-up so the baseline excludes model loading. RSS is
+    sampled every sample_every requests or sample_seconds, whichever comes
+    first. When the curve reaches max_points it is thinned to every other
+    point and sample_every doubles (sample_seconds stays fixed), so the curve
+    keeps spanning the whole worker lifetime.
+    """
+
+    def __init__(self, service: str, worker_id: str, max_rss_mb: float = 0, max_requests: int = 0,
+                 tracemalloc_frames: int = 0, stats_dir: Optional[str] = None,
+                 sample_every: int = 25, sample_seconds: float = 30.0, max_points: int = 500):
+        self.service = service
+        self.worker_id = str(worker_id)
+        self.max_rss_mb = max_rss_mb
+        self.max_requests = max_requests
+        self.stats_dir = Path(stats_dir) if stats_dir else None
+        self.sample_every = sample_every
+        self.sample_seconds = sample_seconds
+        self.requests = 0
+        self.recycle_reason: Optional[str] = None
+        self.max_points = max_points
+        self.curve: List[Dict] = []
+        self.started = time.time()
+        self._last_sample_requests = 0
+        self._last_sample_time = 0.0
+
+        self._baseline_snapshot = None
+        if tracemalloc_frames:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(int(tracemalloc_frames))
+            self._baseline_snapshot = tracemalloc.take_snapshot()
+        self.baseline_rss_mb = current_rss_mb()
+        self.sample()
+
+    @classmethod
+    def from_env(cls, service: str, worker_id: str, **overrides) -> 'MemoryWatchdog':
+        options = {
+            'max_rss_mb': _env_number('ML_WORKER_MAX_RSS_MB'),
+            'max_requests': int(_env_number('ML_WORKER_MAX_REQUESTS')),
+            'tracemalloc_frames': int(_env_number('ML_WORKER_TRACEMALLOC')),
+            'stats_dir': DEFAULT_STATS_DIR
+        }
+        options.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(service, worker_id, **options)
+
+    def sample(self) -> Dict:
+        rss = current_rss_mb()
+        point = {
+            'requests': self.requests,
+            'uptime_s': round(time.time() - self.started, 2),
+            'rss_mb': round(rss, 2)
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            point['traced_mb'] = round(current / (1024 * 1024), 2)
+            point['traced_peak_mb'] = round(peak / (1024 * 1024), 2)
+        if len(self.curve) >= self.max_points:
+            self.curve = self.curve[::2]
+            self.sample_every *= 2
+        self.curve.append(point)
+        WORKER_RSS.observe(rss * 1024 * 1024, self.service)
+        self._last_sample_requests = self.requests
+        self._last_sample_time = time.monotonic()
+        return point
+
+    def record(self, requests: int = 1) -> Optional[str]:
+        """Count served requests; returns the recycle reason once a limit is crossed"""
+        self.requests += requests
+        due = (self.requests - self._last_sample_requests >= self.sample_every
+               or time.monotonic() - self._last_sample_time >= self.sample_seconds)
+        if due:
+            rss = self.sample()['rss_mb']
+            self.write()
+        else:
+            rss = current_rss_mb() if self.max_rss_mb else None
+
+        if self.recycle_reason is None:
+            if self.max_rss_mb and rss is not None and rss >= self.max_rss_mb:
+                self.recycle_reason = 'rss'
+            elif self.max_requests and self.requests >= self.max_requests:
+                self.recycle_reason = 'requests'
+            if self.recycle_reason:
+                WORKER_RECYCLES.inc(self.service, self.recycle_reason)
+                if not due:
+                    self.sample()
+                self.write(final=True)
+        return self.recycle_reason
+
+    def growth_per_1k_requests(self) -> Optional[float]:
+        """Least-squares RSS slope (MB per 1000 requests) over the curve"""
+        points = [(p['requests'], p['rss_mb']) for p in self.curve]
+        if len(points) < 3 or points[-1][0] == points[0][0]:
+            return None
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        var = sum((x - mean_x) ** 2 for x, _ in points)
+        if not var:
+            return None
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / var
+        return round(slope * 1000, 3)
+
+    def top_growth(self, limit: int = 10) -> List[Dict]:
+        """Python allocation sites that grew most since the baseline (tracemalloc only)"""
+        if self._baseline_snapshot is None or not tracemalloc.is_tracing():
+            return []
+        diff = tracemalloc.take_snapshot().compare_to(self._baseline_snapshot, 'lineno')
+        return [
+            {
+                'site': str(stat.traceback[0]),
+                'size_diff_kb': round(stat.size_diff / 1024, 1),
+                'count_diff': stat.count_diff
+            }
+            for stat in diff[:limit] if stat.size_diff > 0
+        ]
+
+    def report(self, allocations: bool = True) -> Dict:
+        """Summary and curve; allocations=False skips the (slow) tracemalloc snapshot"""
+        last = self.curve[-1] if self.curve else {'rss_mb': current_rss_mb()}
+        return {
+            'service': self.service,
+            'worker_id': self.worker_id,
+            'pid': os.getpid(),
+            'requests': self.requests,
+            'uptime_s': round(time.time() - self.started, 2),
+            'baseline_rss_mb': round(self.baseline_rss_mb, 2),
+            'rss_mb': last['rss_mb'],
+            'growth_mb': round(last['rss_mb'] - self.baseline_rss_mb, 2),
+            'growth_mb_per_1k_requests': self.growth_per_1k_requests(),
+            'limits': {'max_rss_mb': self.max_rss_mb or None, 'max_requests': self.max_requests or None},
+            'recycle_reason': self.recycle_reason,
+            'top_growth': self.top_growth() if allocations else [],
+            'curve': list(self.curve)
+        }
+
+    def write(self, final: bool = False) -> Optional[Path]:
+        """Write the growth curve to stats_dir/<service>-<worker id>.json (final adds allocation sites)"""
+        if self.stats_dir is None:
+            return None
+        try:
+            self.stats_dir.mkdir(parents=True, exist_ok=True)
+            path = self.stats_dir / f'{self.service}-{self.worker_id}.json'
+            tmp = path.with_suffix('.tmp')
+            tmp.write_text(json.dumps(self.report(allocations=final)))
+            os.replace(tmp, path)
+            return path
+        except OSError as e:
+            print(f"⚠️ Worker memory stats not written: {e}", file=sys.stderr)
+            return None
+
+
+def summarize(stats_dir: str = DEFAULT_STATS_DIR) -> Dict:
+    """One line per worker from the curves in stats_dir"""
+    workers = []
+    for path in sorted(Path(stats_dir).glob('*.json')):
+        try:
+            report = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        report.pop('curve', None)
+        report['file'] = path.name
+        workers.append(report)
+    return {'stats_dir': str(stats_dir), 'workers': workers}
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] != 'report':
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(1)
+    stats_dir = args[args.index('--dir') + 1] if '--dir' in args else DEFAULT_STATS_DIR
+    summary = summarize(stats_dir)
+    for worker in summary['workers']:
+        print(f"   {worker['service']}-{worker['worker_id']}: {worker['requests']} requests, "
+              f"{worker['baseline_rss_mb']} -> {worker['rss_mb']}MB "
+              f"({worker['growth_mb_per_1k_requests']} MB/1k), recycle: {worker['recycle_reason']}",
+              file=sys.stderr)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
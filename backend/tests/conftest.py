@@ -0,0 +1,61 @@
+"""
+Golden-output regression suite for the ML integration
+
+Run from backend/:
+  python -m pytest tests                          compare against the stored goldens
+  python -m pytest tests --update-goldens         re-record goldens from the reference path
+  ML_BUDGET_SCALE=2 python -m pytest tests        loosen latency/memory budgets on slow hosts
+  ML_FOOD_MODEL=<model.h5> python -m pytest tests  food detector golden for another model file
+                                                  (default: the seeded fixture model in tests/golden)
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from goldens import BACKEND_DIR, FIXTURE_FOOD_MODEL
+
+# Same thread settings and predict buckets on every host, whatever it was tuned to
+os.environ['ML_INFERENCE_PROFILE'] = 'off'
+os.environ.pop('ML_PREDICT_BUCKETS', None)
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+sys.path.insert(0, str(BACKEND_DIR / 'services'))
+
+
+def pytest_addoption(parser):
+    parser.addoption('--update-goldens', action='store_true',
+                     help='Re-record golden outputs from the reference path (review the diff before committing)')
+
+
+@pytest.fixture(scope='session')
+def update_goldens(request) -> bool:
+    return request.config.getoption('--update-goldens')
+
+
+@pytest.fixture(scope='session')
+def task_generator():
+    from mlTaskGenerator import MLTaskGenerator
+
+    generator = MLTaskGenerator()
+    generator.warm_up()
+    return generator
+
+
+@pytest.fixture(scope='session')
+def food_model_path() -> Path:
+    path = Path(os.environ.get('ML_FOOD_MODEL') or FIXTURE_FOOD_MODEL)
+    if not path.exists():
+        pytest.skip(f'No food model at {path}')
+    return path
+
+
+@pytest.fixture(scope='session')
+def food_detector(food_model_path):
+    from northIndianFoodDetector import NorthIndianFoodDetector
+
+    # Plain classifier path: no cascade, no meal index
+    detector = NorthIndianFoodDetector(str(food_model_path))
+    detector.warm_up()
+    return detector
@@ -0,0 +1,164 @@
+"""
+Golden files, tolerances and budgets for the ML regression suite
+
+A golden file (tests/golden/<name>.json) holds reference outputs for the
+fixed corpus, the fingerprints of the models and corpus they were recorded
+with, and per-backend tolerances. Tolerances are either numerically close
+({"rtol", "atol"}) or, for approximate backends such as a distilled or
+quantized model, {"argmax_agreement", "atol"}: the share of rows whose
+top class matches, plus a bound on the largest absolute difference.
+
+The trained food model is deployment-local, so the detector suite runs on a
+small seeded fixture model committed under tests/golden. Rebuild it (then
+re-record its golden) with:
+  python tests/goldens.py fixture-model
+"""
+
+import hashlib
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+TESTS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = TESTS_DIR.parent
+GOLDEN_DIR = TESTS_DIR / 'golden'
+CORPUS_DIR = GOLDEN_DIR / 'corpus'
+ML_MODELS_DIR = BACKEND_DIR / 'ml_models'
+FIXTURE_FOOD_MODEL = GOLDEN_DIR / 'food_detector_fixture.h5'
+
+# Fixture model: untrained (weights=None), seeded, and small enough to commit
+FIXTURE_SEED = 2026
+FIXTURE_INPUT_SIZE = 96
+FIXTURE_ALPHA = 0.35
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png')
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def corpus_users() -> List[Dict]:
+    return json.loads((CORPUS_DIR / 'users.json').read_text())
+
+
+def corpus_images() -> List[Path]:
+    return sorted(p for p in (CORPUS_DIR / 'images').iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def corpus_fingerprint() -> str:
+    digest = hashlib.sha256()
+    for path in [CORPUS_DIR / 'users.json', *corpus_images()]:
+        digest.update(path.name.encode('utf-8'))
+        digest.update(file_sha256(path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def load_golden(name: str) -> Optional[Dict]:
+    path = GOLDEN_DIR / f'{name}.json'
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def save_golden(name: str, data: Dict):
+    path = GOLDEN_DIR / f'{name}.json'
+    path.write_text(json.dumps(data, indent=1) + '\n')
+
+
+def to_lists(arrays: Dict[str, np.ndarray], decimals: int = 7) -> Dict[str, List]:
+    return {name: np.round(np.asarray(a, dtype=np.float64), decimals).tolist() for name, a in arrays.items()}
+
+
+def assert_matches(actual, expected, tolerance: Dict, label: str):
+    """Compare one output array against its golden under a tolerance spec"""
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    assert actual.shape == expected.shape, f'{label}: shape {actual.shape} != golden {expected.shape}'
+
+    if 'argmax_agreement' in tolerance and expected.ndim == 2 and expected.shape[1] > 1:
+        agreement = float(np.mean(np.argmax(actual, axis=1) == np.argmax(expected, axis=1)))
+        assert agreement >= tolerance['argmax_agreement'], \
+            f"{label}: top-class agreement {agreement:.3f} < {tolerance['argmax_agreement']}"
+    if 'rtol' in tolerance:
+        np.testing.assert_allclose(actual, expected, rtol=tolerance['rtol'], atol=tolerance.get('atol', 0),
+                                   err_msg=label)
+    elif 'atol' in tolerance:
+        worst = float(np.max(np.abs(actual - expected))) if actual.size else 0.0
+        assert worst <= tolerance['atol'], f"{label}: max abs difference {worst:.5f} > {tolerance['atol']}"
+
+
+def budgets(service: str) -> Dict:
+    """Latency (ms) and memory (MB) budgets, scaled by ML_BUDGET_SCALE for slower hosts"""
+    scale = float(os.environ.get('ML_BUDGET_SCALE', '1'))
+    raw = json.loads((GOLDEN_DIR / 'budgets.json').read_text())[service]
+    return {name: value * scale for name, value in raw.items()}
+
+
+def call_latency_ms(fn: Callable, runs: int, warm: int = 3) -> Tuple[float, float]:
+    """(median, p95) wall time of fn() in ms after `warm` untimed calls"""
+    for _ in range(warm):
+        fn()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+
+def traced_peak_mb(fn: Callable) -> float:
+    """Peak Python-side allocation (tracemalloc; NumPy included, TensorFlow's heap not) during fn()"""
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn()
+        return (tracemalloc.get_traced_memory()[1] - baseline) / (1024 * 1024)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+
+def build_fixture_food_model(path=FIXTURE_FOOD_MODEL) -> Path:
+    """Seeded untrained detector model for the golden and budget tests"""
+    import sys
+
+    import tensorflow as tf
+
+    sys.path.insert(0, str(BACKEND_DIR / 'services'))
+    from northIndianFoodDetector import NorthIndianFoodDetector
+
+    tf.keras.utils.set_random_seed(FIXTURE_SEED)
+    detector = NorthIndianFoodDetector(input_size=FIXTURE_INPUT_SIZE, alpha=FIXTURE_ALPHA, weights=None)
+    # Fresh BatchNorm statistics shrink the backbone output to ~0 (uniform
+    # scores); set each layer's moving stats from seeded noise images, in order
+    backbone = detector.model.layers[0]
+    noise = np.random.default_rng(FIXTURE_SEED).uniform(
+        -1, 1, (16, FIXTURE_INPUT_SIZE, FIXTURE_INPUT_SIZE, 3)).astype(np.float32)
+    for layer in backbone.layers:
+        if isinstance(layer, tf.keras.layers.BatchNormalization):
+            inputs = tf.keras.Model(backbone.input, layer.input).predict(noise, verbose=0)
+            layer.moving_mean.assign(inputs.mean(axis=(0, 1, 2)))
+            layer.moving_variance.assign(inputs.var(axis=(0, 1, 2)))
+    detector.save_model(str(path), {'fixture_seed': FIXTURE_SEED})
+    return Path(path)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if sys.argv[1:] != ['fixture-model']:
+        sys.exit('usage: python tests/goldens.py fixture-model')
+    print(build_fixture_food_model())
@@ -0,0 +1,116 @@
+"""
+NorthIndianFoodDetector against its golden class probabilities
+
+The reference is the classifier through plain Keras Model.predict on each
+corpus image after the serving preprocessing. Serving backends (compiled
+buckets, batched detection, shared-memory uploads) must reproduce those
+probabilities within tolerance.
+
+The trained food model is deployment-local rather than in the repository,
+so by default these run on the seeded fixture model in tests/golden (see
+goldens.build_fixture_food_model). The golden records the model's
+fingerprint: with ML_FOOD_MODEL pointing at another model they skip until
+its golden is recorded with --update-goldens.
+"""
+
+import numpy as np
+import pytest
+
+from goldens import assert_matches, corpus_fingerprint, corpus_images, file_sha256, load_golden, save_golden
+
+DEFAULT_TOLERANCES = {
+    'reference': {'rtol': 1e-3, 'atol': 1e-5},
+    'bucketed_single': {'rtol': 1e-3, 'atol': 1e-5},
+    'bucketed_batch': {'rtol': 1e-3, 'atol': 1e-5},
+    'shared_memory_ring': {'rtol': 1e-3, 'atol': 1e-5},
+    'detect_foods': {'atol': 1e-4}
+}
+
+
+def reference_probabilities(detector, images):
+    return np.concatenate([detector.model.predict(detector.preprocess_image(str(p)), verbose=0) for p in images])
+
+
+def ring_probabilities(detector, images, ring_dir):
+    from sharedImageRing import ImageRing
+
+    datas = [p.read_bytes() for p in images]
+    path = str(ring_dir / 'golden-ring.bin')
+    ImageRing.create(path, len(datas), max(len(d) for d in datas))
+    ring = ImageRing(path)
+    try:
+        arrays = []
+        for slot, data in enumerate(datas):
+            ImageRing.write_slot(path, slot, slot + 1, data)
+            with ring.open(slot, slot + 1, len(data)) as slot_file:
+                arrays.append(detector.preprocess_image(slot_file))
+        return detector.predictor.predict(np.concatenate(arrays))
+    finally:
+        ring.close()
+
+
+def detect_foods_probabilities(detector, images):
+    """Top class and confidence from the batched result dicts, as a one-hot-scaled matrix"""
+    results = detector.detect_foods([str(p) for p in images], confidence_threshold=0.0)
+    scores = np.zeros((len(images), detector.num_classes))
+    for i, result in enumerate(results):
+        assert result['status'] == 'success', result
+        scores[i, detector.food_classes.index(result['detected_food'])] = result['confidence']
+    return scores
+
+
+BACKENDS = {
+    'reference': lambda detector, images, tmp: reference_probabilities(detector, images),
+    'bucketed_single': lambda detector, images, tmp: np.concatenate([
+        detector.predictor.predict(detector.preprocess_image(str(p))) for p in images
+    ]),
+    'bucketed_batch': lambda detector, images, tmp: detector.predictor.predict(
+        np.concatenate([detector.preprocess_image(str(p)) for p in images])
+    ),
+    'shared_memory_ring': ring_probabilities,
+    'detect_foods': lambda detector, images, tmp: detect_foods_probabilities(detector, images)
+}
+
+
+@pytest.fixture(scope='module')
+def images():
+    return corpus_images()
+
+
+@pytest.fixture(scope='module')
+def golden(food_detector, food_model_path, images, update_goldens):
+    model_digest = file_sha256(food_model_path)
+    if update_goldens:
+        previous = load_golden('food_detector') or {}
+        save_golden('food_detector', {
+            'fingerprints': {'corpus': corpus_fingerprint(), 'model': model_digest},
+            'images': [p.name for p in images],
+            'classes': food_detector.food_classes,
+            'probabilities': np.round(reference_probabilities(food_detector, images).astype(np.float64), 7).tolist(),
+            'tolerances': {**DEFAULT_TOLERANCES, **previous.get('tolerances', {})}
+        })
+    recorded = load_golden('food_detector')
+    if recorded is None or recorded['fingerprints']['model'] != model_digest:
+        pytest.skip(f'No food detector golden for model {food_model_path.name} ({model_digest[:12]}); '
+                    'record one with --update-goldens')
+    return recorded
+
+
+def test_golden_matches_current_corpus(golden, images, food_detector):
+    assert golden['fingerprints']['corpus'] == corpus_fingerprint(), \
+        'Corpus changed since the goldens were recorded; re-record with --update-goldens'
+    assert golden['images'] == [p.name for p in images]
+    assert golden['classes'] == food_detector.food_classes
+
+
+@pytest.mark.parametrize('backend', list(BACKENDS))
+def test_backend_probabilities_match_golden(backend, food_detector, images, golden, tmp_path):
+    actual = BACKENDS[backend](food_detector, images, tmp_path)
+    expected = np.asarray(golden['probabilities'])
+    if backend == 'detect_foods':
+        # Only the top class survives into the result dict
+        top = np.argmax(expected, axis=1)
+        masked = np.zeros_like(expected)
+        masked[np.arange(len(top)), top] = expected[np.arange(len(top)), top]
+        expected = masked
+    assert_matches(actual, expected, golden['tolerances'][backend], f'{backend} probabilities')
@@ -0,0 +1,83 @@
+"""
+Columnar food-log rollups against the per-request getWeeklySummary scan
+
+weekly_per_request is the JS algorithm (filter, group by date, reduce);
+the rollup lookups and the batch export must give the same numbers.
+"""
+
+import numpy as np
+
+from foodLogAnalytics import NUTRIENTS, FoodLogAnalytics, day_string, to_day, weekly_per_request
+
+END = '2026-10-19'
+
+
+def random_logs(users=20, per_user=150, seed=0):
+    rng = np.random.default_rng(seed)
+    logs = {}
+    for u in range(users):
+        days = to_day(END) - rng.integers(-2, 40, per_user)
+        logs[f'user-{u}'] = [{
+            'logged_at': f'{day_string(d)}T{rng.integers(0, 24):02d}:30:00.000Z',
+            'calories': int(rng.integers(50, 900)),
+            **{n: float(rng.integers(0, 600)) / 10 for n in NUTRIENTS[1:]}
+        } for d in days]
+    return logs
+
+
+def test_incremental_and_bulk_weekly_match_per_request_scan():
+    logs = random_logs()
+    incremental = FoodLogAnalytics()
+    for user_id, entries in logs.items():
+        for entry in entries:
+            incremental.log_food(user_id, entry)
+    bulk = FoodLogAnalytics()
+    flat = [(u, e) for u, entries in logs.items() for e in entries]
+    bulk.load([u for u, _ in flat], [e['logged_at'] for _, e in flat],
+              np.array([[e[n] for n in NUTRIENTS] for _, e in flat]))
+
+    end = to_day(END)
+    for user_id, entries in logs.items():
+        expected = weekly_per_request(entries, end)
+        for analytics in (incremental, bulk):
+            weekly = analytics.weekly(user_id, END)
+            assert weekly['weeklyTotals']['total_calories'] == expected['total_calories']
+            assert weekly['weeklyTotals']['average_calories'] == expected['average_calories']
+            assert weekly['weeklyTotals']['days_logged'] == expected['days_logged']
+            for fast, slow in zip(weekly['summaries'], expected['summaries']):
+                assert fast['date'] == slow['date'] and fast['meal_count'] == slow['meal_count']
+                assert np.isclose(fast['total_protein'], slow['total_protein'])
+
+
+def test_out_of_order_days_and_removal():
+    analytics = FoodLogAnalytics()
+    meal = {'calories': 400, 'protein': 20, 'logged_at': '2026-10-19T08:00:00Z'}
+    analytics.log_food('u', meal)
+    # An older day than the first one logged grows the rollup backwards
+    analytics.log_food('u', {'calories': 250.6, 'logged_at': '2025-01-02T08:00:00Z'})
+    assert analytics.daily('u', '2025-01-02')['total_calories'] == 251
+    # Totals are rounded once, not per meal
+    analytics.log_food('u', {'calories': 100.4, 'logged_at': '2025-01-03T08:00:00Z'})
+    analytics.log_food('u', {'calories': 100.4, 'logged_at': '2025-01-03T12:00:00Z'})
+    assert analytics.daily('u', '2025-01-03')['total_calories'] == 201
+    assert analytics.daily('u', END)['meal_count'] == 1
+
+    analytics.remove_food('u', meal)
+    assert analytics.daily('u', END) == analytics.daily('nobody', END)
+    assert analytics.rolling('u', 365 * 2, END)['totals']['days_logged'] == 2
+
+
+def test_export_matches_per_user_windows():
+    logs = random_logs(users=5, seed=1)
+    analytics = FoodLogAnalytics()
+    for user_id, entries in logs.items():
+        for entry in entries:
+            analytics.log_food(user_id, entry)
+
+    batch = analytics.export(['missing', *logs], days=30, end=END)
+    assert batch['daily'].shape == (6, 30, len(NUTRIENTS) + 1)
+    assert batch['dates'][-1] == END and batch['days_logged'][0] == 0
+    for i, user_id in enumerate(logs, start=1):
+        totals = analytics.rolling(user_id, 30, END)['totals']
+        assert batch['totals'][i, 0] == totals['total_calories']
+        assert batch['days_logged'][i] == totals['days_logged']
@@ -0,0 +1,65 @@
+"""
+Per-call latency and memory budgets for the inference services
+
+Budgets live in tests/golden/budgets.json: p95 latency of a single and a
+corpus-sized batched call after warm-up, the peak Python-side allocation
+of one batched call, and RSS growth over repeated calls (a leak check).
+Deselect with -m "not budget" on shared hosts, or scale with ML_BUDGET_SCALE.
+"""
+
+import pytest
+
+from goldens import budgets, call_latency_ms, corpus_images, corpus_users, traced_peak_mb
+
+pytestmark = pytest.mark.budget
+
+
+def _check_memory(budget, call, repeats):
+    from startupProfiler import current_rss_mb
+
+    peak = traced_peak_mb(call)
+    assert peak <= budget['traced_peak_mb'], \
+        f'Batched call allocated {peak:.1f}MB > {budget["traced_peak_mb"]}MB'
+
+    before = current_rss_mb()
+    for _ in range(repeats):
+        call()
+    growth = current_rss_mb() - before
+    assert growth <= budget['rss_growth_mb'], \
+        f'RSS grew {growth:.1f}MB over {repeats} calls > {budget["rss_growth_mb"]}MB'
+
+
+def test_task_generator_latency(task_generator):
+    budget = budgets('task_generator')
+    users = corpus_users()
+
+    _, single_p95 = call_latency_ms(lambda: task_generator.generate_task(users[0]), runs=100)
+    assert single_p95 <= budget['p95_single_ms'], \
+        f'Single task p95 {single_p95:.1f}ms > {budget["p95_single_ms"]}ms'
+
+    _, batch_p95 = call_latency_ms(lambda: task_generator.generate_tasks(users), runs=30)
+    assert batch_p95 <= budget['p95_batch_ms'], \
+        f'{len(users)}-user batch p95 {batch_p95:.1f}ms > {budget["p95_batch_ms"]}ms'
+
+
+def test_task_generator_memory(task_generator):
+    users = corpus_users()
+    _check_memory(budgets('task_generator'), lambda: task_generator.generate_tasks(users), repeats=300)
+
+
+def test_food_detector_latency(food_detector):
+    budget = budgets('food_detector')
+    images = [str(p) for p in corpus_images()]
+
+    _, single_p95 = call_latency_ms(lambda: food_detector.detect_food(images[0]), runs=20)
+    assert single_p95 <= budget['p95_single_ms'], \
+        f'Single image p95 {single_p95:.1f}ms > {budget["p95_single_ms"]}ms'
+
+    _, batch_p95 = call_latency_ms(lambda: food_detector.detect_foods(images), runs=10)
+    assert batch_p95 <= budget['p95_batch_ms'], \
+        f'{len(images)}-image batch p95 {batch_p95:.1f}ms > {budget["p95_batch_ms"]}ms'
+
+
+def test_food_detector_memory(food_detector):
+    images = [str(p) for p in corpus_images()]
+    _check_memory(budgets('food_detector'), lambda: food_detector.detect_foods(images), repeats=50)
@@ -0,0 +1,54 @@
+"""
+Vectorized level/rank engine against the per-call JS semantics
+
+rank_for_xp_per_call is a line-by-line port of utils/rank.js getRankForXp;
+the searchsorted engine must agree with it on every threshold edge.
+"""
+
+import numpy as np
+
+import progressionEngine as engine
+
+
+def test_thresholds_follow_level_config():
+    thresholds = engine.level_thresholds(0)
+    assert thresholds[0] == 0
+    assert thresholds[1] == 1000
+    assert thresholds[2] == 1000 + int(np.floor(1000 * 2 ** 1.18))
+    assert np.all(np.diff(thresholds) > 0)
+    assert np.all(engine.level_thresholds(2)[1:] > thresholds[1:])
+
+
+def test_threshold_edges_match_per_call_port():
+    xp, prestige = [], []
+    for p in (0, 1, 5, 10):
+        thresholds = engine.level_thresholds(p)
+        for first_level in engine.RANK_MIN_LEVELS:
+            edge = int(thresholds[first_level - 1])
+            xp += [max(edge - 1, 0), edge, edge + 1]
+            prestige += [p] * 3
+    xp += [-5, 0, 10 ** 12]
+    prestige += [0, 0, 0]
+
+    ranks = engine.ranks_for_xp(np.array(xp), np.array(prestige))
+    assert list(ranks) == [engine.rank_for_xp_per_call(x, p) for x, p in zip(xp, prestige)]
+
+
+def test_progression_percent_and_max_level():
+    thresholds = engine.level_thresholds(0)
+    middle = (thresholds[4] + thresholds[5]) // 2
+    result = engine.progression([0, middle, thresholds[-1], thresholds[-1] * 2])
+    assert result['level'].tolist() == [1, 5, 340, 340]
+    assert result['next_level_percent'].tolist()[0] == 0
+    assert result['next_level_percent'].tolist()[1] == 50
+    assert result['next_level_percent'].tolist()[2:] == [100, 100]
+    assert result['rank'].tolist()[2:] == ['Monarch', 'Monarch']
+
+
+def test_rollover_detects_rank_changes():
+    edge = int(engine.level_thresholds(0)[19])
+    result = engine.rollover([edge - 10, edge - 10, 0], [10, 5, 0])
+    assert result['total_xp'].tolist() == [edge, edge - 5, 0]
+    assert result['rolled'].tolist() == [True, True, False]
+    assert result['rank'].tolist() == ['E', 'F', 'F']
+    assert result['rank_changed'].tolist() == [True, False, False]
@@ -0,0 +1,173 @@
+"""
+MLTaskGenerator against its golden heads and tasks
+
+The reference is the teacher network through plain Keras Model.predict on
+the corpus rows. Every serving backend (compiled buckets, batched calls,
+the vectorized decode, keyed binary frames, the distilled NumPy student)
+must reproduce the golden outputs within its tolerance before it is
+switched on.
+"""
+
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from binaryIpc import TASK_RECORD, TASKS, task_handlers
+from goldens import (ML_MODELS_DIR, assert_matches, corpus_fingerprint, corpus_users, file_sha256,
+                     load_golden, save_golden, to_lists)
+
+HEADS = ('category', 'difficulty', 'xp', 'duration', 'stats')
+
+# Deterministic tasks are keyed by (user, day, slot); fixed so the goldens never age
+GOLDEN_DAY = '2026-01-01'
+
+DEFAULT_TOLERANCES = {
+    'reference': {'rtol': 1e-4, 'atol': 1e-5},
+    'bucketed_batch': {'rtol': 1e-4, 'atol': 1e-5},
+    'bucketed_single': {'rtol': 1e-4, 'atol': 1e-5},
+    'student': {'argmax_agreement': 0.9, 'atol': 0.15}
+}
+
+
+def fingerprints():
+    return {
+        'corpus': corpus_fingerprint(),
+        'fitness_model.pkl': file_sha256(ML_MODELS_DIR / 'fitness_model.pkl'),
+        'feature_preprocessor.pkl': file_sha256(ML_MODELS_DIR / 'feature_preprocessor.pkl')
+    }
+
+
+def reference_heads(generator, features):
+    scaled = generator.preprocessor.transform(features)
+    return dict(zip(HEADS, generator.model.predict(scaled, verbose=0)))
+
+
+def student_heads(generator, features):
+    from taskModel import StudentTaskModel
+
+    path = ML_MODELS_DIR / 'fitness_model_student.npz'
+    if not path.exists():
+        pytest.skip('No distilled student (distill-task-model.py)')
+    return StudentTaskModel.load(path).predict(generator.preprocessor.transform(features))
+
+
+BACKENDS = {
+    'reference': lambda generator, features: list(reference_heads(generator, features).values()),
+    'bucketed_batch': lambda generator, features:
+        generator.predictor.predict(generator.preprocessor.transform(features)),
+    'bucketed_single': lambda generator, features: [
+        np.concatenate(head) for head in zip(*(
+            generator.predictor.predict(generator.preprocessor.transform(row[np.newaxis]))
+            for row in features
+        ))
+    ],
+    'student': student_heads
+}
+
+
+@pytest.fixture(scope='module')
+def users():
+    return corpus_users()
+
+
+@pytest.fixture(scope='module')
+def features(task_generator, users):
+    return np.stack([task_generator._build_features(user) for user in users])
+
+
+@pytest.fixture(scope='module')
+def golden(task_generator, users, features, update_goldens):
+    if update_goldens:
+        previous = load_golden('task_generator') or {}
+        task_generator._task_cache.clear()
+        save_golden('task_generator', {
+            'fingerprints': fingerprints(),
+            'day': GOLDEN_DAY,
+            'features': features.tolist(),
+            'heads': to_lists(reference_heads(task_generator, features)),
+            'tasks': [task_generator.generate_task(user, deterministic=True, day=GOLDEN_DAY) for user in users],
+            'tolerances': {**DEFAULT_TOLERANCES, **previous.get('tolerances', {})}
+        })
+    recorded = load_golden('task_generator')
+    if recorded is None:
+        pytest.fail('No task generator golden; record one with --update-goldens')
+    return recorded
+
+
+def test_golden_matches_current_models(golden):
+    changed = [name for name, digest in fingerprints().items() if golden['fingerprints'].get(name) != digest]
+    assert not changed, (f'{", ".join(changed)} changed since the goldens were recorded; '
+                         'if intended, re-record with --update-goldens and review the diff')
+
+
+def test_encoded_rows_match_golden(features, golden):
+    np.testing.assert_array_equal(features, np.asarray(golden['features'], dtype=np.float32))
+
+
+@pytest.mark.parametrize('backend', list(BACKENDS))
+def test_backend_heads_match_golden(backend, task_generator, features, golden):
+    outputs = BACKENDS[backend](task_generator, features)
+    tolerance = golden['tolerances'][backend]
+    for name, actual in zip(HEADS, outputs):
+        assert_matches(actual, golden['heads'][name], tolerance, f'{backend} {name} head')
+
+
+def _assert_tasks_equal(actual, expected, label):
+    for i, (task, reference) in enumerate(zip(actual, expected)):
+        for field in ('exercise_name', 'category', 'difficulty', 'stat_rewards'):
+            assert task[field] == reference[field], f'{label} row {i}: {field} {task[field]!r} != {reference[field]!r}'
+        # Integer rounding of a denormalized head may tip by one across CPUs
+        for field in ('xp', 'duration'):
+            assert abs(task[field] - reference[field]) <= 1, f'{label} row {i}: {field}'
+    assert len(actual) == len(expected)
+
+
+def test_single_tasks_match_golden(task_generator, users, golden):
+    task_generator._task_cache.clear()
+    tasks = [task_generator.generate_task(user, deterministic=True, day=golden['day']) for user in users]
+    _assert_tasks_equal(tasks, golden['tasks'], 'generate_task')
+
+
+def test_batched_tasks_match_golden(task_generator, users, golden):
+    task_generator._task_cache.clear()
+    tasks = task_generator.generate_tasks(users, deterministic=True, day=golden['day'])
+    _assert_tasks_equal(tasks, golden['tasks'], 'generate_tasks')
+
+
+def test_vectorized_decode_matches_golden(task_generator, features, golden):
+    fields = task_generator.task_fields(features)
+    for i, reference in enumerate(golden['tasks']):
+        assert task_generator.CATEGORY_CLASSES[fields['category'][i]] == reference['category']
+        assert task_generator.DIFFICULTY_CLASSES[fields['difficulty'][i]] == reference['difficulty']
+        assert abs(int(fields['xp'][i]) - reference['xp']) <= 1
+        assert abs(int(fields['duration'][i]) - reference['duration']) <= 1
+        assert fields['stats'][i].tolist() == [reference['stat_rewards'][s] for s in task_generator.STAT_NAMES]
+
+
+def test_keyed_binary_frame_matches_golden(task_generator, users, features, golden):
+    task_generator._task_cache.clear()
+    keys = json.dumps({
+        'user_ids': [str(user['user_id']) for user in users],
+        'slots': [0] * len(users),
+        'day': golden['day']
+    }).encode('utf-8')
+    matrix = np.asarray(features, dtype='<f4')
+    payload = (struct.pack('<II', *matrix.shape) + matrix.tobytes()
+               + struct.pack('<I', len(keys)) + keys)
+    _, reply = task_handlers(task_generator)[TASKS](payload)
+    records = np.frombuffer(reply, dtype=TASK_RECORD, offset=4)
+    tasks = []
+    for record in records:
+        category = task_generator.CATEGORY_CLASSES[record['category']]
+        difficulty = task_generator.DIFFICULTY_CLASSES[record['difficulty']]
+        tasks.append({
+            'exercise_name': task_generator.EXERCISES[category][difficulty][record['exercise']]['name'],
+            'category': category,
+            'difficulty': difficulty,
+            'xp': int(record['xp']),
+            'duration': int(record['duration']),
+            'stat_rewards': dict(zip(task_generator.STAT_NAMES, record['stats'].tolist()))
+        })
+    _assert_tasks_equal(tasks, golden['tasks'], 'keyed TASKS frame')
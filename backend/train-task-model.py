@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Task Model Trainer
+Reproducible, streaming trainer for the task generation network
+(19 features, 5 heads) behind MLTaskGenerator
+
+Logged task outcomes (JSON lines of {"user": {...}, "task": {...}}) are
+first written to a memory-mapped dataset in chunks, so neither step holds
+the corpus in memory. Training fits the feature scaler incrementally, then
+streams shuffled, scaled batches from the memmap through a prefetching
+tf.data pipeline. Exports load directly with MLTaskGenerator(model_dir=...).
+
+Usage:
+  python train-task-model.py build-dataset data/tasks --source task_log.jsonl
+  python train-task-model.py build-dataset data/synthetic --synthetic 200000
+  python train-task-model.py train data/tasks --output-dir ml_models/candidate --epochs 10
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir / 'services'))
+
+from taskModel import (
+    CATEGORY_CLASSES, DIFFICULTY_CLASSES, FEATURE_NAMES, NUM_FEATURES, STAT_NAMES,
+    FeaturePreprocessor, build_task_model, encode_task, save_pickle
+)
+
+# name -> (dtype, per-row shape)
+ARRAYS = {
+    'features': ('float32', (NUM_FEATURES,)),
+    'category': ('int8', ()),
+    'difficulty': ('int8', ()),
+    'xp': ('float32', ()),
+    'duration': ('float32', ()),
+    'stats': ('float32', (len(STAT_NAMES),))
+}
+
+
+def iter_records(source):
+    """JSON lines from a file (or '-' for stdin)"""
+    handle = sys.stdin if source == '-' else open(source)
+    try:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def build_dataset(records, out_dir, chunk_size=8192):
+    """Append encoded records to flat binary files; returns the row count"""
+    from mlTaskGenerator import MLTaskGenerator
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    files = {name: open(out / f'{name}.bin', 'wb') for name in ARRAYS}
+    buffers = {name: [] for name in ARRAYS}
+    count = skipped = 0
+
+    def flush():
+        for name, (dtype, _) in ARRAYS.items():
+            if buffers[name]:
+                files[name].write(np.asarray(buffers[name], dtype=dtype).tobytes())
+                buffers[name].clear()
+
+    try:
+        for record in records:
+            try:
+                features = MLTaskGenerator._build_features(record['user'])
+                category, difficulty, xp, duration, stats = encode_task(record['task'])
+            except (KeyError, ValueError, TypeError):
+                skipped += 1
+                continue
+            for name, value in zip(ARRAYS, (features, category, difficulty, xp, duration, stats)):
+                buffers[name].append(value)
+            count += 1
+            if count % chunk_size == 0:
+                flush()
+                print(f"   {count} rows", file=sys.stderr)
+        flush()
+    finally:
+        for f in files.values():
+            f.close()
+
+    with open(out / 'meta.json', 'w') as f:
+        json.dump({
+            'rows': count,
+            'skipped': skipped,
+            'arrays': {name: {'dtype': dtype, 'shape': list(shape)} for name, (dtype, shape) in ARRAYS.items()},
+            'feature_names': FEATURE_NAMES
+        }, f, indent=2)
+    print(f"✓ Wrote {count} rows to {out} ({skipped} skipped)", file=sys.stderr)
+    return count
+
+
+def open_dataset(data_dir):
+    """Read-only memmaps of a built dataset"""
+    data = Path(data_dir)
+    meta = json.loads((data / 'meta.json').read_text())
+    rows = meta['rows']
+    return rows, {
+        name: np.memmap(data / f'{name}.bin', dtype=spec['dtype'], mode='r',
+                        shape=(rows, *spec['shape']))
+        for name, spec in meta['arrays'].items()
+    }
+
+
+def fit_scaler(arrays, rows, chunk_size):
+    """One streaming pass of partial_fit over the feature column"""
+    preprocessor = FeaturePreprocessor()
+    for start in range(0, rows, chunk_size):
+        preprocessor.partial_fit(arrays['features'][start:start + chunk_size])
+    return preprocessor
+
+
+def batch_stream(arrays, preprocessor, chunk_ids, chunk_size, rows, batch_size,
+                 shuffle_chunks, seed, epoch_counter):
+    """
+    Generator factory: block shuffle over memmap chunks
+
+    Each epoch visits chunks in a new order; `shuffle_chunks` chunks at a time
+    are read, mixed row-wise and cut into batches. Rows left over from one
+    group carry into the next, so only the epoch's last batch is partial.
+    """
+    def generate():
+        epoch = next(epoch_counter)
+        rng = np.random.default_rng(seed + epoch)
+        order = rng.permutation(chunk_ids)
+        carry = None
+        for group_start in range(0, len(order), shuffle_chunks):
+            group = order[group_start:group_start + shuffle_chunks]
+            slices = [slice(c * chunk_size, min((c + 1) * chunk_size, rows)) for c in group]
+            block = {name: np.concatenate([arr[s] for s in slices]) for name, arr in arrays.items()}
+            perm = rng.permutation(len(block['features']))
+
+            x = preprocessor.transform(block['features'][perm])
+            targets = {
+                'category_output': np.eye(len(CATEGORY_CLASSES), dtype=np.float32)[block['category'][perm]],
+                'difficulty_output': np.eye(len(DIFFICULTY_CLASSES), dtype=np.float32)[block['difficulty'][perm]],
+                'xp_output': block['xp'][perm].reshape(-1, 1),
+                'duration_output': block['duration'][perm].reshape(-1, 1),
+                'stats_output': block['stats'][perm]
+            }
+            if carry is not None:
+                x = np.concatenate([carry[0], x])
+                targets = {name: np.concatenate([carry[1][name], t]) for name, t in targets.items()}
+
+            full = len(x) - len(x) % batch_size
+            for start in range(0, full, batch_size):
+                end = start + batch_size
+                yield x[start:end], {name: t[start:end] for name, t in targets.items()}
+            carry = (x[full:], {name: t[full:] for name, t in targets.items()})
+
+        if carry is not None and len(carry[0]):
+            yield carry
+    return generate
+
+
+def num_batches(chunk_ids, chunk_size, rows, batch_size):
+    count = sum(min((c + 1) * chunk_size, rows) - c * chunk_size for c in chunk_ids)
+    return -(-count // batch_size)
+
+
+def make_dataset(generator, batches):
+    """tf.data pipeline over a batch generator, prefetched in the background"""
+    import tensorflow as tf
+    signature = (
+        tf.TensorSpec((None, NUM_FEATURES), tf.float32),
+        {
+            'category_output': tf.TensorSpec((None, len(CATEGORY_CLASSES)), tf.float32),
+            'difficulty_output': tf.TensorSpec((None, len(DIFFICULTY_CLASSES)), tf.float32),
+            'xp_output': tf.TensorSpec((None, 1), tf.float32),
+            'duration_output': tf.TensorSpec((None, 1), tf.float32),
+            'stats_output': tf.TensorSpec((None, len(STAT_NAMES)), tf.float32)
+        }
+    )
+    dataset = tf.data.Dataset.from_generator(generator, output_signature=signature)
+    return dataset.apply(tf.data.experimental.assert_cardinality(batches)).prefetch(tf.data.AUTOTUNE)
+
+
+def train(args):
+    import itertools
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(args.seed)
+    rows, arrays = open_dataset(args.dataset)
+    if rows == 0:
+        print(f"✗ Dataset {args.dataset} is empty", file=sys.stderr)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    preprocessor = fit_scaler(arrays, rows, args.chunk_size)
+    print(f"✓ Scaler fitted on {rows} rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    # Hold out whole chunks for validation (fixed by the seed)
+    num_chunks = (rows + args.chunk_size - 1) // args.chunk_size
+    chunk_order = np.random.default_rng(args.seed).permutation(num_chunks)
+    num_val = int(round(num_chunks * args.val_fraction)) if num_chunks > 1 else 0
+    val_chunks, train_chunks = chunk_order[:num_val], chunk_order[num_val:]
+
+    common = dict(arrays=arrays, preprocessor=preprocessor, chunk_size=args.chunk_size, rows=rows,
+                  batch_size=args.batch_size, shuffle_chunks=args.shuffle_chunks, seed=args.seed)
+    train_data = make_dataset(
+        batch_stream(chunk_ids=train_chunks, epoch_counter=itertools.count(), **common),
+        num_batches(train_chunks, args.chunk_size, rows, args.batch_size)
+    )
+    val_data = make_dataset(
+        batch_stream(chunk_ids=val_chunks, epoch_counter=itertools.repeat(0), **common),
+        num_batches(val_chunks, args.chunk_size, rows, args.batch_size)
+    ) if num_val else None
+
+    model = build_task_model(width=args.width, learning_rate=args.learning_rate)
+    history = model.fit(train_data, validation_data=val_data, epochs=args.epochs, verbose=2)
+    elapsed = time.perf_counter() - started
+
+    out = Path(args.output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    save_pickle(model, out / 'fitness_model.pkl')
+    save_pickle(preprocessor, out / 'feature_preprocessor.pkl')
+    metadata = {
+        'rows': rows,
+        'train_chunks': len(train_chunks),
+        'val_chunks': len(val_chunks),
+        'epochs': args.epochs,
+        'batch_size': args.batch_size,
+        'chunk_size': args.chunk_size,
+        'width': args.width,
+        'learning_rate': args.learning_rate,
+        'seed': args.seed,
+        'feature_names': FEATURE_NAMES,
+        'history': {k: [round(float(v), 5) for v in vals] for k, vals in history.history.items()},
+        'training_seconds': round(elapsed, 1),
+        'rows_per_second': round(rows * args.epochs / elapsed, 1)
+    }
+    (out / 'training_metadata.json').write_text(json.dumps(metadata, indent=2))
+    print(f"✓ Trained in {elapsed:.1f}s; exported to {out}", file=sys.stderr)
+
+    verify_export(out)
+
+
+def verify_export(model_dir):
+    """The exported pair must load and generate through MLTaskGenerator"""
+    from mlTaskGenerator import MLTaskGenerator
+    from syntheticData import synthetic_users
+    generator = MLTaskGenerator(model_dir=str(model_dir))
+    task = generator.generate_task(synthetic_users(1, seed=1)[0])
+    print(f"✓ MLTaskGenerator loads the export: {task['exercise_name']} "
+          f"({task['category']}/{task['difficulty']}, {task['xp']} XP)", file=sys.stderr)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Train the task generation network')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build-dataset', help='Encode logged task outcomes into a memmap dataset')
+    build.add_argument('out_dir')
+    build.add_argument('--source', help="JSON lines file of {user, task} records ('-' for stdin)")
+    build.add_argument('--synthetic', type=int, help='Generate this many synthetic records instead')
+    build.add_argument('--seed', type=int, default=0)
+
+    fit = sub.add_parser('train', help='Train on a memmap dataset and export the model')
+    fit.add_argument('dataset')
+    fit.add_argument('--output-dir', default=str(backend_dir / 'ml_models' / 'candidate'))
+    fit.add_argument('--epochs', type=int, default=10)
+    fit.add_argument('--batch-size', type=int, default=256)
+    fit.add_argument('--chunk-size', type=int, default=16384, help='Rows read from the memmap at a time')
+    fit.add_argument('--shuffle-chunks', type=int, default=4, help='Chunks mixed together when shuffling')
+    fit.add_argument('--val-fraction', type=float, default=0.1)
+    fit.add_argument('--learning-rate', type=float, default=5e-4)
+    fit.add_argument('--width', type=float, default=1.0, help='Hidden layer width multiplier')
+    fit.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == 'build-dataset':
+        if args.synthetic:
+            from syntheticData import synthetic_task_log
+            records = synthetic_task_log(args.synthetic, args.seed)
+        elif args.source:
+            records = iter_records(args.source)
+        else:
+            print("✗ Give a JSON lines source or --synthetic N", file=sys.stderr)
+            sys.exit(1)
+        build_dataset(records, args.out_dir)
+    else:
+        train(args)
+
+
+if __name__ == '__main__':
+    main()